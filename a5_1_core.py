@@ -0,0 +1,252 @@
+from constant import *
+
+# tap positions for reduced register sizes (the highest bit is always a tap)
+REDUCED_TAPS = {4: [2, 3], 5: [2, 4], 6: [4, 5], 7: [5, 6], 8: [3, 4, 5, 7], 9: [4, 8], 10: [6, 9], 11: [8, 10],
+                12: [3, 9, 10, 11], 13: [7, 10, 11, 12]}
+
+
+def parity(value):
+    return bin(value).count('1') & 1
+
+
+class A51Parameters(object):
+    """
+        Register sizes, taps and clocking bits of A5/1. The default values
+        are the real cipher, reduced variants can be used to test and
+        benchmark attacks on a single machine.
+    """
+    def __init__(self, sizes=(R1_SIZE, R2_SIZE, R3_SIZE), taps=(R1_TAPS, R2_TAPS, R3_TAPS),
+                 clocking_bits=(R1_CLOCKING_BIT, R2_CLOCKING_BIT, R3_CLOCKING_BIT), key_size=KEY_SIZE,
+                 frame_counter_size=FRAME_COUNTER_SIZE, warm_up_cycles=MAJORITY_CYCLES_A51,
+                 keystream_size=KEY_STREAM_SIZE):
+        """
+            :param sizes: sizes of R1, R2 and R3
+            :param taps: tap positions of each register
+            :param clocking_bits: clocking bit of each register
+            :param key_size: number of session key bits
+            :param frame_counter_size: number of frame counter bits
+            :param warm_up_cycles: majority clocking cycles without output
+            :param keystream_size: number of keystream bits per direction
+        """
+        for size, register_taps, clocking_bit in zip(sizes, taps, clocking_bits):
+            if size - 1 not in register_taps:
+                raise ValueError('The highest bit of each register must be a tap!')
+            if not 0 <= clocking_bit < size:
+                raise ValueError('The clocking bit must be inside the register!')
+        self.sizes = tuple(sizes)
+        self.taps = tuple(tuple(register_taps) for register_taps in taps)
+        self.clocking_bits = tuple(clocking_bits)
+        self.key_size = key_size
+        self.frame_counter_size = frame_counter_size
+        self.warm_up_cycles = warm_up_cycles
+        self.keystream_size = keystream_size
+
+    @classmethod
+    def reduced(cls, sizes, frame_counter_size=8):
+        """
+            Creates a reduced variant, the clocking bits are in the middle of
+            the registers and the key size equals the state size
+            :param sizes: sizes of R1, R2 and R3 (see REDUCED_TAPS)
+        """
+        return cls(sizes, [REDUCED_TAPS[size] for size in sizes], [size // 2 for size in sizes], sum(sizes),
+                   frame_counter_size)
+
+    @property
+    def state_size(self):
+        return sum(self.sizes)
+
+    def to_dict(self):
+        return {'sizes': list(self.sizes), 'taps': [list(register_taps) for register_taps in self.taps],
+                'clocking_bits': list(self.clocking_bits), 'key_size': self.key_size,
+                'frame_counter_size': self.frame_counter_size, 'warm_up_cycles': self.warm_up_cycles,
+                'keystream_size': self.keystream_size}
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(**values)
+
+    def __eq__(self, other):
+        return isinstance(other, A51Parameters) and self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class A51Core(object):
+    """
+        A5/1 on integers. A state is one integer with R1 in the lowest bits,
+        followed by R2 and R3 (bit i of a register is R[i]).
+    """
+    def __init__(self, parameters=None):
+        self.parameters = parameters or A51Parameters()
+        (self.n1, self.n2, self.n3) = self.parameters.sizes
+        self.masks = tuple((1 << size) - 1 for size in self.parameters.sizes)
+        self.tap_masks = tuple(sum(1 << tap for tap in register_taps) for register_taps in self.parameters.taps)
+        # taps without the highest bit, used to clock backwards
+        self.reverse_tap_masks = tuple(tap_mask & ~(1 << (size - 1)) for tap_mask, size
+                                       in zip(self.tap_masks, self.parameters.sizes))
+        self.state_mask = (1 << self.parameters.state_size) - 1
+        # key loading is linear: state = sum of the images of the key bits
+        self.key_images = [self.load(1 << i, 0) for i in range(self.parameters.key_size)]
+
+    def pack(self, r1, r2, r3):
+        return r1 | (r2 << self.n1) | (r3 << (self.n1 + self.n2))
+
+    def unpack(self, state):
+        return (state & self.masks[0], (state >> self.n1) & self.masks[1], (state >> (self.n1 + self.n2)) & self.masks[2])
+
+    def load(self, key, frame_counter):
+        """
+            Clocks the session key and the frame counter (least significant
+            bit first) into the registers
+            :return state before the warm-up
+        """
+        registers = [0, 0, 0]
+        for value, size in ((key, self.parameters.key_size), (frame_counter, self.parameters.frame_counter_size)):
+            for i in range(size):
+                bit = (value >> i) & 1
+                for j in range(3):
+                    r = registers[j]
+                    registers[j] = ((r << 1) & self.masks[j]) | (parity(r & self.tap_masks[j]) ^ bit)
+        return self.pack(*registers)
+
+    def clock(self, state, cycles):
+        """
+            :return state after the given number of majority clocking cycles
+        """
+        (r1, r2, r3) = self.unpack(state)
+        (m1, m2, m3) = self.masks
+        (t1, t2, t3) = self.tap_masks
+        (b1, b2, b3) = self.parameters.clocking_bits
+        for i in range(cycles):
+            c1 = (r1 >> b1) & 1
+            c2 = (r2 >> b2) & 1
+            c3 = (r3 >> b3) & 1
+            majority = (c1 & c2) | (c1 & c3) | (c2 & c3)
+            if c1 == majority:
+                r1 = ((r1 << 1) & m1) | (bin(r1 & t1).count('1') & 1)
+            if c2 == majority:
+                r2 = ((r2 << 1) & m2) | (bin(r2 & t2).count('1') & 1)
+            if c3 == majority:
+                r3 = ((r3 << 1) & m3) | (bin(r3 & t3).count('1') & 1)
+        return self.pack(r1, r2, r3)
+
+    def keystream(self, state, length):
+        """
+            Clocks the registers and collects one output bit per cycle
+            :return keystream as integer (the first bit is the most
+                    significant bit, like BitVector.int_val)
+        """
+        (r1, r2, r3) = self.unpack(state)
+        (m1, m2, m3) = self.masks
+        (t1, t2, t3) = self.tap_masks
+        (b1, b2, b3) = self.parameters.clocking_bits
+        (h1, h2, h3) = (self.n1 - 1, self.n2 - 1, self.n3 - 1)
+        output = 0
+        for i in range(length):
+            c1 = (r1 >> b1) & 1
+            c2 = (r2 >> b2) & 1
+            c3 = (r3 >> b3) & 1
+            majority = (c1 & c2) | (c1 & c3) | (c2 & c3)
+            if c1 == majority:
+                r1 = ((r1 << 1) & m1) | (bin(r1 & t1).count('1') & 1)
+            if c2 == majority:
+                r2 = ((r2 << 1) & m2) | (bin(r2 & t2).count('1') & 1)
+            if c3 == majority:
+                r3 = ((r3 << 1) & m3) | (bin(r3 & t3).count('1') & 1)
+            output = (output << 1) | (((r1 >> h1) ^ (r2 >> h2) ^ (r3 >> h3)) & 1)
+        return output
+
+    def initial_state(self, key, frame_counter):
+        """
+            :return state after the warm-up, i.e. before the first keystream
+                    bit
+        """
+        return self.clock(self.load(key, frame_counter), self.parameters.warm_up_cycles)
+
+    def generate(self, key, frame_counter):
+        """
+            :return (send key, receive key) as integers
+        """
+        size = self.parameters.keystream_size
+        keystream = self.keystream(self.initial_state(key, frame_counter), 2 * size)
+        return (keystream >> size, keystream & ((1 << size) - 1))
+
+    def _reverse_register(self, r, j):
+        top = (r & 1) ^ parity((r >> 1) & self.reverse_tap_masks[j])
+        return (r >> 1) | (top << (self.parameters.sizes[j] - 1))
+
+    def predecessors(self, state):
+        """
+            Majority clocking is not invertible, a state has zero or more
+            predecessors
+            :return list with all states that are mapped to the given state
+                    by one majority clocking cycle
+        """
+        registers = self.unpack(state)
+        reversed_registers = [self._reverse_register(r, j) for j, r in enumerate(registers)]
+        clocking_bits = self.parameters.clocking_bits
+        result = []
+        for clocked in ((True, True, True), (True, True, False), (True, False, True), (False, True, True)):
+            previous = [reversed_registers[j] if clocked[j] else registers[j] for j in range(3)]
+            bits = [(previous[j] >> clocking_bits[j]) & 1 for j in range(3)]
+            majority = (bits[0] & bits[1]) | (bits[0] & bits[2]) | (bits[1] & bits[2])
+            if all((bits[j] == majority) == clocked[j] for j in range(3)):
+                result.append(self.pack(*previous))
+        return result
+
+    def backclock(self, state, cycles):
+        """
+            :return set with all states, which reach the given state after
+                    the given number of majority clocking cycles
+        """
+        states = {state}
+        for i in range(cycles):
+            states = {previous for current in states for previous in self.predecessors(current)}
+            if not states:
+                break
+        return states
+
+    def session_keys(self, loaded_state, frame_counter):
+        """
+            Inverts the linear key and frame counter loading
+            :param loaded_state: state before the warm-up
+            :return list with all session keys which produce this state
+        """
+        target = loaded_state ^ self.load(0, frame_counter)
+        pivots = {}
+        kernel = []
+        for i, image in enumerate(self.key_images):
+            combination = 1 << i
+            for bit in sorted(pivots, reverse=True):
+                if (image >> bit) & 1:
+                    image ^= pivots[bit][0]
+                    combination ^= pivots[bit][1]
+            if image:
+                pivots[image.bit_length() - 1] = (image, combination)
+            else:
+                kernel.append(combination)
+        key = 0
+        for bit in sorted(pivots, reverse=True):
+            if (target >> bit) & 1:
+                target ^= pivots[bit][0]
+                key ^= pivots[bit][1]
+        if target:
+            return []
+        keys = [key]
+        for vector in kernel:
+            keys += [k ^ vector for k in keys]
+        return keys
+
+    def recover_keys(self, state, position, frame_counter):
+        """
+            Restores the session key from the internal state
+            :param state: state before keystream bit `position`
+            :param position: index of the keystream bit
+            :param frame_counter: frame counter of the keystream
+            :return list with all candidate session keys
+        """
+        keys = []
+        for loaded_state in self.backclock(state, self.parameters.warm_up_cycles + position):
+            keys += self.session_keys(loaded_state, frame_counter)
+        return keys
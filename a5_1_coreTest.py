@@ -0,0 +1,25 @@
+import unittest
+from a5_1 import A5_1
+from a5_1_core import A51Core, A51Parameters
+
+
+class A51CoreTest(unittest.TestCase):
+
+    def test_matches_a5_1(self):
+        key = 0xEFCDAB8967452312
+        frame_counter = 0x000134
+        (send_key, receive_key) = A5_1(key, frame_counter).get_key_stream()
+        self.assertEqual(A51Core().generate(key, frame_counter), (send_key.int_val(), receive_key.int_val()))
+
+    def test_recover_keys(self):
+        core = A51Core(A51Parameters.reduced((5, 6, 7)))
+        key = 0x2a5f3
+        frame_counter = 0x5c
+        state = core.clock(core.initial_state(key, frame_counter), 7)
+        keys = core.recover_keys(state, 7, frame_counter)
+        self.assertIn(key, keys)
+        for candidate in keys:
+            self.assertEqual(core.clock(core.initial_state(candidate, frame_counter), 7), state)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,33 @@
 from lfsr import LFSR
 from BitVector import BitVector
 import copy
-from constant import *
-import math
+import importlib.util
+import sys
+from cipher_spec import A5_2_SPEC
+
+# kernels module (it imports numpy), loaded on first use if numba is
+# installed or if another module has already imported it
+_kernels = None
+_numba_installed = None
+
+
+def enabled_kernels():
+    """
+        :return the kernels module if the kernels are enabled, otherwise
+                None. Generating keystreams without Numba does not import
+                numpy.
+    """
+    global _kernels, _numba_installed
+    if _kernels is None:
+        _kernels = sys.modules.get('kernels')
+        if _kernels is None:
+            if _numba_installed is None:
+                _numba_installed = importlib.util.find_spec('numba') is not None
+            if not _numba_installed:
+                return None
+            import kernels
+            _kernels = kernels
+    return _kernels if _kernels.enabled else None
 
 
 class A5_2(object):
@@ -11,26 +36,35 @@ class A5_2(object):
         A key stream for a given session key and the corresponding frame
         counter can be generated
     """
-    def __init__(self, key, frame_counter):
+    def __init__(self, key, frame_counter, spec=None):
         """
             Creates an A5/2 Object
             :param key: 64 bit Session Key
             :param frame_counter: 22 bit frame counter
-        """
-        if not (key >= 0 and key < math.pow(2, KEY_SIZE)):
-            raise ValueError('Key value must be between 0 and 2^64!')
-        if not (frame_counter >= 0 and frame_counter < math.pow(2, FRAME_COUNTER_SIZE)):
-            raise ValueError('Frame counter value must be between 0 and 2^22!')
-        self.r1 = LFSR(R1_SIZE, [], R1_TAPS, R1_MAJORITY_BITS, R1_NEGATED_BIT)
-        self.r2 = LFSR(R2_SIZE, [], R2_TAPS, R2_MAJORITY_BITS, R2_NEGATED_BIT)
-        self.r3 = LFSR(R3_SIZE, [], R3_TAPS, R3_MAJORITY_BITS, R3_NEGATED_BIT)
-        self.r4 = LFSR(R4_SIZE, R4_CLOCK_BITS, R4_TAPS, [], None)
-        self.key = BitVector(size=KEY_SIZE, intVal=key)
-        self.frame_counter = BitVector(size=FRAME_COUNTER_SIZE,
+            :param spec: Optional CipherSpec (default: A5/2)
+        """
+        self.spec = spec or A5_2_SPEC
+        if not (key >= 0 and key < 2 ** self.spec.key_size):
+            raise ValueError('Key value must be between 0 and 2^' + str(self.spec.key_size) + '!')
+        if not (frame_counter >= 0 and frame_counter < 2 ** self.spec.frame_counter_size):
+            raise ValueError('Frame counter value must be between 0 and 2^' + str(self.spec.frame_counter_size) + '!')
+        self._create_registers()
+        self.key = BitVector(size=self.spec.key_size, intVal=key)
+        self.frame_counter = BitVector(size=self.spec.frame_counter_size,
                                        intVal=frame_counter)
-        self.key_stream = BitVector(size=KEY_STREAM_SIZE)
+        self.key_stream = BitVector(size=self.spec.keystream_size)
         self.register_states = []
 
+    def _create_registers(self, r1=None, r2=None, r3=None, r4=None):
+        """
+            Creates the registers r1, r2, r3 and r4, optionally with the
+            given values as bitstrings
+        """
+        self.r1 = LFSR.from_spec(self.spec.r1, bitstring=r1)
+        self.r2 = LFSR.from_spec(self.spec.r2, bitstring=r2)
+        self.r3 = LFSR.from_spec(self.spec.r3, bitstring=r3)
+        self.r4 = LFSR.from_spec(self.spec.r4, bitstring=r4)
+
     def get_key_stream_with_predefined_registers(self, r1, r2, r3, r4, generate_only_send_key=False):
         """
             Sets the registers to the specified values (r1, r2, r3 and r4)
@@ -43,12 +77,9 @@ class A5_2(object):
                                            Useful for checking the correct register values in the attack
             :return the generated key stream
         """
-        self.r1 = LFSR(R1_SIZE, [], R1_TAPS, R1_MAJORITY_BITS, R1_NEGATED_BIT, bitstring=r1)
-        self.r2 = LFSR(R2_SIZE, [], R2_TAPS, R2_MAJORITY_BITS, R2_NEGATED_BIT, bitstring=r2)
-        self.r3 = LFSR(R3_SIZE, [], R3_TAPS, R3_MAJORITY_BITS, R3_NEGATED_BIT, bitstring=r3)
-        self.r4 = LFSR(R4_SIZE, R4_CLOCK_BITS, R4_TAPS, [], None, bitstring=r4)
+        self._create_registers(r1, r2, r3, r4)
 
-        self._clocking_with_majority(MAJORITY_CYCLES_A52)
+        self._clocking_with_majority(self.spec.warm_up_cycles)
         self._generate_key_stream(generate_only_send_key=generate_only_send_key)
         return (self.send_key, self.receive_key)
 
@@ -65,10 +96,10 @@ class A5_2(object):
         """
             Sets the bits R1[15] = 1, R2[16] = 1, R3[18] = 1, R4[10] = 1.
         """
-        self.r1.set_bit(FORCE_R1_BIT_TO_1, 1)
-        self.r2.set_bit(FORCE_R2_BIT_TO_1, 1)
-        self.r3.set_bit(FORCE_R3_BIT_TO_1, 1)
-        self.r4.set_bit(FORCE_R4_BIT_TO_1, 1)
+        self.r1.set_bit(self.spec.r1.forced_bit, 1)
+        self.r2.set_bit(self.spec.r2.forced_bit, 1)
+        self.r3.set_bit(self.spec.r3.forced_bit, 1)
+        self.r4.set_bit(self.spec.r4.forced_bit, 1)
 
     def _clocking(self, limit, vector):
         """
@@ -77,6 +108,15 @@ class A5_2(object):
             :param vector: either the session key or the frame counter.
                            In each cycle a bit is XORed  to the first position.
         """
+        kernels = enabled_kernels()
+        if kernels is not None:
+            import numpy as np
+            registers = self._register_values()
+            bits = np.array([vector[i] for i in reversed(range(limit))], dtype=np.uint8)
+            arrays = kernels.spec_arrays(self.spec)
+            kernels.load_registers(registers, arrays.size_masks, arrays.tap_masks, bits)
+            self._set_register_values(registers)
+            return
         for i in reversed(range(limit)):
             self.r1.clock(vector[i])
             self.r2.clock(vector[i])
@@ -94,13 +134,18 @@ class A5_2(object):
                                          register states in each clock cycle
                                          should be saved
         """
+        kernels = None if save_register_states else enabled_kernels()
+        if kernels is not None:
+            self._clocking_with_majority_kernel(kernels, limit, generate_key_stream)
+            return
+        (bit_for_r1, bit_for_r2, bit_for_r3) = self.spec.clocking_bits
         for i in range(limit):
             majority = self._majority()
-            if self.r4.get_bit(R4_CLOCKING_BIT_FOR_R1) == majority:
+            if self.r4.get_bit(bit_for_r1) == majority:
                 self.r1.clock()
-            if self.r4.get_bit(R4_CLOCKING_BIT_FOR_R2) == majority:
+            if self.r4.get_bit(bit_for_r2) == majority:
                 self.r2.clock()
-            if self.r4.get_bit(R4_CLOCKING_BIT_FOR_R3) == majority:
+            if self.r4.get_bit(bit_for_r3) == majority:
                 self.r3.clock()
             self.r4.clock()
             if generate_key_stream:
@@ -110,15 +155,42 @@ class A5_2(object):
                                                  'r3': copy.deepcopy(self.r3)})
                 self._add_key_stream_bit(i)
 
+    def _clocking_with_majority_kernel(self, kernels, limit, generate_key_stream):
+        """
+            _clocking_with_majority with the compiled kernel
+        """
+        import numpy as np
+        registers = self._register_values()
+        output = np.zeros(limit if generate_key_stream else 0, dtype=np.uint8)
+        arrays = kernels.spec_arrays(self.spec)
+        kernels.clock_with_majority(registers, arrays.size_masks, arrays.tap_masks, arrays.top_bits,
+                                    arrays.majority_bits, arrays.clock_bits, arrays.clocking_bits, limit, output)
+        self._set_register_values(registers)
+        for i in range(output.shape[0]):
+            self.key_stream[i] = int(output[i])
+
+    def _register_values(self):
+        """
+            :return int64 array with r1, r2, r3 and r4 (bit i is R[i])
+        """
+        import numpy as np
+        return np.array([register.register.int_val() for register in (self.r1, self.r2, self.r3, self.r4)],
+                        dtype=np.int64)
+
+    def _set_register_values(self, values):
+        for register, value in zip((self.r1, self.r2, self.r3, self.r4), values):
+            register.register = BitVector(size=register.length, intVal=int(value))
+
     def _generate_key_stream(self, save_register_states=False, generate_only_send_key=False):
         """
             Generates 114 bits for the send key and 114 bits for the receive
             key.
         """
-        self._clocking_with_majority(KEY_STREAM_SIZE, save_register_states=save_register_states, generate_key_stream=True)
+        self._clocking_with_majority(self.spec.keystream_size, save_register_states=save_register_states,
+                                     generate_key_stream=True)
         if not generate_only_send_key:
             self.send_key = self.key_stream.deep_copy()
-            self._clocking_with_majority(KEY_STREAM_SIZE, save_register_states=save_register_states, generate_key_stream=True)
+            self._clocking_with_majority(self.spec.keystream_size, save_register_states=save_register_states, generate_key_stream=True)
             self.receive_key = self.key_stream.deep_copy()
         else:
             self.send_key = self.key_stream
@@ -139,11 +211,11 @@ class A5_2(object):
                                          should be saved
             :return key stream as pair (send_key, receive_key) 
         """
-        self._clocking(KEY_SIZE, self.key)
-        self._clocking(FRAME_COUNTER_SIZE, self.frame_counter)
+        self._clocking(self.spec.key_size, self.key)
+        self._clocking(self.spec.frame_counter_size, self.frame_counter)
         self._set_bits()
         self._create_register_backup()
-        self._clocking_with_majority(MAJORITY_CYCLES_A52)
+        self._clocking_with_majority(self.spec.warm_up_cycles)
         self._generate_key_stream(save_register_states, generate_only_send_key=generate_only_send_key)
 
         return (self.send_key, self.receive_key)
@@ -0,0 +1,151 @@
+import numpy as np
+import itertools
+
+
+def pack_rows(matrix):
+    """
+        Packs the rows of a binary matrix with at most 64 columns into
+        unsigned 64 bit integers. Column 0 is the most significant bit.
+        :param matrix: 2D array with values 0 and 1
+        :return 1D uint64 array with one integer per row
+    """
+    matrix = np.asarray(matrix, dtype=np.uint8)
+    rows, columns = matrix.shape
+    padded = np.zeros((rows, 64), dtype=np.uint8)
+    padded[:, :columns] = matrix
+    return np.packbits(padded, axis=1).view('>u8').astype(np.uint64).reshape(rows)
+
+
+def unpack_rows(rows, columns):
+    """
+        Inverse of pack_rows
+        :param rows: packed rows
+        :param columns: number of columns
+        :return 2D int array with values 0 and 1
+    """
+    packed = np.array(rows, dtype=np.uint64).astype('>u8').view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(packed, axis=1)[:, :columns].astype(int)
+
+
+def unpack_row(value, columns):
+    """
+        :param value: packed row
+        :param columns: number of columns
+        :return list with the bits of the row (column 0 first)
+    """
+    value = int(value)
+    return [(value >> (63 - i)) & 1 for i in range(columns)]
+
+
+class BatchMatrix(object):
+    """
+        A stack of systems of binary linear equations with the same shape.
+        The Gauss-Jordan elimination runs in lockstep over all systems: in
+        each step the same column is processed for every system, the pivot
+        selection is masked per system.
+    """
+    def __init__(self, rows, b, columns):
+        """
+            :param rows: uint64 array with shape (systems, rows), each row
+                         is packed with pack_rows
+            :param b: array with shape (systems, rows) with the right-hand
+                      sides of the equations
+            :param columns: number of variables (at most 64)
+        """
+        self.rows = np.array(rows, dtype=np.uint64)
+        self.b = np.array(b, dtype=np.uint8)
+        self.columns = columns
+        self.systems, self.number_of_rows = self.rows.shape
+        self.rank = None
+        self.pivot_columns = None
+        self.consistent = None
+
+    def eliminate(self):
+        """
+            Transforms all systems into reduced row echelon form and computes
+            the rank and the consistency of every system
+        """
+        systems = self.systems
+        rows = self.rows
+        b = self.b
+        system_index = np.arange(systems)
+        row_index = np.arange(self.number_of_rows)
+        rank = np.zeros(systems, dtype=np.int64)
+        pivot_columns = np.full((systems, min(self.number_of_rows, self.columns)), -1, dtype=np.int64)
+        for column in range(self.columns):
+            bit = np.uint64(1 << (63 - column))
+            has_bit = (rows & bit) != 0
+            eligible = has_bit & (row_index[None, :] >= rank[:, None])
+            found = eligible.any(axis=1)
+            if not found.any():
+                continue
+            pivot = eligible.argmax(axis=1)
+            target = np.minimum(rank, self.number_of_rows - 1)
+            # swap the pivot row with the first row below the echelon
+            pivot_row, target_row = rows[system_index, pivot], rows[system_index, target]
+            pivot_b, target_b = b[system_index, pivot], b[system_index, target]
+            rows[system_index, target] = np.where(found, pivot_row, target_row)
+            rows[system_index, pivot] = np.where(found, target_row, pivot_row)
+            b[system_index, target] = np.where(found, pivot_b, target_b)
+            b[system_index, pivot] = np.where(found, target_b, pivot_b)
+            # clear the column in all other rows
+            pivot_row = rows[system_index, target]
+            pivot_b = b[system_index, target]
+            mask = ((rows & bit) != 0) & found[:, None]
+            mask[system_index, target] = False
+            rows ^= pivot_row[:, None] * mask
+            b ^= mask & pivot_b[:, None]
+            found_systems = np.nonzero(found)[0]
+            pivot_columns[found_systems, rank[found_systems]] = column
+            rank += found
+        self.rank = rank
+        self.pivot_columns = pivot_columns
+        self.consistent = ~((b == 1) & (row_index[None, :] >= rank[:, None])).any(axis=1)
+        return self
+
+    def free_columns(self, system):
+        """
+            :return list with the columns of the free variables of a system
+        """
+        pivots = set(self.pivot_columns[system, :self.rank[system]].tolist())
+        return [column for column in range(self.columns) if column not in pivots]
+
+    def nullspace_dimension(self):
+        """
+            :return array with the number of free variables of each system
+        """
+        return self.columns - self.rank
+
+    def solutions(self, system):
+        """
+            Lists all solutions of a consistent system (2^k solutions for k
+            free variables). The free variables iterate over all
+            combinations.
+            :param system: index of the system
+            :return list with all solutions, each as list of bits
+                    (same format as Matrix.gauss)
+        """
+        return list(self.iter_solutions(system))
+
+    def iter_solutions(self, system):
+        """
+            Generator version of solutions, the solutions are created one
+            after another
+        """
+        if not self.consistent[system]:
+            return
+        rank = int(self.rank[system])
+        pivots = self.pivot_columns[system, :rank].tolist()
+        rows = [int(row) for row in self.rows[system, :rank]]
+        b = self.b[system, :rank].tolist()
+        free = self.free_columns(system)
+        for combination in itertools.product([0, 1], repeat=len(free)):
+            x = [0] * self.columns
+            for column, value in zip(free, combination):
+                x[column] = value
+            for row, column, value in zip(rows, pivots, b):
+                for free_column in free:
+                    if x[free_column] and (row >> (63 - free_column)) & 1:
+                        value ^= 1
+                x[column] = value
+            yield x
@@ -0,0 +1,33 @@
+import unittest
+import itertools
+import numpy as np
+from batch_matrix import BatchMatrix, pack_rows
+
+
+class BatchMatrixTest(unittest.TestCase):
+
+    def test_solutions_match_brute_force(self):
+        rng = np.random.RandomState(42)
+        systems, rows, columns = 40, 10, 6
+        matrices = rng.randint(0, 2, (systems, rows, columns))
+        matrices[:10, :, :2] = 0
+        x = rng.randint(0, 2, (systems, columns))
+        b = np.einsum('src,sc->sr', matrices, x) % 2
+        b[30:] ^= rng.randint(0, 2, (10, rows))
+        batch = BatchMatrix(np.stack([pack_rows(m) for m in matrices]), b, columns).eliminate()
+        for s in range(systems):
+            expected = [list(v) for v in itertools.product([0, 1], repeat=columns)
+                        if ((matrices[s].dot(v) % 2) == b[s]).all()]
+            self.assertEqual(sorted(batch.solutions(s)), expected)
+            self.assertEqual(bool(batch.consistent[s]), bool(expected))
+
+    def test_rank_and_nullspace(self):
+        matrix = np.array([[1, 0, 1], [0, 1, 1], [1, 1, 0]])
+        batch = BatchMatrix(pack_rows(matrix)[None, :], np.array([[1, 0, 1]]), 3).eliminate()
+        self.assertEqual(batch.rank[0], 2)
+        self.assertEqual(batch.nullspace_dimension()[0], 1)
+        self.assertTrue(batch.consistent[0])
+        self.assertEqual(len(batch.solutions(0)), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,355 @@
+import argparse
+import copy
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from BitVector import BitVector
+from a5_1 import A5_1
+from a5_2 import A5_2
+from lfsr import LFSR
+from matrix import Matrix
+from gww_registers import GwwRegisters
+from batch_matrix import BatchMatrix, pack_rows
+from decrypt import DEFAULT_CHUNK_SIZE, bulk_keystreams
+import gww_attack
+import kernels
+import numpy as np
+from constant import *
+
+DEFAULT_SEED = 2018
+DEFAULT_THRESHOLD = 0.1
+# baseline committed with the repository
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+# R4[10] is always 1, therefore only half of the 2^17 values are candidates
+R4_CANDIDATES = 2 ** (R4_SIZE - 1)
+
+
+class Workload(object):
+    """
+        Reproducible attack input: a random session key, two frame counters
+        with F1 XOR F2 = 2048 and the corresponding keystreams and R4 value
+    """
+    def __init__(self, seed):
+        rng = random.Random(seed)
+        self.rng = rng
+        self.key = rng.getrandbits(KEY_SIZE)
+        f1 = rng.getrandbits(FRAME_COUNTER_SIZE) & ~FRAME_COUNTER_DIFFERENCE
+        f2 = f1 ^ FRAME_COUNTER_DIFFERENCE
+        a52 = A5_2(self.key, f1)
+        (self.k1, _) = a52.get_key_stream()
+        (self.k2, _) = A5_2(self.key, f2).get_key_stream()
+        self.f1 = BitVector(size=FRAME_COUNTER_SIZE, intVal=f1)
+        self.f2 = BitVector(size=FRAME_COUNTER_SIZE, intVal=f2)
+        self.r4 = a52.initial_sates['r4']
+
+    def clocked_registers(self, r4):
+        """
+            :return GwwRegisters after the 99 clocking cycles with r4
+        """
+        registers = GwwRegisters(self.f1, self.f2)
+        for i in range(MAJORITY_CYCLES_A52):
+            registers.clock_with_r4(r4)
+        return registers
+
+    def key_difference(self):
+        return list(self.k1 ^ self.k2)
+
+    def random_r4(self):
+        """
+            :return random R4 candidate (R4[10] = 1) as LFSR object
+        """
+        r4 = LFSR(R4_SIZE, R4_CLOCK_BITS, R4_TAPS, [], None, None, self.rng.getrandbits(R4_SIZE))
+        r4.set_bit(FORCE_R4_BIT_TO_1, 1)
+        return r4
+
+    def built_matrix(self, r4=None):
+        """
+            :return tuple (matrix, k) with the equation system for r4
+                    (default: the correct R4)
+        """
+        r4 = copy.deepcopy(r4 or self.r4)
+        registers = self.clocked_registers(r4)
+        k = self.key_difference()
+        A = Matrix(MATRIX_ROWS, MATRIX_COLUMNS)
+        A.build_init_register_matrix(registers, r4, k)
+        return A, k
+
+
+def measure(run, prepare=None, number=10):
+    """
+        Runs a function several times and measures each call
+        :param run: function to measure
+        :param prepare: optional function that returns the arguments for
+                        run. Its runtime is not measured.
+        :param number: number of calls
+        :return list with the runtime of each call in seconds
+    """
+    timings = []
+    for i in range(number):
+        args = prepare() if prepare else ()
+        start = time.perf_counter()
+        run(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def bench_lfsr_clock(workload, number):
+    r1 = LFSR(R1_SIZE, [], R1_TAPS, R1_MAJORITY_BITS, R1_NEGATED_BIT, int_value=workload.rng.getrandbits(R1_SIZE))
+    return measure(r1.clock, number=number)
+
+
+def bench_a5_1_keystream(workload, number):
+    return measure(lambda: A5_1(workload.key, workload.f1.int_val()).get_key_stream(), number=number)
+
+
+def bench_a5_2_keystream(workload, number):
+    return measure(lambda: A5_2(workload.key, workload.f1.int_val()).get_key_stream(), number=number)
+
+
+def bench_gww_register_clock(workload, number):
+    registers = workload.clocked_registers(copy.deepcopy(workload.r4))
+    return measure(registers.r1.clock, number=number)
+
+
+def bench_gww_g_delta(workload, number):
+    registers = workload.clocked_registers(copy.deepcopy(workload.r4))
+    return measure(lambda: registers.r1.g_delta(0), number=number)
+
+
+def bench_build_init_register_matrix(workload, number):
+    def prepare():
+        r4 = copy.deepcopy(workload.r4)
+        return (workload.clocked_registers(r4), r4, workload.key_difference())
+
+    def run(registers, r4, k):
+        Matrix(MATRIX_ROWS, MATRIX_COLUMNS).build_init_register_matrix(registers, r4, k)
+    return measure(run, prepare, number)
+
+
+def bench_matrix_gauss(workload, number):
+    A, k = workload.built_matrix()
+
+    def prepare():
+        B = Matrix(MATRIX_ROWS, MATRIX_COLUMNS)
+        B.matrix = A.matrix.copy()
+        return (B, list(k))
+    return measure(lambda B, b: B.gauss(b), prepare, number)
+
+
+def bench_is_solvable(workload, number):
+    A, k = workload.built_matrix()
+    return measure(lambda: A.is_solvable(k), number=number)
+
+
+def bench_check_gauss_solution(workload, number):
+    A, k = workload.built_matrix()
+    solutions = A.gauss(k)
+    return measure(lambda: gww_attack.check_gauss_solution(solutions, workload.r4, workload.k1, workload.f1),
+                   number=number)
+
+
+def bench_perform_attack(workload, number):
+    gww_attack.init_pool(None)
+
+    def prepare():
+        return (workload.random_r4(),)
+    return measure(lambda r4: gww_attack.perform_attack(r4, workload.k1, workload.k2, workload.f1, workload.f2,
+                                                        r4_given=True),
+                   prepare, number)
+
+
+def bench_build_packed_system(workload, number):
+    k = workload.key_difference()
+    difference = (workload.f1 ^ workload.f2).int_val()
+    gww_attack.build_packed_system(workload.r4.register.int_val(), k, difference)
+
+    def prepare():
+        return (workload.random_r4().register.int_val(),)
+    return measure(lambda r4_value: gww_attack.build_packed_system(r4_value, k, difference), prepare, number)
+
+
+def bench_batch_elimination(workload, number, batch_size=256):
+    k = workload.key_difference()
+    difference = (workload.f1 ^ workload.f2).int_val()
+
+    def prepare():
+        # distinct systems, as in the sweep every candidate has its own
+        r4_values = set()
+        while len(r4_values) < batch_size:
+            r4_values.add(workload.random_r4().register.int_val())
+        systems = [gww_attack.build_packed_system(r4_value, k, difference) for r4_value in r4_values]
+        rows = np.stack([np.asarray(system[0], dtype=np.uint64) for system in systems])
+        b = np.array([system[1] for system in systems])
+        return (rows, b)
+    timings = measure(lambda rows, b: BatchMatrix(rows, b, MATRIX_COLUMNS).eliminate(), prepare, number)
+    return [t / batch_size for t in timings]
+
+
+def bench_perform_batch_attack(workload, number, batch_size=256):
+    gww_attack.init_pool(None)
+
+    def prepare():
+        r4_values = []
+        while len(r4_values) < batch_size:
+            value = workload.rng.getrandbits(R4_SIZE) | (1 << FORCE_R4_BIT_TO_1)
+            if value != workload.r4.register.int_val():
+                r4_values.append(value)
+        return (r4_values,)
+    timings = measure(lambda r4_values: gww_attack.perform_batch_attack(r4_values, workload.k1, workload.k2,
+                                                                         workload.f1, workload.f2),
+                      prepare, number)
+    return [t / batch_size for t in timings]
+
+
+def bench_bulk_keystreams(workload, number, frames=DEFAULT_CHUNK_SIZE):
+    # one work unit of decrypt.py, send and receive keystreams
+    frame_numbers = np.array([workload.rng.getrandbits(FRAME_COUNTER_SIZE) for i in range(frames)], dtype=np.uint32)
+    timings = measure(lambda: bulk_keystreams(workload.key, frame_numbers), number=number)
+    return [t / frames for t in timings]
+
+
+# name -> (benchmark function, number of measured calls)
+BENCHMARKS = [
+    ('lfsr_clock', bench_lfsr_clock, 1000),
+    ('a5_1_keystream', bench_a5_1_keystream, 10),
+    ('a5_2_keystream', bench_a5_2_keystream, 10),
+    ('gww_register_clock', bench_gww_register_clock, 1000),
+    ('gww_g_delta', bench_gww_g_delta, 1000),
+    ('build_init_register_matrix', bench_build_init_register_matrix, 5),
+    ('matrix_gauss', bench_matrix_gauss, 5),
+    ('is_solvable', bench_is_solvable, 20),
+    ('check_gauss_solution', bench_check_gauss_solution, 3),
+    ('perform_attack', bench_perform_attack, 5),
+    ('build_packed_system', bench_build_packed_system, 100),
+    ('batch_elimination', bench_batch_elimination, 5),
+    ('perform_batch_attack', bench_perform_batch_attack, 5),
+    ('bulk_keystreams', bench_bulk_keystreams, 5),
+]
+
+
+def summarize(timings):
+    """
+        :param timings: measured runtimes in seconds
+        :return dictionary with statistics per call
+    """
+    return {'calls': len(timings),
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0}
+
+
+def run_benchmarks(seed=DEFAULT_SEED, names=None, factor=1.0, processes=8):
+    """
+        Runs the benchmarks
+        :param seed: seed for the workload and the random R4 candidates
+        :param names: optional list of benchmark names to run
+        :param factor: multiplies the number of measured calls
+        :param processes: number of processes used for the sweep projection
+        :return dictionary with the results
+    """
+    results = {}
+    for name, benchmark, number in BENCHMARKS:
+        if names and name not in names:
+            continue
+        workload = Workload(seed)
+        timings = benchmark(workload, max(1, int(number * factor)))
+        results[name] = summarize(timings)
+    report = {'meta': {'seed': seed,
+                       'backend': kernels.backend,
+                       'python': platform.python_version(),
+                       'platform': platform.platform(),
+                       'timestamp': time.time()},
+              'results': results}
+    sweep = 'perform_batch_attack' if 'perform_batch_attack' in results else 'perform_attack'
+    if sweep in results:
+        per_candidate = results[sweep]['median']
+        report['projection'] = {'benchmark': sweep,
+                                'per_candidate': per_candidate,
+                                'candidates': R4_CANDIDATES,
+                                'processes': processes,
+                                'full_sweep': per_candidate * R4_CANDIDATES / processes}
+    return report
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+        Compares the medians of a report with a stored baseline
+        :param threshold: allowed relative slowdown (0.1 = 10 %)
+        :return list with tuples (name, baseline, current, ratio, regression)
+    """
+    rows = []
+    for name, result in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        old = baseline['results'][name]['median']
+        new = result['median']
+        ratio = new / old if old else float('inf')
+        rows.append((name, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def format_report(report):
+    lines = ['kernel backend: ' + report['meta']['backend'], '']
+    lines += ['{:<28} {:>8} {:>14} {:>14} {:>14}'.format('benchmark', 'calls', 'min [s]', 'median [s]', 'mean [s]')]
+    for name, result in report['results'].items():
+        lines.append('{:<28} {:>8} {:>14.6g} {:>14.6g} {:>14.6g}'.format(name, result['calls'], result['min'],
+                                                                        result['median'], result['mean']))
+    if 'projection' in report:
+        projection = report['projection']
+        lines.append('')
+        lines.append('per R4 candidate: {:.6g} s, projected full sweep ({} candidates, {} processes): {:.1f} s'.format(
+            projection['per_candidate'], projection['candidates'], projection['processes'],
+            projection['full_sweep']))
+    if 'bulk_keystreams' in report['results']:
+        lines.append('decryption: {:.0f} frames/s per process'.format(
+            1 / report['results']['bulk_keystreams']['median']))
+    return '\n'.join(lines)
+
+
+def format_comparison(rows):
+    lines = ['{:<28} {:>14} {:>14} {:>8}'.format('benchmark', 'baseline [s]', 'current [s]', 'ratio')]
+    for name, old, new, ratio, regression in rows:
+        lines.append('{:<28} {:>14.6g} {:>14.6g} {:>8.2f}{}'.format(name, old, new, ratio,
+                                                                   '  REGRESSION' if regression else ''))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for the hot paths of the A5/2 attack')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--only', nargs='+', metavar='NAME', choices=[b[0] for b in BENCHMARKS],
+                        help='run only the given benchmarks')
+    parser.add_argument('--factor', type=float, default=1.0, help='multiplies the number of measured calls')
+    parser.add_argument('--processes', type=int, default=8, help='processes for the full sweep projection')
+    parser.add_argument('--save', metavar='FILE', help='store the results as JSON baseline')
+    parser.add_argument('--compare', metavar='FILE', nargs='?', const=DEFAULT_BASELINE,
+                        help='compare the results with a JSON baseline (default: ' +
+                             os.path.basename(DEFAULT_BASELINE) + ' of the repository)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='allowed relative slowdown before a regression is reported')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.seed, args.only, args.factor, args.processes)
+    print(format_report(report))
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report, baseline, args.threshold)
+        print('')
+        if baseline['meta'].get('backend') != report['meta']['backend']:
+            print('the baseline was measured with the kernel backend ' + str(baseline['meta'].get('backend')))
+        print(format_comparison(rows))
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
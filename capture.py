@@ -0,0 +1,224 @@
+import mmap
+import os
+import struct
+import numpy as np
+from constant import *
+
+MAGIC = b'A5CAP001'
+# magic, record size, reserved
+HEADER_FORMAT = '<8sII'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# bytes of a burst field (114 bits, most significant bit first, zero padded)
+BURST_BYTES = 16
+DIRECTION_SEND = 0
+DIRECTION_RECEIVE = 1
+# the record contains the known plaintext
+FLAG_PLAINTEXT = 1
+
+RECORD_DTYPE = np.dtype([('frame_number', '<u4'), ('session', '<u4'), ('direction', 'u1'), ('flags', 'u1'),
+                         ('reserved', 'u1', (2,)), ('ciphertext', 'u1', (BURST_BYTES,)),
+                         ('plaintext', 'u1', (BURST_BYTES,))])
+
+
+def bursts_to_bytes(values):
+    """
+        :param values: bursts as 114 bit integers
+        :return uint8 array (n x 16), most significant bit first
+    """
+    shift = BURST_BYTES * 8 - KEY_STREAM_SIZE
+    data = b''.join((value << shift).to_bytes(BURST_BYTES, 'big') for value in values)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, BURST_BYTES)
+
+
+def bytes_to_bursts(data):
+    """
+        :param data: uint8 array (n x 16)
+        :return list with the bursts as 114 bit integers
+    """
+    shift = BURST_BYTES * 8 - KEY_STREAM_SIZE
+    return [int.from_bytes(row.tobytes(), 'big') >> shift for row in np.asarray(data, dtype=np.uint8)]
+
+
+class CaptureWriter(object):
+    """
+        Appends records to a capture file
+    """
+    def __init__(self, path):
+        self.file = open(path, 'wb')
+        self.file.write(struct.pack(HEADER_FORMAT, MAGIC, RECORD_DTYPE.itemsize, 0))
+        self.records = 0
+
+    def write(self, frame_numbers, ciphertexts, plaintexts=None, directions=DIRECTION_SEND, sessions=0):
+        """
+            Writes a block of records
+            :param frame_numbers: frame counters
+            :param ciphertexts: bursts as integers or uint8 array (n x 16)
+            :param plaintexts: Optional, known plaintext in the same format
+            :param directions: direction of all records or one per record
+            :param sessions: session id of all records or one per record
+        """
+        frame_numbers = np.asarray(frame_numbers, dtype=np.uint32)
+        records = np.zeros(len(frame_numbers), dtype=RECORD_DTYPE)
+        records['frame_number'] = frame_numbers
+        records['session'] = sessions
+        records['direction'] = directions
+        records['ciphertext'] = self._bursts(ciphertexts)
+        if plaintexts is not None:
+            records['plaintext'] = self._bursts(plaintexts)
+            records['flags'] = FLAG_PLAINTEXT
+        self.write_records(records)
+
+    def write_records(self, records):
+        """
+            Writes records in the format RECORD_DTYPE
+        """
+        self.file.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+        self.records += len(records)
+
+    @staticmethod
+    def _bursts(values):
+        if isinstance(values, np.ndarray) and values.dtype == np.uint8:
+            return values
+        return bursts_to_bytes(values)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class Capture(object):
+    """
+        Capture file opened with mmap. The records are a NumPy structured
+        array on top of the mapping, so selecting and slicing them does not
+        copy or parse the file.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        if os.fstat(self.file.fileno()).st_size < HEADER_SIZE:
+            self.file.close()
+            raise ValueError(path + ' is not a capture file!')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, record_size, reserved) = struct.unpack_from(HEADER_FORMAT, self.map)
+        if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+            self.map.close()
+            self.file.close()
+            raise ValueError(path + ' is not a capture file!')
+        count = (len(self.map) - HEADER_SIZE) // record_size
+        self.records = np.frombuffer(self.map, dtype=RECORD_DTYPE, count=count, offset=HEADER_SIZE)
+
+    def close(self):
+        self.records = None
+        try:
+            self.map.close()
+        except BufferError:
+            # views of the records are still in use, the mapping is
+            # released together with them
+            pass
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self.records)
+
+    def select(self, session=None, direction=None, known_plaintext=False):
+        """
+            :return view or array with the matching records
+        """
+        mask = np.ones(len(self.records), dtype=bool)
+        if session is not None:
+            mask &= self.records['session'] == session
+        if direction is not None:
+            mask &= self.records['direction'] == direction
+        if known_plaintext:
+            mask &= (self.records['flags'] & FLAG_PLAINTEXT) != 0
+        if mask.all():
+            return self.records
+        return self.records[mask]
+
+    def chunks(self, size=1 << 20):
+        """
+            Generates views of at most size records
+        """
+        for start in range(0, len(self.records), size):
+            yield self.records[start:start + size]
+
+
+def keystreams(records):
+    """
+        Derives the keystreams of records with known plaintext
+        :return packed keystreams as uint8 array (n x 16)
+    """
+    return np.bitwise_xor(records['ciphertext'], records['plaintext'])
+
+
+def keystream_bits(records):
+    """
+        :return keystreams as uint8 array with one bit per entry (n x 114)
+    """
+    return np.unpackbits(keystreams(records), axis=1)[:, :KEY_STREAM_SIZE]
+
+
+def paired_records(frame_numbers, spec=None):
+    """
+        :param frame_numbers: frame counters as array
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return bool array, True for the records whose frame counter has a
+                usable difference to the frame counter of another record
+    """
+    from frame_difference import usable_differences
+    frame_numbers = np.asarray(frame_numbers, dtype=np.uint32)
+    known = np.unique(frame_numbers)
+    paired = np.zeros(len(frame_numbers), dtype=bool)
+    if not len(known):
+        return paired
+    for difference in usable_differences(spec):
+        targets = frame_numbers ^ np.uint32(difference)
+        positions = np.minimum(np.searchsorted(known, targets), len(known) - 1)
+        paired |= known[positions] == targets
+    return paired
+
+
+def attack_frames(capture, session=None, limit=None, spec=None):
+    """
+        Selects the send bursts with known plaintext for the attack. Only
+        records with a usable frame counter difference to another record are
+        considered, in the order of the capture. Up to limit records are
+        taken, each together with one of its partners.
+        :param limit: Optional, maximum number of frames
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return list with tuples (keystream, frame counter), as expected by
+                gww_attack.select_frame_pair
+    """
+    from frame_difference import usable_differences
+    records = capture.select(session, DIRECTION_SEND, known_plaintext=True)
+    frame_numbers = records['frame_number']
+    candidates = np.flatnonzero(paired_records(frame_numbers, spec))
+    if limit is not None and len(candidates) > limit:
+        # the first record of every frame counter, to look up the partners
+        (known, first) = np.unique(frame_numbers, return_index=True)
+        differences = np.array(usable_differences(spec), dtype=np.uint32)
+        selected = set()
+        for index in candidates.tolist():
+            if len(selected) + 2 > limit:
+                break
+            if index in selected:
+                continue
+            targets = frame_numbers[index] ^ differences
+            positions = np.minimum(np.searchsorted(known, targets), len(known) - 1)
+            partner = first[positions[known[positions] == targets][0]]
+            selected.update((index, int(partner)))
+        candidates = np.array(sorted(selected), dtype=np.int64)
+    records = records[candidates]
+    return list(zip(bytes_to_bursts(keystreams(records)), records['frame_number'].tolist()))
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from a5_2 import A5_2
+from capture import Capture, CaptureWriter, DIRECTION_RECEIVE, DIRECTION_SEND, attack_frames, bursts_to_bytes, \
+    bytes_to_bursts, keystream_bits, keystreams, paired_records
+from constant import *
+
+
+def keystream(key, frame_counter):
+    (send_key, receive_key) = A5_2(key, frame_counter).get_key_stream(generate_only_send_key=True)
+    return send_key.int_val()
+
+
+class CaptureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'capture.a5c')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_burst_conversion(self):
+        values = [0, 1, 2 ** KEY_STREAM_SIZE - 1, 0x3be776c6be64e50294f5b44a9be47]
+        self.assertEqual(bytes_to_bursts(bursts_to_bytes(values)), values)
+        bits = np.unpackbits(bursts_to_bytes([1]), axis=1)
+        self.assertEqual(bits[0, KEY_STREAM_SIZE - 1], 1)
+        self.assertEqual(bits[0, KEY_STREAM_SIZE:].sum(), 0)
+
+    def test_keystreams(self):
+        key = 0xfaf3df3fa6698c0c
+        frames = [0x7c084, 0x7c884, 0x7c085]
+        rng = np.random.RandomState(1)
+        plaintexts = [int(''.join(map(str, rng.randint(0, 2, KEY_STREAM_SIZE))), 2) for frame in frames]
+        ciphertexts = [p ^ keystream(key, f) for p, f in zip(plaintexts, frames)]
+        with CaptureWriter(self.path) as writer:
+            writer.write(frames, ciphertexts, plaintexts, sessions=7)
+            writer.write([0x1234], [5], directions=DIRECTION_RECEIVE, sessions=7)
+        with Capture(self.path) as capture:
+            self.assertEqual(len(capture), 4)
+            self.assertEqual(bytes_to_bursts(capture.records['ciphertext'][:3]), ciphertexts)
+            records = capture.select(session=7, direction=DIRECTION_SEND, known_plaintext=True)
+            self.assertEqual(len(records), 3)
+            self.assertEqual(bytes_to_bursts(keystreams(records)), [keystream(key, f) for f in frames])
+            self.assertEqual(keystream_bits(records).shape, (3, KEY_STREAM_SIZE))
+            self.assertEqual(attack_frames(capture, limit=2), [(keystream(key, f), f) for f in frames[:2]])
+
+    def test_attack_frames(self):
+        # sequential frames, the partners of the first ones come 2048 records later
+        frames = list(range(0x1000, 0x1000 + 2100))
+        rng = np.random.RandomState(2)
+        ciphertexts = rng.randint(0, 256, (len(frames), 16)).astype(np.uint8)
+        plaintexts = rng.randint(0, 256, (len(frames), 16)).astype(np.uint8)
+        ciphertexts[:, -1] &= 0xc0
+        plaintexts[:, -1] &= 0xc0
+        with CaptureWriter(self.path) as writer:
+            writer.write(frames, ciphertexts, plaintexts)
+        with Capture(self.path) as capture:
+            selected = attack_frames(capture, limit=8)
+            self.assertEqual([f for (k, f) in selected], [0x1000, 0x1001, 0x1002, 0x1003,
+                                                          0x1800, 0x1801, 0x1802, 0x1803])
+            streams = bytes_to_bursts(np.bitwise_xor(ciphertexts, plaintexts))
+            self.assertEqual([k for (k, f) in selected], [streams[f - 0x1000] for (k, f) in selected])
+            self.assertEqual(paired_records(capture.records['frame_number']).sum(), 2 * 52)
+            # without limit all frames with a partner are returned
+            self.assertEqual(len(attack_frames(capture)), 2 * 52)
+            self.assertEqual(attack_frames(capture, session=1), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+from constant import *
+from a5_1_core import REDUCED_TAPS
+
+# number of bits of a packed equation row (see batch_matrix.pack_rows)
+PACKED_ROW_BITS = 64
+
+
+class RegisterSpec(object):
+    """
+        Definition of one A5/2 register
+    """
+    def __init__(self, size, taps, majority_bits=(), negated_bit=None, forced_bit=None, clock_bits=()):
+        """
+            :param size: number of bits
+            :param taps: positions of the feedback bits (the highest bit
+                         must be a tap)
+            :param majority_bits: positions of the two bits of the majority
+                                  function (R1, R2 and R3)
+            :param negated_bit: position of the negated bit of the majority
+                                function (R1, R2 and R3)
+            :param forced_bit: position of the bit that is set to 1 after the
+                               key setup
+            :param clock_bits: positions of the bits of the clocking
+                               majority (R4)
+        """
+        positions = list(taps) + list(majority_bits) + list(clock_bits)
+        positions += [bit for bit in (negated_bit, forced_bit) if bit is not None]
+        if size - 1 not in taps:
+            raise ValueError('The highest bit of each register must be a tap!')
+        if not all(0 <= position < size for position in positions):
+            raise ValueError('All bit positions must be inside the register!')
+        if majority_bits and len(set(majority_bits) | {negated_bit}) != 3:
+            raise ValueError('The majority function needs three different bits!')
+        if clock_bits and len(set(clock_bits)) != 3:
+            raise ValueError('The clocking majority needs three different bits!')
+        self.size = size
+        self.taps = list(taps)
+        self.majority_bits = list(majority_bits)
+        self.negated_bit = negated_bit
+        self.forced_bit = forced_bit
+        self.clock_bits = list(clock_bits)
+
+    def to_dict(self):
+        return {'size': self.size, 'taps': self.taps, 'majority_bits': self.majority_bits,
+                'negated_bit': self.negated_bit, 'forced_bit': self.forced_bit, 'clock_bits': self.clock_bits}
+
+    @property
+    def reverse_taps(self):
+        """
+            Positions to calculate the previous highest bit when the register
+            is clocked backwards (see gww_attack.reverse_clock)
+        """
+        return [0] + [tap + 1 for tap in self.taps if tap != self.size - 1]
+
+    def x_delta_products(self):
+        """
+            x_i * delta_j terms of the difference of the majority function
+            for two states with the difference delta
+        """
+        (a, b) = self.majority_bits
+        products = []
+        for (i, j) in ((a, self.negated_bit), (self.negated_bit, b), (a, b)):
+            products += [(i, j), (j, i)]
+        return products
+
+    def delta_delta_products(self):
+        """
+            Constant terms of the difference of the output (delta_i * delta_j,
+            a single delta_i is written as (i, i))
+        """
+        (a, b) = self.majority_bits
+        return [(self.negated_bit, a), (self.negated_bit, b), (b, a), (a, a), (b, b),
+                (self.size - 1, self.size - 1)]
+
+
+def load_images(registers, bits):
+    """
+        Clocks symbolic input bits into zeroed registers. Each register bit
+        is an integer whose bit p is set if it depends on input bit p.
+        :param registers: list of RegisterSpec
+        :param bits: number of clocked input bits (bit 0 first)
+        :return list with the register bits (index i is R[i]) of each
+                register
+    """
+    images = [[0] * register.size for register in registers]
+    for p in range(bits):
+        for j, register in enumerate(registers):
+            feedback = 1 << p
+            for tap in register.taps:
+                feedback ^= images[j][tap]
+            images[j] = [feedback] + images[j][:-1]
+    return images
+
+
+def positions_after_clocking(images, bits):
+    """
+        Converts register images into position lists: one list per BitVector
+        index of the register (index 0 is the highest bit) with the input
+        bits it depends on
+    """
+    return [[p for p in range(bits) if (image >> p) & 1] for image in reversed(images)]
+
+
+class CipherSpec(object):
+    """
+        Register definitions of A5/2 and the tables derived from them. The
+        default values are the real cipher, reduced variants can be used to
+        run and measure the whole attack in seconds.
+    """
+    def __init__(self, registers=None, clocking_bits=(R4_CLOCKING_BIT_FOR_R1, R4_CLOCKING_BIT_FOR_R2,
+                                                      R4_CLOCKING_BIT_FOR_R3),
+                 key_size=KEY_SIZE, frame_counter_size=FRAME_COUNTER_SIZE, warm_up_cycles=MAJORITY_CYCLES_A52,
+                 keystream_size=KEY_STREAM_SIZE):
+        """
+            :param registers: RegisterSpec of R1, R2, R3 and R4
+                              (default: A5/2)
+            :param clocking_bits: positions in R4 which decide whether R1, R2
+                                  and R3 are clocked
+            :param key_size: number of session key bits, must be the state
+                             size of R1, R2 and R3 for the key recovery
+            :param frame_counter_size: number of frame counter bits
+            :param warm_up_cycles: majority clocking cycles without output
+            :param keystream_size: number of keystream bits per direction
+        """
+        if registers is None:
+            registers = (RegisterSpec(R1_SIZE, R1_TAPS, R1_MAJORITY_BITS, R1_NEGATED_BIT, FORCE_R1_BIT_TO_1),
+                         RegisterSpec(R2_SIZE, R2_TAPS, R2_MAJORITY_BITS, R2_NEGATED_BIT, FORCE_R2_BIT_TO_1),
+                         RegisterSpec(R3_SIZE, R3_TAPS, R3_MAJORITY_BITS, R3_NEGATED_BIT, FORCE_R3_BIT_TO_1),
+                         RegisterSpec(R4_SIZE, R4_TAPS, forced_bit=FORCE_R4_BIT_TO_1, clock_bits=R4_CLOCK_BITS))
+        self.registers = tuple(registers)
+        (self.r1, self.r2, self.r3, self.r4) = self.registers
+        if not all(0 <= bit < self.r4.size for bit in clocking_bits):
+            raise ValueError('The clocking bits must be inside R4!')
+        self.clocking_bits = tuple(clocking_bits)
+        self.key_size = key_size
+        self.frame_counter_size = frame_counter_size
+        self.warm_up_cycles = warm_up_cycles
+        self.keystream_size = keystream_size
+        self.matrix_rows = keystream_size
+        self.matrix_columns = self.r1.size + self.r2.size + self.r3.size
+        if self.matrix_columns > PACKED_ROW_BITS:
+            raise ValueError('R1, R2 and R3 must have at most ' + str(PACKED_ROW_BITS) + ' bits!')
+        if key_size != self.matrix_columns:
+            raise ValueError('The key size must be the state size of R1, R2 and R3!')
+        self.start_in_solution = (0, self.r1.size, self.r1.size + self.r2.size)
+        self.end_in_solution = (self.r1.size, self.r1.size + self.r2.size, self.matrix_columns)
+        # the session key matrix has one row per register bit
+        self.sk_start_rows = self.start_in_solution
+        # session key bits as integer bit positions
+        self.sk_positions = [positions_after_clocking(images, key_size)
+                             for images in load_images(self.registers[:3], key_size)]
+        self.fc_positions = []
+        for register, images in zip(self.registers, load_images(self.registers, frame_counter_size)):
+            # frame counter bits as BitVector indices
+            positions = [[frame_counter_size - 1 - p for p in bits]
+                         for bits in positions_after_clocking(images, frame_counter_size)]
+            # the forced bit does not depend on the frame counter
+            positions[register.size - 1 - register.forced_bit] = []
+            self.fc_positions.append(positions)
+        self.x_delta_products = [register.x_delta_products() for register in self.registers[:3]]
+        self.delta_delta_products = [register.delta_delta_products() for register in self.registers[:3]]
+        self._key = repr(sorted(self.to_dict().items()))
+
+    @classmethod
+    def reduced(cls, sizes, frame_counter_size=FRAME_COUNTER_SIZE):
+        """
+            Creates a reduced variant with the register sizes of R1, R2, R3
+            and R4 (see a5_1_core.REDUCED_TAPS). The majority inputs are at a
+            quarter, half and three quarters of each register and the key
+            size equals the state size of R1, R2 and R3.
+        """
+        if len(sizes) != 4:
+            raise ValueError('A5/2 needs the sizes of R1, R2, R3 and R4!')
+        for size in sizes:
+            if size not in REDUCED_TAPS:
+                raise ValueError('Unsupported register size ' + str(size) + ', the reduced registers have '
+                                 + str(min(REDUCED_TAPS)) + ' to ' + str(max(REDUCED_TAPS)) + ' bits!')
+        registers = []
+        for size in sizes[:3]:
+            registers.append(RegisterSpec(size, REDUCED_TAPS[size], (size // 4, 3 * size // 4), size // 2,
+                                          3 * size // 4))
+        size = sizes[3]
+        (low, middle, high) = (size // 4, size // 2, 3 * size // 4)
+        registers.append(RegisterSpec(size, REDUCED_TAPS[size], forced_bit=high, clock_bits=(low, middle, high)))
+        return cls(registers, (high, low, middle), sum(sizes[:3]), frame_counter_size)
+
+    @property
+    def sizes(self):
+        return [register.size for register in self.registers]
+
+    def to_dict(self):
+        return {'registers': [register.to_dict() for register in self.registers],
+                'clocking_bits': list(self.clocking_bits), 'key_size': self.key_size,
+                'frame_counter_size': self.frame_counter_size, 'warm_up_cycles': self.warm_up_cycles,
+                'keystream_size': self.keystream_size}
+
+    @classmethod
+    def from_dict(cls, values):
+        values = dict(values)
+        values['registers'] = [RegisterSpec(**register) for register in values['registers']]
+        return cls(**values)
+
+    def __eq__(self, other):
+        return isinstance(other, CipherSpec) and self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._key)
+
+
+A5_2_SPEC = CipherSpec()
@@ -0,0 +1,66 @@
+import unittest
+import random
+import gww_attack
+from a5_2 import A5_2
+from cipher_spec import A5_2_SPEC, CipherSpec
+from frame_difference import usable_differences
+from constant import *
+
+
+def normalized(table):
+    return sorted(tuple(sorted(entry)) for entry in table)
+
+
+class CipherSpecTest(unittest.TestCase):
+
+    def test_tables_match_constants(self):
+        spec = A5_2_SPEC
+        sk_positions = [R1_SK_POSITIONS_AFTER_CLOCKING, R2_SK_POSITIONS_AFTER_CLOCKING, R3_SK_POSITIONS_AFTER_CLOCKING]
+        fc_positions = [R1_FC_POSITIONS_AFTER_CLOCKING, R2_FC_POSITIONS_AFTER_CLOCKING, R3_FC_POSITIONS_AFTER_CLOCKING,
+                        R4_FC_POSITIONS_AFTER_CLOCKING]
+        for generated, literal in zip(spec.sk_positions + spec.fc_positions, sk_positions + fc_positions):
+            self.assertEqual([sorted(positions) for positions in generated],
+                             [sorted(positions) for positions in literal])
+        for generated, literal in zip(spec.x_delta_products, [R1_X_DELTA_PRODUCTS, R2_X_DELTA_PRODUCTS,
+                                                              R3_X_DELTA_PRODUCTS]):
+            self.assertEqual(sorted(generated), sorted(literal))
+        for generated, literal in zip(spec.delta_delta_products, [R1_DELTA_DELTA_PRODUCTS, R2_DELTA_DELTA_PRODUCTS,
+                                                                  R3_DELTA_DELTA_PRODUCTS]):
+            self.assertEqual(normalized(generated), normalized(literal))
+        self.assertEqual([register.reverse_taps for register in spec.registers[:3]],
+                         [R1_REVERSE_TAPS, R2_REVERSE_TAPS, R3_REVERSE_TAPS])
+        self.assertEqual(spec.start_in_solution, (R1_START_IN_SOLUTION, R2_START_IN_SOLUTION, R3_START_IN_SOLUTION))
+        self.assertEqual(spec.end_in_solution, (R1_END_IN_SOLUTION, R2_END_IN_SOLUTION, R3_END_IN_SOLUTION))
+        self.assertEqual((spec.matrix_rows, spec.matrix_columns), (MATRIX_ROWS, MATRIX_COLUMNS))
+
+    def test_serialization(self):
+        spec = CipherSpec.reduced((5, 6, 7, 8))
+        self.assertEqual(CipherSpec.from_dict(spec.to_dict()), spec)
+        self.assertNotEqual(spec, A5_2_SPEC)
+        self.assertRaises(ValueError, CipherSpec, key_size=32)
+
+    def test_reduced_sizes(self):
+        for sizes in ((3, 3, 3, 3), (5, 6, 7, 14), (5, 6, 7)):
+            with self.assertRaises(ValueError) as context:
+                CipherSpec.reduced(sizes)
+        self.assertIn('R1, R2, R3 and R4', str(context.exception))
+        with self.assertRaises(ValueError) as context:
+            CipherSpec.reduced((3, 3, 3, 3))
+        self.assertIn('4 to 13 bits', str(context.exception))
+        self.assertEqual(CipherSpec.reduced((4, 5, 13, 4)).sizes, [4, 5, 13, 4])
+
+    def test_reduced_attack(self):
+        spec = CipherSpec.reduced((5, 6, 7, 8))
+        rng = random.Random(1)
+        key = rng.getrandbits(spec.key_size)
+        f1 = rng.getrandbits(spec.frame_counter_size)
+        f2 = f1 ^ usable_differences(spec)[3]
+        k1 = A5_2(key, f1, spec).get_key_stream(generate_only_send_key=True)[0]
+        k2 = A5_2(key, f2, spec).get_key_stream(generate_only_send_key=True)[0]
+        session_key = gww_attack.init_attack(k1.int_val(), k2.int_val(), f1, f2, 2, spec=spec)
+        self.assertIsNotNone(session_key)
+        # reduced variants can have equivalent keys
+        self.assertEqual(A5_2(session_key, f1, spec).get_key_stream(generate_only_send_key=True)[0], k1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,326 @@
+from BitVector import BitVector
+from a5_2 import A5_2
+from batch_matrix import BatchMatrix
+from cipher_spec import A5_2_SPEC, CipherSpec
+from frame_difference import is_usable_difference, packed_state_difference, r4_difference
+from instrumentation import metrics
+import gww_attack
+import itertools
+import json
+import numpy as np
+from constant import *
+
+
+def gf2_nullspace(matrix):
+    """
+        :param matrix: 2D array with values 0 and 1 (rows x n)
+        :return 2D uint8 array whose rows form a basis of all vectors v with
+                matrix * v = 0
+    """
+    matrix = np.asarray(matrix, dtype=np.uint8)
+    n = matrix.shape[1]
+    pivots = {}
+    for row in matrix:
+        value = int(''.join(str(bit) for bit in row), 2) if n else 0
+        for bit, pivot_row in pivots.items():
+            if (value >> bit) & 1:
+                value ^= pivot_row
+        if value:
+            bit = value.bit_length() - 1
+            for other in pivots:
+                if (pivots[other] >> bit) & 1:
+                    pivots[other] ^= value
+            pivots[bit] = value
+    basis = []
+    for free_bit in range(n):
+        if free_bit in pivots:
+            continue
+        vector = 1 << free_bit
+        for bit, pivot_row in pivots.items():
+            if (pivot_row >> free_bit) & 1:
+                vector |= 1 << bit
+        basis.append([(vector >> (n - 1 - i)) & 1 for i in range(n)])
+    return np.array(basis, dtype=np.uint8).reshape(len(basis), n)
+
+
+class LinearCode(object):
+    """
+        Linear channel code of one coded block, which is interleaved over
+        several bursts of 114 bits. The code is given by its parity-check
+        matrix H (H * c = 0 for every code word c) over the coded bits.
+    """
+    def __init__(self, parity_checks, interleaving=None):
+        """
+            :param parity_checks: 2D array with values 0 and 1, one row per
+                                  parity check, one column per coded bit
+            :param interleaving: Optional list, maps each coded bit to its
+                                 position in the concatenated bursts
+                                 (burst * 114 + bit). Default: identity
+        """
+        parity_checks = np.asarray(parity_checks, dtype=np.uint8)
+        n = parity_checks.shape[1]
+        if n % KEY_STREAM_SIZE:
+            raise ValueError('The code length must be a multiple of ' + str(KEY_STREAM_SIZE) + '!')
+        if interleaving is None:
+            interleaving = range(n)
+        interleaving = np.asarray(interleaving, dtype=np.int64)
+        self.parity_checks = parity_checks
+        self.bursts = n // KEY_STREAM_SIZE
+        # positions of each parity check in the concatenated bursts
+        self.supports = [interleaving[np.nonzero(row)[0]] for row in parity_checks if row.any()]
+        self.flat_supports = np.concatenate(self.supports)
+        self.support_starts = np.cumsum([0] + [len(support) for support in self.supports[:-1]])
+
+    @classmethod
+    def from_generator(cls, generator, interleaving=None):
+        """
+            Creates the code from its generator matrix (one row per
+            information bit)
+        """
+        return cls(gf2_nullspace(generator), interleaving)
+
+    def checks(self):
+        return len(self.supports)
+
+    def parities(self, bits):
+        """
+            :param bits: array with the bits of the concatenated bursts,
+                         the last axis has 114 * bursts entries
+            :return array with the parity of each check
+        """
+        bits = np.asarray(bits, dtype=np.uint8)
+        return np.bitwise_xor.reduceat(bits[..., self.flat_supports], self.support_starts, axis=-1)
+
+    def is_code_word(self, bits):
+        return not self.parities(bits).any()
+
+
+def burst_bits(value):
+    """
+        :return the 114 bits of a burst as uint8 array (first bit first)
+    """
+    return np.array(list(BitVector(size=KEY_STREAM_SIZE, intVal=value)), dtype=np.uint8)
+
+
+def frame_layout(frames_a, frames_b):
+    """
+        :param frames_a: frame counters of the bursts of block a
+        :param frames_b: frame counters of the bursts of block b
+        :return tuple (offsets of the bursts of block a to its first burst,
+                differences between the bursts of both blocks)
+    """
+    if len(frames_a) != len(frames_b):
+        raise ValueError('Both blocks need the same number of frame counters!')
+    return ([frames_a[0] ^ fa for fa in frames_a], [fa ^ fb for fa, fb in zip(frames_a, frames_b)])
+
+
+class CiphertextOnlyTables(object):
+    """
+        Precomputed equations for all R4 candidates of one cipher
+        specification and one frame layout.
+        Two coded blocks a and b are sent in bursts, where the i-th bursts of
+        both blocks have a usable frame counter difference. The layout
+        consists of the offsets of the bursts of block a to its first burst
+        and these differences, so the tables can be used for every pair of
+        blocks with the same layout. For every R4 value (of the first frame
+        of block a) the tables contain the parity checks of the code as
+        linear equations over the initial variables of this frame. Only the
+        right-hand sides depend on the ciphertext, so the online phase just
+        combines them with the ciphertext and solves the systems.
+    """
+    def __init__(self, code, offsets, differences, r4_values=None, spec=None):
+        """
+            :param code: LinearCode
+            :param offsets: frame counter offsets of the bursts of block a
+                            to its first burst (the first offset is 0)
+            :param differences: frame counter differences between the bursts
+                                of block a and block b
+            :param r4_values: Optional, R4 values (default: all values with
+                              R4[10] = 1)
+            :param spec: Optional CipherSpec (default: A5/2)
+        """
+        spec = spec or A5_2_SPEC
+        if spec.keystream_size != KEY_STREAM_SIZE:
+            raise ValueError('The bursts of the code have ' + str(KEY_STREAM_SIZE) + ' bits!')
+        if len(offsets) != code.bursts or len(differences) != code.bursts:
+            raise ValueError('Both blocks need ' + str(code.bursts) + ' frame counters!')
+        if offsets[0] != 0:
+            raise ValueError('The offset of the first burst must be 0!')
+        for difference in differences:
+            if not is_usable_difference(difference, spec):
+                raise ValueError('Frame counter difference ' + hex(difference) + ' is not usable!')
+        if r4_values is None:
+            r4_values = [i for i in range(2 ** spec.r4.size) if (i >> spec.r4.forced_bit) & 1]
+        self.spec = spec
+        self.offsets = list(offsets)
+        self.differences = list(differences)
+        self.r4_values = np.array(r4_values, dtype=np.int64)
+        state_offsets = [packed_state_difference(offset, spec) for offset in offsets]
+        r4_offsets = [r4_difference(offset, spec) for offset in offsets]
+        zeros = [0] * spec.keystream_size
+        self.rows = np.zeros((len(r4_values), code.checks()), dtype=np.uint64)
+        self.constants = np.zeros((len(r4_values), code.checks()), dtype=np.uint8)
+        for index, r4_value in enumerate(r4_values):
+            burst_rows = []
+            burst_constants = []
+            for burst in range(code.bursts):
+                (rows, constants) = gww_attack.build_packed_system(r4_value ^ r4_offsets[burst], zeros,
+                                                                   differences[burst], spec)
+                for row, constant in zip(rows, constants):
+                    burst_rows.append(row)
+                    # the variables of this burst = reference variables + offset
+                    burst_constants.append(constant ^ (bin(row & state_offsets[burst]).count('1') & 1))
+            burst_rows = np.array(burst_rows, dtype=np.uint64)
+            burst_constants = np.array(burst_constants, dtype=np.uint8)
+            self.rows[index] = np.bitwise_xor.reduceat(burst_rows[code.flat_supports], code.support_starts)
+            self.constants[index] = code.parities(burst_constants)
+
+    @classmethod
+    def for_frames(cls, code, frames_a, frames_b, r4_values=None, spec=None):
+        """
+            Creates the tables for the layout of two blocks
+        """
+        (offsets, differences) = frame_layout(frames_a, frames_b)
+        return cls(code, offsets, differences, r4_values, spec)
+
+    def check_frames(self, frames_a, frames_b, spec=None):
+        """
+            Raises a ValueError if the tables were built for another cipher
+            specification or if the frames do not have the layout of the
+            tables
+        """
+        if self.spec != (spec or A5_2_SPEC):
+            raise ValueError('The tables were built for another cipher specification!')
+        if frame_layout(frames_a, frames_b) != (self.offsets, self.differences):
+            raise ValueError('The frame counters do not match the layout of the tables!')
+
+    def save(self, path):
+        np.savez(path, spec=json.dumps(self.spec.to_dict()), offsets=self.offsets, differences=self.differences,
+                 r4_values=self.r4_values, rows=self.rows, constants=self.constants)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        tables = cls.__new__(cls)
+        # tables without specification were built for A5/2
+        tables.spec = CipherSpec.from_dict(json.loads(str(data['spec']))) if 'spec' in data.files else A5_2_SPEC
+        tables.offsets = data['offsets'].tolist()
+        tables.differences = data['differences'].tolist()
+        tables.r4_values = data['r4_values']
+        tables.rows = data['rows']
+        tables.constants = data['constants']
+        return tables
+
+
+def key_matches_code(session_key, code, frames, ciphertexts, spec=None):
+    """
+        Decrypts the bursts of a block with a session key
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return True if the plaintext is a code word
+    """
+    plaintext = []
+    for frame, ciphertext in zip(frames, ciphertexts):
+        (send_key, receive_key) = A5_2(session_key, frame, spec).get_key_stream(generate_only_send_key=True)
+        plaintext.append(burst_bits(ciphertext ^ send_key.int_val()))
+    return code.is_code_word(np.concatenate(plaintext))
+
+
+def recover_session_key(solutions, code, frames_a, frames_b, ciphertexts_a, ciphertexts_b, spec=None):
+    """
+        Restores the session key for each solution (like check_gauss_solution)
+        and accepts the key if both blocks decrypt to code words
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return the session key as integer or None
+    """
+    spec = spec or A5_2_SPEC
+    frame = BitVector(size=spec.frame_counter_size, intVal=frames_a[0])
+    for solution in solutions:
+        for register_values in itertools.product([0, 1], repeat=3):
+            r1, r2, r3 = gww_attack.convert_solution_to_lfsrs(solution, spec)
+            r1.set_bit(spec.r1.forced_bit, register_values[0])
+            r2.set_bit(spec.r2.forced_bit, register_values[1])
+            r3.set_bit(spec.r3.forced_bit, register_values[2])
+            gww_attack.reverse_frame_counter(r1, r2, r3, frame, spec)
+            for session_key in gww_attack.retrieve_session_key(r1, r2, r3, spec):
+                session_key = BitVector(bitlist=session_key).int_val()
+                if key_matches_code(session_key, code, frames_a, ciphertexts_a, spec) and \
+                        key_matches_code(session_key, code, frames_b, ciphertexts_b, spec):
+                    metrics.increment('keys_found')
+                    return session_key
+    return None
+
+
+def check_candidates(indices, syndrome, code, tables, frames_a, frames_b, ciphertexts_a, ciphertexts_b,
+                     solution_budget=None, deferred=None, spec=None):
+    """
+        Solves the systems of several R4 candidates together
+        :param indices: slice or index array of the candidates in the tables
+        :param syndrome: parities of the ciphertext difference
+        :param solution_budget: Optional, maximum number of free variables.
+                                Candidates with more free variables are not
+                                checked but appended to deferred.
+        :param deferred: list for the deferred candidates as tuples
+                         (free variables, index in the tables)
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return the session key as integer or None
+    """
+    spec = spec or A5_2_SPEC
+    with metrics.stage('elimination'):
+        systems = BatchMatrix(tables.rows[indices], tables.constants[indices] ^ syndrome,
+                              spec.matrix_columns).eliminate()
+    free_variables = systems.nullspace_dimension()
+    table_indices = np.arange(len(tables.r4_values))[indices]
+    for i in np.nonzero(systems.consistent)[0]:
+        metrics.increment('solvable')
+        if solution_budget is not None and free_variables[i] > solution_budget:
+            metrics.increment('deferred')
+            deferred.append((int(free_variables[i]), int(table_indices[i])))
+            continue
+        with metrics.stage('key_recovery'):
+            session_key = recover_session_key(systems.iter_solutions(i), code, frames_a, frames_b, ciphertexts_a,
+                                              ciphertexts_b, spec)
+        if session_key is not None:
+            return session_key
+    return None
+
+
+def ciphertext_only_attack(code, tables, frames_a, frames_b, ciphertexts_a, ciphertexts_b,
+                           solution_budget=gww_attack.DEFAULT_SOLUTION_BUDGET, spec=None):
+    """
+        Online phase: retrieves the session key from two encrypted coded
+        blocks without known plaintext
+        :param code: LinearCode
+        :param tables: CiphertextOnlyTables for the frame layout of the
+                       blocks
+        :param frames_a, frames_b: frame counters of the bursts of both
+                                   blocks
+        :param ciphertexts_a, ciphertexts_b: encrypted bursts (114 bit
+                                             integers) of both blocks
+        :param solution_budget: Candidates whose systems have more free
+                                variables are deferred until all other
+                                candidates have been checked
+        :param spec: Optional CipherSpec of the tables (default: A5/2)
+        :return the session key as integer or None
+    """
+    spec = spec or A5_2_SPEC
+    if len(ciphertexts_a) != code.bursts or len(ciphertexts_b) != code.bursts:
+        raise ValueError('Both blocks need ' + str(code.bursts) + ' bursts!')
+    tables.check_frames(frames_a, frames_b, spec)
+    # the code words cancel out: H * (c_a + c_b) = H * (k_a + k_b)
+    difference = np.concatenate([burst_bits(a ^ b) for a, b in zip(ciphertexts_a, ciphertexts_b)])
+    syndrome = code.parities(difference)
+    arguments = (syndrome, code, tables, frames_a, frames_b, ciphertexts_a, ciphertexts_b)
+    deferred = []
+    for start in range(0, len(tables.r4_values), gww_attack.BATCH_SIZE):
+        batch = slice(start, start + gww_attack.BATCH_SIZE)
+        metrics.increment('candidates', len(tables.r4_values[batch]))
+        session_key = check_candidates(batch, *arguments, solution_budget=solution_budget, deferred=deferred,
+                                       spec=spec)
+        if session_key is not None:
+            return session_key
+    # cheapest candidates first
+    for free_variables, index in sorted(deferred):
+        session_key = check_candidates([index], *arguments, spec=spec)
+        if session_key is not None:
+            return session_key
+    return None
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from a5_2 import A5_2
+from cipher_spec import CipherSpec
+from ciphertext_only import LinearCode, CiphertextOnlyTables, ciphertext_only_attack, burst_bits, gf2_nullspace
+from frame_difference import usable_differences
+from constant import *
+
+
+def keystream(key, frame_counter, spec=None):
+    (send_key, receive_key) = A5_2(key, frame_counter, spec).get_key_stream(generate_only_send_key=True)
+    return send_key.int_val()
+
+
+def encode(generator, message):
+    return message.dot(generator) % 2
+
+
+def to_bursts(bits):
+    return [int(''.join(str(bit) for bit in bits[i:i + KEY_STREAM_SIZE]), 2)
+            for i in range(0, len(bits), KEY_STREAM_SIZE)]
+
+
+class CiphertextOnlyTest(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(7)
+        self.random = random
+        # toy code: 40 information bits, 228 coded bits interleaved over two bursts
+        self.generator = random.randint(0, 2, (40, 2 * KEY_STREAM_SIZE)).astype(np.uint8)
+        self.interleaving = random.permutation(2 * KEY_STREAM_SIZE)
+        self.code = LinearCode.from_generator(self.generator, self.interleaving)
+
+    def interleave(self, code_word):
+        bits = np.zeros(len(code_word), dtype=np.uint8)
+        bits[self.interleaving] = code_word
+        return bits
+
+    def test_parity_checks(self):
+        self.assertEqual(self.code.checks(), 2 * KEY_STREAM_SIZE - 40)
+        self.assertFalse((self.generator.dot(gf2_nullspace(self.generator).T) % 2).any())
+        code_word = self.interleave(encode(self.generator, self.random.randint(0, 2, 40)))
+        self.assertTrue(self.code.is_code_word(code_word))
+        code_word[3] ^= 1
+        self.assertFalse(self.code.is_code_word(code_word))
+
+    def encrypt(self, key, frames, spec=None):
+        plaintext = to_bursts(self.interleave(encode(self.generator, self.random.randint(0, 2, 40))))
+        return [p ^ keystream(key, frame, spec) for p, frame in zip(plaintext, frames)]
+
+    def test_recovers_key_from_ciphertext(self):
+        key = 0xfaf3df3fa6698c0c
+        frames_a = [0x7c084, 0x7c0a5]
+        frames_b = [frame ^ usable_differences()[3] for frame in frames_a]
+        # a second pair of blocks with the same layout
+        shifted_a = [frame ^ 0x2b0000 for frame in frames_a]
+        shifted_b = [frame ^ 0x2b0000 for frame in frames_b]
+        r4_values = []
+        for frame, width in ((frames_a[0], 300), (shifted_a[0], 20)):
+            a52 = A5_2(key, frame)
+            a52.get_key_stream(generate_only_send_key=True)
+            r4 = a52.initial_sates['r4'].register.int_val()
+            r4_values += [value for value in range(r4 - width, r4 + width) if (value >> FORCE_R4_BIT_TO_1) & 1]
+        tables = CiphertextOnlyTables.for_frames(self.code, frames_a, frames_b, r4_values)
+
+        ciphertexts = [self.encrypt(key, frames_a), self.encrypt(key, frames_b)]
+        self.assertEqual(ciphertext_only_attack(self.code, tables, frames_a, frames_b, *ciphertexts), key)
+        self.assertEqual(len(burst_bits(ciphertexts[0][0])), KEY_STREAM_SIZE)
+        # the system of the correct R4 has three free variables, so it is
+        # only solved in the deferred pass
+        self.assertEqual(ciphertext_only_attack(self.code, tables, frames_a, frames_b, *ciphertexts,
+                                                solution_budget=2), key)
+
+        path = os.path.join(tempfile.mkdtemp(), 'tables.npz')
+        try:
+            tables.save(path)
+            tables = CiphertextOnlyTables.load(path)
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+        ciphertexts = [self.encrypt(key, shifted_a), self.encrypt(key, shifted_b)]
+        self.assertEqual(ciphertext_only_attack(self.code, tables, shifted_a, shifted_b, *ciphertexts), key)
+        self.assertRaises(ValueError, ciphertext_only_attack, self.code, tables, shifted_a, frames_b, *ciphertexts)
+
+    def test_reduced_spec(self):
+        spec = CipherSpec.reduced((5, 6, 7, 8))
+        key = 0x2d35b
+        frames_a = [0x1c084, 0x1c0a5]
+        frames_b = [frame ^ usable_differences(spec)[5] for frame in frames_a]
+        tables = CiphertextOnlyTables.for_frames(self.code, frames_a, frames_b, spec=spec)
+        self.assertEqual(len(tables.r4_values), 2 ** 7)
+        ciphertexts = [self.encrypt(key, frames_a, spec), self.encrypt(key, frames_b, spec)]
+        session_key = ciphertext_only_attack(self.code, tables, frames_a, frames_b, *ciphertexts, spec=spec)
+        # reduced variants can have equivalent keys
+        for frame in frames_a + frames_b:
+            self.assertEqual(keystream(session_key, frame, spec), keystream(key, frame, spec))
+        # the tables are only valid for their cipher specification
+        self.assertRaises(ValueError, ciphertext_only_attack, self.code, tables, frames_a, frames_b, *ciphertexts)
+        path = os.path.join(tempfile.mkdtemp(), 'tables.npz')
+        try:
+            tables.save(path)
+            self.assertEqual(CiphertextOnlyTables.load(path).spec, spec)
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+if __name__ == '__main__':
+    unittest.main()
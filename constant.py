@@ -1,4 +1,3 @@
-import numpy as np
 FRAME_COUNTER_DIFFERENCE = 2048
 FRAME_COUNTER_SIZE = 22
 KEY_SIZE = 64
@@ -70,6 +69,7 @@ R3_SK_POSITIONS_AFTER_CLOCKING = [[41, 33, 25, 17, 9, 1, 20, 4, 19, 3, 18, 2], [
 R1_FC_POSITIONS_AFTER_CLOCKING = [[18], [17], [16], [], [14], [13], [12], [11], [10], [9], [8], [7, 21], [6, 20], [5, 19], [4, 18, 21], [3, 17, 20, 21], [2, 16, 19, 20, 21], [1, 15, 18, 19, 20], [0, 14, 17, 18, 19]]
 R2_FC_POSITIONS_AFTER_CLOCKING = [[21], [20], [19], [18], [17], [], [15], [14], [13], [12], [11], [10], [9], [8], [7], [6], [5], [4], [3], [2], [1], [0, 21]]
 R3_FC_POSITIONS_AFTER_CLOCKING = [[], [21], [20], [19], [], [17], [16], [15], [14], [13, 21], [12, 20], [11, 19], [10, 18], [9, 17], [8, 16], [7, 15], [6, 14], [5, 13, 21], [4, 12, 20], [3, 11, 19], [2, 10, 18], [1, 9, 17], [0, 8, 16, 21]]
+R4_FC_POSITIONS_AFTER_CLOCKING = [[16], [15], [14], [13], [12], [11], [], [9, 21], [8, 20], [7, 19], [6, 18], [5, 17], [4, 16, 21], [3, 15, 20], [2, 14, 19], [1, 13, 18], [0, 12, 17]]
 R1_X_DELTA_PRODUCTS = [(12, 14), (14, 12), (14, 15), (15, 14), (12, 15), (15, 12)]
 R2_X_DELTA_PRODUCTS = [(9, 16), (16, 9), (9, 13), (13, 9), (13, 16), (16, 13)]
 R3_X_DELTA_PRODUCTS = [(16, 13), (13, 16), (16, 18), (18, 16), (18, 13), (13, 18)]
@@ -0,0 +1,248 @@
+import argparse
+import collections
+import json
+import sys
+import time
+import numpy as np
+from capture import Capture, CaptureWriter, BURST_BYTES, DIRECTION_RECEIVE, FLAG_PLAINTEXT
+from cipher_spec import A5_2_SPEC, CipherSpec
+from multiprocessing import Pool
+
+# records per work unit
+DEFAULT_CHUNK_SIZE = 1 << 16
+# work units in flight per process, bounds the memory of the pipeline
+UNITS_PER_PROCESS = 2
+
+capture = None
+session_keys = None
+cipher_spec = None
+# CipherSpec -> register values of each frame counter bit
+_frame_counter_images = {}
+
+
+def load_registers(key, frame_counter, spec=None):
+    """
+        Clocks the session key and the frame counter into R1, R2, R3 and R4
+        (without forced bits). The loading is linear, i.e.
+        load_registers(k, f) = load_registers(k, 0) ^ load_registers(0, f).
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return list with the register values (bit i is R[i])
+    """
+    spec = spec or A5_2_SPEC
+    registers = [0, 0, 0, 0]
+    for value, size in ((key, spec.key_size), (frame_counter, spec.frame_counter_size)):
+        for i in range(size):
+            bit = (value >> i) & 1
+            for j, register in enumerate(spec.registers):
+                r = registers[j]
+                feedback = bit
+                for tap in register.taps:
+                    feedback ^= (r >> tap) & 1
+                registers[j] = ((r << 1) & ((1 << register.size) - 1)) | feedback
+    return registers
+
+
+def frame_counter_images(spec=None):
+    """
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return list with the register values of each frame counter bit
+    """
+    spec = spec or A5_2_SPEC
+    if spec not in _frame_counter_images:
+        _frame_counter_images[spec] = [load_registers(0, 1 << j, spec) for j in range(spec.frame_counter_size)]
+    return _frame_counter_images[spec]
+
+
+def _majority(a, b, c):
+    return (a & (b | c)) | (b & c)
+
+
+def _clock(planes, taps, condition=None):
+    """
+        Clocks a bitsliced register
+        :param planes: array (register size x words), row i holds R[i] of
+                       64 frames per word
+        :param condition: Optional mask of the frames whose register is
+                          clocked (default: all)
+    """
+    shifted = np.empty_like(planes)
+    shifted[0] = planes[taps[0]]
+    for tap in taps[1:]:
+        shifted[0] ^= planes[tap]
+    shifted[1:] = planes[:-1]
+    if condition is None:
+        return shifted
+    # take the shifted value where the condition is set
+    shifted ^= planes
+    shifted &= condition
+    shifted ^= planes
+    return shifted
+
+
+def bulk_keystreams(key, frame_numbers, receive=True, spec=None):
+    """
+        Generates the A5/2 keystreams of one session key for many frames.
+        The registers are bitsliced: every register bit is a row of 64 bit
+        words with one bit per frame, so each clocking cycle processes 64
+        frames per word operation.
+        :param key: 64 bit session key
+        :param frame_numbers: array with the frame counters
+        :param receive: generate the receive keystreams too
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return tuple (send keystreams, receive keystreams or None) as
+                packed uint8 arrays (n x 16) like the capture records
+    """
+    spec = spec or A5_2_SPEC
+    frame_numbers = np.asarray(frame_numbers, dtype=np.uint32)
+    n = len(frame_numbers)
+    frames = -(-n // 64) * 64
+    words = frames // 64
+    ones = np.uint64(0xffffffffffffffff)
+
+    def pack(bits):
+        padded = np.zeros(frames, dtype=np.uint8)
+        padded[:n] = bits
+        return np.packbits(padded).view(np.uint64)
+
+    frame_counter_planes = [pack((frame_numbers >> np.uint32(j)) & np.uint32(1))
+                            for j in range(spec.frame_counter_size)]
+    key_registers = load_registers(key, 0, spec)
+    images = frame_counter_images(spec)
+    registers = []
+    for j, register in enumerate(spec.registers):
+        planes = np.zeros((register.size, words), dtype=np.uint64)
+        for i in range(register.size):
+            if (key_registers[j] >> i) & 1:
+                planes[i] = ones
+            for bit in range(spec.frame_counter_size):
+                if (images[bit][j] >> i) & 1:
+                    planes[i] ^= frame_counter_planes[bit]
+        planes[register.forced_bit] = ones
+        registers.append(planes)
+    (r1, r2, r3, r4) = registers
+    (s1, s2, s3, s4) = spec.registers
+    clock_bits = s4.clock_bits
+
+    length = spec.keystream_size
+    cycles = length * (2 if receive else 1)
+    output = np.empty((cycles, words), dtype=np.uint64)
+    for t in range(spec.warm_up_cycles + cycles):
+        majority = _majority(r4[clock_bits[0]], r4[clock_bits[1]], r4[clock_bits[2]])
+        r1 = _clock(r1, s1.taps, ~(r4[spec.clocking_bits[0]] ^ majority))
+        r2 = _clock(r2, s2.taps, ~(r4[spec.clocking_bits[1]] ^ majority))
+        r3 = _clock(r3, s3.taps, ~(r4[spec.clocking_bits[2]] ^ majority))
+        r4 = _clock(r4, s4.taps)
+        if t >= spec.warm_up_cycles:
+            output[t - spec.warm_up_cycles] = (
+                r1[s1.size - 1] ^ r2[s2.size - 1] ^ r3[s3.size - 1] ^
+                _majority(~r1[s1.negated_bit], r1[s1.majority_bits[0]], r1[s1.majority_bits[1]]) ^
+                _majority(~r2[s2.negated_bit], r2[s2.majority_bits[0]], r2[s2.majority_bits[1]]) ^
+                _majority(~r3[s3.negated_bit], r3[s3.majority_bits[0]], r3[s3.majority_bits[1]]))
+    # one row of keystream bits per frame
+    bits = np.unpackbits(output.view(np.uint8), axis=1)[:, :n].T
+    keystreams = []
+    for start in range(0, cycles, length):
+        padded = np.zeros((n, BURST_BYTES * 8), dtype=np.uint8)
+        padded[:, :length] = bits[:, start:start + length]
+        keystreams.append(np.packbits(padded, axis=1))
+    return (keystreams[0], keystreams[1] if receive else None)
+
+
+def decrypt_records(records, keys, spec=None):
+    """
+        :param records: capture records
+        :param keys: dictionary session id -> session key (None: all
+                     sessions)
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return tuple (plaintext as uint8 array (n x 16), mask of the
+                decrypted records)
+    """
+    plaintext = np.zeros((len(records), BURST_BYTES), dtype=np.uint8)
+    decrypted = np.zeros(len(records), dtype=bool)
+    for session in np.unique(records['session']):
+        key = keys.get(int(session), keys.get(None))
+        if key is None:
+            continue
+        selection = np.nonzero(records['session'] == session)[0]
+        receive = records['direction'][selection] == DIRECTION_RECEIVE
+        (send_keys, receive_keys) = bulk_keystreams(key, records['frame_number'][selection], receive.any(), spec)
+        if receive_keys is not None:
+            send_keys[receive] = receive_keys[receive]
+        plaintext[selection] = records['ciphertext'][selection] ^ send_keys
+        decrypted[selection] = True
+    return (plaintext, decrypted)
+
+
+def init_worker(path, keys, spec):
+    global capture, session_keys, cipher_spec
+    capture = Capture(path)
+    session_keys = keys
+    cipher_spec = spec
+
+
+def decrypt_chunk(start, stop):
+    return decrypt_records(capture.records[start:stop], session_keys, cipher_spec)
+
+
+def decrypt_capture(path, output_path, keys, processes=1, chunk_size=DEFAULT_CHUNK_SIZE, spec=None):
+    """
+        Decrypts a capture file and writes the records with the plaintext
+        to a new capture file. The chunks are decrypted by a process pool
+        and written in order; at most UNITS_PER_PROCESS chunks per process
+        are in flight, so the memory does not grow with the capture size.
+        :param keys: session key for all sessions or dictionary session id
+                     -> session key
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return dictionary with statistics
+    """
+    if not isinstance(keys, dict):
+        keys = {None: keys}
+    start_time = time.perf_counter()
+    decrypted = 0
+    with Capture(path) as source, CaptureWriter(output_path) as writer:
+        total = len(source)
+        chunks = [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+        with Pool(processes=processes, initializer=init_worker, initargs=(path, keys, spec)) as pool:
+            pending = collections.deque()
+            next_chunk = 0
+            while next_chunk < len(chunks) or pending:
+                while next_chunk < len(chunks) and len(pending) < processes * UNITS_PER_PROCESS:
+                    pending.append((chunks[next_chunk], pool.apply_async(decrypt_chunk, chunks[next_chunk])))
+                    next_chunk += 1
+                ((start, stop), result) = pending.popleft()
+                (plaintext, mask) = result.get()
+                records = source.records[start:stop].copy()
+                records['plaintext'][mask] = plaintext[mask]
+                records['flags'][mask] |= FLAG_PLAINTEXT
+                writer.write_records(records)
+                decrypted += int(mask.sum())
+    seconds = time.perf_counter() - start_time
+    return {'records': total, 'decrypted': decrypted, 'seconds': seconds,
+            'frames_per_second': total / seconds if seconds > 0 else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Decrypts a capture file with recovered A5/2 session keys')
+    parser.add_argument('capture', help='capture file')
+    parser.add_argument('output', help='capture file with the plaintext')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--key', help='session key for all sessions (hexadecimal)')
+    group.add_argument('--keys', metavar='FILE', help='JSON object session id -> session key (hexadecimal)')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='number of processes')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='records per work unit')
+    parser.add_argument('--sizes', type=int, nargs=4, default=None, metavar='SIZE',
+                        help='reduced register sizes of R1, R2, R3 and R4 (default: real A5/2)')
+    args = parser.parse_args()
+    if args.key:
+        keys = int(args.key, 16)
+    else:
+        with open(args.keys) as f:
+            keys = {int(session): int(key, 16) for session, key in json.load(f).items()}
+    spec = CipherSpec.reduced(args.sizes) if args.sizes else None
+    stats = decrypt_capture(args.capture, args.output, keys, args.processes, args.chunk_size, spec)
+    print(json.dumps(stats, sort_keys=True))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
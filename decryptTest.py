@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from a5_2 import A5_2
+from capture import Capture, CaptureWriter, FLAG_PLAINTEXT, bytes_to_bursts
+from cipher_spec import CipherSpec
+from decrypt import bulk_keystreams, decrypt_capture
+
+
+class DecryptTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_bulk_keystreams(self):
+        key = 0xfaf3df3fa6698c0c
+        frames = [0x7c084, 0x21, 0, 0x3fffff] + list(range(100, 170))
+        (send_keys, receive_keys) = bulk_keystreams(key, frames)
+        for frame, send_key, receive_key in zip(frames[:8], bytes_to_bursts(send_keys), bytes_to_bursts(receive_keys)):
+            (expected_send, expected_receive) = A5_2(key, frame).get_key_stream()
+            self.assertEqual(send_key, expected_send.int_val())
+            self.assertEqual(receive_key, expected_receive.int_val())
+        self.assertIsNone(bulk_keystreams(key, frames[:3], receive=False)[1])
+
+    def test_reduced_spec(self):
+        spec = CipherSpec.reduced((5, 6, 7, 8))
+        frames = [1, 0x69, 0x246dd6, 0x246ccf]
+        (send_keys, receive_keys) = bulk_keystreams(0x8996, frames, spec=spec)
+        for frame, send_key, receive_key in zip(frames, bytes_to_bursts(send_keys), bytes_to_bursts(receive_keys)):
+            (expected_send, expected_receive) = A5_2(0x8996, frame, spec).get_key_stream()
+            self.assertEqual(send_key, expected_send.int_val())
+            self.assertEqual(receive_key, expected_receive.int_val())
+
+    def test_decrypt_capture(self):
+        path = os.path.join(self.directory, 'capture.a5c')
+        output_path = os.path.join(self.directory, 'plaintext.a5c')
+        rng = np.random.RandomState(3)
+        count = 300
+        frames = rng.randint(0, 2 ** 22, count)
+        directions = rng.randint(0, 2, count)
+        sessions = rng.randint(0, 3, count)
+        plaintexts = rng.randint(0, 256, (count, 16)).astype(np.uint8)
+        plaintexts[:, -1] &= 0xc0
+        keys = {0: 0x1234567890abcdef, 1: 0xfaf3df3fa6698c0c}
+        ciphertexts = plaintexts.copy()
+        for session, key in keys.items():
+            selection = sessions == session
+            (send_keys, receive_keys) = bulk_keystreams(key, frames[selection])
+            ciphertexts[selection] ^= np.where(directions[selection, None] == 1, receive_keys, send_keys)
+        with CaptureWriter(path) as writer:
+            writer.write(frames, ciphertexts, directions=directions, sessions=sessions)
+        for processes in (1, 2):
+            stats = decrypt_capture(path, output_path, keys, processes, chunk_size=64)
+            self.assertEqual(stats['records'], count)
+            self.assertEqual(stats['decrypted'], int((sessions < 2).sum()))
+            with Capture(output_path) as result:
+                decrypted = (result.records['flags'] & FLAG_PLAINTEXT) != 0
+                self.assertTrue((decrypted == (sessions < 2)).all())
+                self.assertTrue((result.records['plaintext'][decrypted] == plaintexts[decrypted]).all())
+                self.assertTrue((result.records['frame_number'] == frames).all())
+
+if __name__ == '__main__':
+    unittest.main()
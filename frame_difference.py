@@ -0,0 +1,141 @@
+import itertools
+from constant import *
+from cipher_spec import A5_2_SPEC
+
+_delta_tables = {}
+
+
+def register_difference(fc_positions, difference, frame_counter_size=FRAME_COUNTER_SIZE):
+    """
+        Calculates the difference of the initial register variables (after
+        the key setup) for two frame counters
+        :param fc_positions: frame counter positions for each register
+                             variable (CipherSpec.fc_positions)
+        :param difference: F1 XOR F2 as integer
+        :param frame_counter_size: number of frame counter bits
+        :return list with the delta (0 or 1) of each register variable
+    """
+    deltas = []
+    for positions in fc_positions:
+        delta = 0
+        for pos in positions:
+            # pos is a BitVector index, i.e. bit frame_counter_size - 1 - pos
+            delta ^= (difference >> (frame_counter_size - 1 - pos)) & 1
+        deltas.append(delta)
+    return deltas
+
+
+def is_usable_difference(difference, spec=None):
+    """
+        Two frame counters can be used for the attack if R4 is identical for
+        both frames, i.e. the difference only affects R4[10], which is set to
+        1 after the key setup.
+        :param difference: F1 XOR F2 as integer
+        :param spec: Optional CipherSpec (default: A5/2)
+    """
+    spec = spec or A5_2_SPEC
+    return difference != 0 and not any(register_difference(spec.fc_positions[3], difference,
+                                                           spec.frame_counter_size))
+
+
+def packed_state_difference(difference, spec=None):
+    """
+        Difference of the initial variables of R1, R2 and R3 of two frames
+        as packed row (same column layout as the equation systems, column 0
+        is bit 63). The forced bits never differ.
+        :param difference: F1 XOR F2 as integer
+        :param spec: Optional CipherSpec (default: A5/2)
+    """
+    spec = spec or A5_2_SPEC
+    packed = 0
+    for fc_positions, start in zip(spec.fc_positions, spec.start_in_solution):
+        for i, delta in enumerate(register_difference(fc_positions, difference, spec.frame_counter_size)):
+            if delta:
+                packed |= 1 << (63 - start - i)
+    return packed
+
+
+def r4_difference(difference, spec=None):
+    """
+        :param difference: F1 XOR F2 as integer
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return R4 of frame 1 XOR R4 of frame 2 as integer (bit i is R4[i])
+    """
+    spec = spec or A5_2_SPEC
+    value = 0
+    for i, delta in enumerate(register_difference(spec.fc_positions[3], difference, spec.frame_counter_size)):
+        if delta:
+            value |= 1 << (spec.r4.size - 1 - i)
+    return value
+
+
+def usable_differences(spec=None):
+    """
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return sorted list with all frame counter differences that leave
+                R4 unchanged
+    """
+    spec = spec or A5_2_SPEC
+    # each R4 variable gives a linear equation over the frame counter bits,
+    # the usable differences are the non-zero elements of the kernel
+    equations = []
+    for positions in spec.fc_positions[3]:
+        row = 0
+        for pos in positions:
+            row ^= 1 << (spec.frame_counter_size - 1 - pos)
+        if row:
+            equations.append(row)
+    pivots = {}
+    for row in equations:
+        for bit, pivot_row in pivots.items():
+            if (row >> bit) & 1:
+                row ^= pivot_row
+        if row:
+            bit = row.bit_length() - 1
+            for other in pivots:
+                if (pivots[other] >> bit) & 1:
+                    pivots[other] ^= row
+            pivots[bit] = row
+    free_bits = [bit for bit in range(spec.frame_counter_size) if bit not in pivots]
+    basis = []
+    for free_bit in free_bits:
+        vector = 1 << free_bit
+        for bit, pivot_row in pivots.items():
+            if (pivot_row >> free_bit) & 1:
+                vector |= 1 << bit
+        basis.append(vector)
+    differences = []
+    for combination in itertools.product([0, 1], repeat=len(basis)):
+        difference = 0
+        for use, vector in zip(combination, basis):
+            if use:
+                difference ^= vector
+        if difference:
+            differences.append(difference)
+    return sorted(differences)
+
+
+class DeltaTable(object):
+    """
+        Differences of the initial variables of R1, R2 and R3 for one
+        frame counter difference
+    """
+    def __init__(self, difference, spec=None):
+        spec = spec or A5_2_SPEC
+        self.difference = difference
+        (self.r1, self.r2, self.r3) = [register_difference(fc_positions, difference, spec.frame_counter_size)
+                                       for fc_positions in spec.fc_positions[:3]]
+
+
+def get_delta_table(difference, spec=None):
+    """
+        :param difference: F1 XOR F2 as integer
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return the cached DeltaTable for this difference
+    """
+    spec = spec or A5_2_SPEC
+    table = _delta_tables.get((spec, difference))
+    if table is None:
+        table = DeltaTable(difference, spec)
+        _delta_tables[(spec, difference)] = table
+    return table
@@ -0,0 +1,30 @@
+import unittest
+from a5_2 import A5_2
+from frame_difference import is_usable_difference, usable_differences, get_delta_table
+from constant import *
+
+
+class FrameDifferenceTest(unittest.TestCase):
+
+    def test_usable_differences(self):
+        differences = usable_differences()
+        self.assertIn(FRAME_COUNTER_DIFFERENCE, differences)
+        self.assertEqual(len(differences), 63)
+        self.assertFalse(is_usable_difference(1))
+        self.assertFalse(is_usable_difference(0))
+
+    def test_r4_is_identical(self):
+        key = 0xfaf3df3fa6698c0c
+        f1 = 0x7c084
+        for difference in usable_differences()[:4]:
+            a52_1 = A5_2(key, f1)
+            a52_1.get_key_stream(generate_only_send_key=True)
+            a52_2 = A5_2(key, f1 ^ difference)
+            a52_2.get_key_stream(generate_only_send_key=True)
+            self.assertEqual(a52_1.initial_sates['r4'].register, a52_2.initial_sates['r4'].register)
+
+    def test_delta_table_is_cached(self):
+        self.assertIs(get_delta_table(FRAME_COUNTER_DIFFERENCE), get_delta_table(FRAME_COUNTER_DIFFERENCE))
+
+if __name__ == '__main__':
+    unittest.main()
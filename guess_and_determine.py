@@ -0,0 +1,258 @@
+import itertools
+import time
+from a5_1_core import A51Core, A51Parameters
+from online_attack import Echelon
+from instrumentation import metrics, Exporter, WorkerFlusher
+from progress import ProgressReporter, create_counters
+from multiprocessing import Event, Pool, Queue
+
+# number of guessed bits that are fixed per task
+DEFAULT_SPLIT_BITS = 6
+# guesses between two checks of the stop signal
+CHECK_INTERVAL = 1024
+# keystream bits which are compared before the whole keystream is generated
+QUICK_CHECK_BITS = 16
+
+solution_found = None
+metrics_flusher = None
+progress_counters = None
+
+
+class Stopped(Exception):
+    pass
+
+
+class GuessAndDetermine(object):
+    """
+        Guess-and-determine attack on A5/1. The variables are the bits of the
+        state before the first keystream bit. For known clock counts every
+        register bit is a linear combination of these variables, so the
+        attack only guesses the clocking bits (R1_CLOCKING_BIT,
+        R2_CLOCKING_BIT and R3_CLOCKING_BIT) which are not yet determined.
+        The clocking bits give the clock counts and each keystream bit adds a
+        linear equation, branches with a contradiction are pruned.
+    """
+    def __init__(self, keystream, parameters=None, stop=None):
+        """
+            :param keystream: send keystream as integer
+            :param parameters: Optional A51Parameters (default: A5/1)
+            :param stop: Optional Event, the search stops when it is set
+        """
+        self.core = A51Core(parameters)
+        self.parameters = self.core.parameters
+        self.keystream = keystream
+        self.length = self.parameters.keystream_size
+        self.bits = [(keystream >> (self.length - 1 - t)) & 1 for t in range(self.length)]
+        self.stop = stop
+        self.guesses = 0
+        (self.clock_forms, self.output_forms) = self._symbolic_registers()
+
+    def _symbolic_registers(self):
+        """
+            :return tuple (clock_forms, output_forms): the linear forms of the
+                    clocking bit and the highest bit of each register after
+                    c clocks (c = 0 ... keystream size)
+        """
+        clock_forms = []
+        output_forms = []
+        offset = 0
+        for size, taps, clocking_bit in zip(self.parameters.sizes, self.parameters.taps,
+                                            self.parameters.clocking_bits):
+            register = [1 << (offset + i) for i in range(size)]
+            register_clock_forms = []
+            register_output_forms = []
+            for c in range(self.length + 1):
+                register_clock_forms.append(register[clocking_bit])
+                register_output_forms.append(register[size - 1])
+                feedback = 0
+                for tap in taps:
+                    feedback ^= register[tap]
+                register = [feedback] + register[:-1]
+            clock_forms.append(register_clock_forms)
+            output_forms.append(register_output_forms)
+            offset += size
+        return (clock_forms, output_forms)
+
+    def search(self, prefix=()):
+        """
+            Generates all states which produce the keystream
+            :param prefix: values of the first guesses. Only leaves whose
+                           unused prefix values are 0 are reported, so the
+                           prefixes split the search without duplicates.
+        """
+        return self._branch(Echelon(self.parameters.state_size), (0, 0, 0), 0, tuple(prefix), 0)
+
+    def _branch(self, echelon, counts, t, prefix, depth):
+        if echelon.rank() == self.parameters.state_size:
+            if any(prefix[depth:]):
+                return
+            state = 0
+            for bit, (row, b) in echelon.pivots.items():
+                state |= b << bit
+            with metrics.stage('verification'):
+                # most wrong states already fail in the first bits
+                verified = self.core.keystream(state, QUICK_CHECK_BITS) == self.keystream >> (
+                    self.length - QUICK_CHECK_BITS) and self.core.keystream(state, self.length) == self.keystream
+            if verified:
+                yield state
+            return
+        if t == self.length:
+            # the keystream does not determine the state
+            return
+        for j in range(3):
+            form = self.clock_forms[j][counts[j]]
+            (row, b) = echelon.reduce(form)
+            if row:
+                # guess the undetermined clocking bit
+                values = (prefix[depth],) if depth < len(prefix) else (0, 1)
+                for value in values:
+                    if depth >= len(prefix):
+                        self._count_guess()
+                    branch = echelon.copy()
+                    branch.add(row, b ^ value)
+                    for state in self._branch(branch, counts, t, prefix, depth + 1):
+                        yield state
+                return
+        clocking_bits = [echelon.reduce(self.clock_forms[j][counts[j]])[1] for j in range(3)]
+        majority = (clocking_bits[0] & clocking_bits[1]) | (clocking_bits[0] & clocking_bits[2]) | \
+                   (clocking_bits[1] & clocking_bits[2])
+        counts = tuple(count + (bit == majority) for count, bit in zip(counts, clocking_bits))
+        output = self.output_forms[0][counts[0]] ^ self.output_forms[1][counts[1]] ^ self.output_forms[2][counts[2]]
+        branch = echelon.copy()
+        if branch.add(output, self.bits[t]):
+            for state in self._branch(branch, counts, t + 1, prefix, depth):
+                yield state
+
+    def _count_guess(self):
+        self.guesses += 1
+        if self.guesses % CHECK_INTERVAL == 0:
+            metrics.increment('guesses', CHECK_INTERVAL)
+            if self.stop is not None and self.stop.is_set():
+                raise Stopped()
+            if metrics_flusher:
+                metrics_flusher.maybe_flush()
+
+    def recover(self, frame_counter, prefix=()):
+        """
+            :return tuple (session key, state) or None
+        """
+        for state in self.search(prefix):
+            with metrics.stage('key_recovery'):
+                for key in self.core.recover_keys(state, 0, frame_counter):
+                    if self.core.generate(key, frame_counter)[0] == self.keystream:
+                        metrics.increment('keys_found')
+                        return (key, state)
+        return None
+
+
+def init_pool(event, metrics_queue=None, metrics_interval=None, counters=None):
+    """
+        :param event: Multiprocessing Event, set as soon as a worker found
+                      the session key
+        :param metrics_queue: Optional multiprocessing Queue for the metrics
+        :param metrics_interval: seconds between two metric updates
+        :param counters: Optional shared memory array with the number of
+                         finished tasks per worker
+    """
+    global solution_found, metrics_flusher, progress_counters
+    solution_found = event
+    progress_counters = counters
+    metrics_flusher = None
+    if metrics_queue is not None:
+        metrics.enable()
+        metrics_flusher = WorkerFlusher(metrics_queue, metrics_interval)
+
+
+def search_prefixes(keystream, frame_counter, parameters, prefixes, worker=0):
+    """
+        Searches the subtrees of the given guess prefixes
+        :param parameters: A51Parameters as dictionary
+        :param worker: index of the progress counter of this worker
+        :return tuple (session key or None, state or None, number of guesses)
+    """
+    attack = GuessAndDetermine(keystream, A51Parameters.from_dict(parameters), solution_found)
+    result = None
+    try:
+        for prefix in prefixes:
+            if solution_found is not None and solution_found.is_set():
+                break
+            result = attack.recover(frame_counter, prefix)
+            if progress_counters is not None:
+                progress_counters[worker] += 1
+            if result:
+                if solution_found is not None:
+                    solution_found.set()
+                break
+    except Stopped:
+        pass
+    finally:
+        metrics.increment('guesses', attack.guesses % CHECK_INTERVAL)
+        if metrics_flusher:
+            metrics_flusher.flush()
+    if result:
+        return (result[0], result[1], attack.guesses)
+    return (None, None, attack.guesses)
+
+
+def check_arguments(keystream, frame_counter, parameters):
+    if not 0 <= keystream < 2 ** parameters.keystream_size:
+        raise ValueError('Keystream must be between 0 and 2^' + str(parameters.keystream_size) + '!')
+    if not 0 <= frame_counter < 2 ** parameters.frame_counter_size:
+        raise ValueError('Frame counter must be between 0 and 2^' + str(parameters.frame_counter_size) + '!')
+
+
+def init_attack(keystream, frame_counter, number_of_processes, parameters=None, split_bits=DEFAULT_SPLIT_BITS,
+                metrics_file=None, metrics_interval=10, progress_interval=None):
+    """
+        Distributes the guess prefixes over multiple processes
+        :param keystream: send keystream as integer
+        :param frame_counter: frame counter of the keystream
+        :param parameters: Optional A51Parameters (default: A5/1)
+        :param split_bits: number of guesses fixed per task (2^split_bits
+                           tasks)
+        :param metrics_file: Optional file for the instrumentation snapshot
+        :param metrics_interval: seconds between two snapshots
+        :param progress_interval: Optional, seconds between two progress
+                                  reports on stderr
+        :return tuple (session key or None, state or None, number of
+                guesses, seconds)
+    """
+    parameters = parameters or A51Parameters()
+    check_arguments(keystream, frame_counter, parameters)
+    start_time = time.perf_counter()
+    prefixes = list(itertools.product([0, 1], repeat=split_bits))
+    groups = [prefixes[i::number_of_processes] for i in range(number_of_processes)]
+    solution_found = Event()
+    metrics_queue = None
+    exporter = None
+    if metrics_file:
+        metrics_queue = Queue()
+        exporter = Exporter(metrics_queue, metrics_file, metrics_interval)
+        exporter.start()
+    counters = None
+    reporter = None
+    if progress_interval:
+        counters = create_counters(number_of_processes)
+        reporter = ProgressReporter(counters, [len(group) for group in groups], progress_interval)
+        reporter.start()
+    pool = Pool(processes=number_of_processes, initializer=init_pool,
+                initargs=(solution_found, metrics_queue, metrics_interval, counters))
+    procs = [pool.apply_async(search_prefixes, args=(keystream, frame_counter, parameters.to_dict(), group, i))
+             for i, group in enumerate(groups)]
+    session_key = None
+    state = None
+    guesses = 0
+    for p in procs:
+        (worker_key, worker_state, worker_guesses) = p.get()
+        guesses += worker_guesses
+        if worker_key is not None:
+            (session_key, state) = (worker_key, worker_state)
+    pool.close()
+    pool.join()
+    seconds = time.perf_counter() - start_time
+    if exporter:
+        exporter.stop()
+    if reporter:
+        reporter.stop(session_key is not None,
+                      '{} guesses, {:.0f} guesses/s'.format(guesses, guesses / seconds if seconds > 0 else 0.0))
+    return (session_key, state, guesses, seconds)
@@ -0,0 +1,33 @@
+import unittest
+from a5_1_core import A51Core, A51Parameters
+from guess_and_determine import GuessAndDetermine, init_attack
+
+
+class GuessAndDetermineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parameters = A51Parameters.reduced((5, 6, 7))
+        self.core = A51Core(self.parameters)
+        self.frame_counter = 0x42
+        self.key = 0x2f0e1
+        self.keystream = self.core.generate(self.key, self.frame_counter)[0]
+
+    def test_recovers_state(self):
+        attack = GuessAndDetermine(self.keystream, self.parameters)
+        states = list(attack.search())
+        self.assertIn(self.core.initial_state(self.key, self.frame_counter), states)
+        # the prefixes split the search tree without duplicates
+        split = []
+        for prefix in [(0, 0), (0, 1), (1, 0), (1, 1)]:
+            split += list(GuessAndDetermine(self.keystream, self.parameters).search(prefix))
+        self.assertEqual(sorted(split), sorted(states))
+
+    def test_parallel_attack(self):
+        (session_key, state, guesses, seconds) = init_attack(self.keystream, self.frame_counter, 2, self.parameters,
+                                                             split_bits=3)
+        self.assertEqual(self.core.generate(session_key, self.frame_counter)[0], self.keystream)
+        self.assertEqual(self.core.initial_state(session_key, self.frame_counter), state)
+        self.assertGreater(guesses, 0)
+
+if __name__ == '__main__':
+    unittest.main()
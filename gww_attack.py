@@ -2,22 +2,43 @@ from BitVector import BitVector
 from lfsr import LFSR
 from a5_2 import A5_2
 from matrix import Matrix
+from batch_matrix import BatchMatrix, unpack_rows
 import numpy as np
 import copy
 import itertools
-from gww_registers import GwwRegisters
+from gww_registers import SymbolicCache, r4_clock_counts
 import math
+import random
 from constant import *
-from multiprocessing import Event, Pool
+from cipher_spec import A5_2_SPEC
+from instrumentation import metrics, Exporter, WorkerFlusher
+import profiling
+from progress import ProgressReporter, count_with_bit_set, create_counters, split_range
+from frame_difference import is_usable_difference
+from multiprocessing import Event, Pool, Queue
 
+# number of R4 candidates which are solved together by BatchMatrix
+BATCH_SIZE = 256
+# candidates with more free variables are deferred until all other
+# candidates have been checked (2^8 solutions)
+DEFAULT_SOLUTION_BUDGET = 8
+# symbolic register states and equation rows shared by all R4 candidates
+symbolic_cache = SymbolicCache()
+solution_found = None
+metrics_flusher = None
+progress_counters = None
+profiler = None
 
-def retrieve_session_key(r1, r2, r3):
+
+def retrieve_session_key(r1, r2, r3, spec=None):
     """
         Creates and solves system of linear equations for retrieving the
         session key
+        :param spec: Optional CipherSpec (default: A5/2)
         :return solutions for the system of linear equations
     """
-    A = Matrix(KEY_SIZE, KEY_SIZE)
+    spec = spec or A5_2_SPEC
+    A = Matrix(spec.matrix_columns, spec.key_size, spec)
     A.build_session_key_matrix()
     b = r1.register + r2.register + r3.register
     solutions = A.gauss(b)
@@ -40,51 +61,53 @@ def reverse_clock(f, r, reverse_taps):
     r.register[0] = last_element
 
 
-def reverse_frame_counter(r1, r2, r3, f):
+def reverse_frame_counter(r1, r2, r3, f, spec=None):
     """
         Revert the step where the frame counter f is clocked into the registers
         :param r1, r2, r3: register 1,2 and 3 as LFSR object
         :param f: frame counter
+        :param spec: Optional CipherSpec (default: A5/2)
     """
-    for i in range(FRAME_COUNTER_SIZE):
-        reverse_clock(f[i], r1, R1_REVERSE_TAPS)
-        reverse_clock(f[i], r2, R2_REVERSE_TAPS)
-        reverse_clock(f[i], r3, R3_REVERSE_TAPS)
+    spec = spec or A5_2_SPEC
+    (r1_taps, r2_taps, r3_taps) = [register.reverse_taps for register in spec.registers[:3]]
+    for i in range(spec.frame_counter_size):
+        reverse_clock(f[i], r1, r1_taps)
+        reverse_clock(f[i], r2, r2_taps)
+        reverse_clock(f[i], r3, r3_taps)
 
 
-def check_session_key(session_key, frame_counter, keystream):
+def check_session_key(session_key, frame_counter, keystream, spec=None):
     """
         Runs A5/2 with the session_key and frame_counter argument and
         compares the result with keystream
         :param session_key: 64 bit session key
         :param frame_counter: 22 bit frame counter
         :param keystream: expected keystream
+        :param spec: Optional CipherSpec (default: A5/2)
         :return True if the calculated keystream is equal to keystream
     """
-    a52 = A5_2(session_key, frame_counter)
+    a52 = A5_2(session_key, frame_counter, spec)
     (send_key, receive_key) = a52.get_key_stream(generate_only_send_key=True)
     return keystream == send_key
 
 
-def convert_solution_to_lfsrs(solution):
+def convert_solution_to_lfsrs(solution, spec=None):
     """
         Converts the values from the Gauss algorithm to LFSR objects.
         :param solution: array with the values from the gauss algorithm
+        :param spec: Optional CipherSpec (default: A5/2)
         :return register 1, 2 and 3 as LFSR object
     """
-    r1_value = solution[R1_START_IN_SOLUTION:R1_END_IN_SOLUTION]
-    r2_value = solution[R2_START_IN_SOLUTION:R2_END_IN_SOLUTION]
-    r3_value = solution[R3_START_IN_SOLUTION:R3_END_IN_SOLUTION]
-    r1 = LFSR(R1_SIZE, [], R1_TAPS, R1_MAJORITY_BITS, R1_NEGATED_BIT)
-    r2 = LFSR(R2_SIZE, [], R2_TAPS, R2_MAJORITY_BITS, R2_NEGATED_BIT)
-    r3 = LFSR(R3_SIZE, [], R3_TAPS, R3_MAJORITY_BITS, R3_NEGATED_BIT)
-    r1.register = BitVector(bitlist=r1_value)
-    r2.register = BitVector(bitlist=r2_value)
-    r3.register = BitVector(bitlist=r3_value)
-    return r1, r2, r3
+    spec = spec or A5_2_SPEC
+    registers = []
+    for register, start, end in zip(spec.registers, spec.start_in_solution, spec.end_in_solution):
+        lfsr = LFSR.from_spec(register)
+        lfsr.register = BitVector(bitlist=solution[start:end])
+        registers.append(lfsr)
+    return tuple(registers)
 
 
-def check_gauss_solution(solutions, r4, k, f):
+def check_gauss_solution(solutions, r4, k, f, spec=None):
     """
         Checks for each solution if it's valid.
         An A5/2 object is created and the registers are initialized with the
@@ -94,61 +117,146 @@ def check_gauss_solution(solutions, r4, k, f):
         :param solutions: List with solutions from the gauss algorithm
         :param r4: register 4 as LFSR object
         :param k: key stream to verify the solution
+        :param spec: Optional CipherSpec (default: A5/2)
         :return the session key or None
     """
-    a52 = A5_2(0x0, 0x0)
+    spec = spec or A5_2_SPEC
+    a52 = A5_2(0x0, 0x0, spec)
     for solution in solutions:
-        # r1_value, r2_value, r3_value = convert_solution_to_lfsrs(solution)
+        r1, r2, r3 = convert_solution_to_lfsrs(solution, spec)
+        with metrics.stage('verification'):
+            (send_key, receive_key) = a52.get_key_stream_with_predefined_registers(str(r1.register),
+                                                                                   str(r2.register),
+                                                                                   str(r3.register),
+                                                                                   str(r4.register),
+                                                                                   generate_only_send_key=True)
+        if send_key != k:
+            continue
+        metrics.increment('verified')
         # R1[15], R2[16] and R3[18] are always set to 1 in  the A5/2 init
         # process.In order to restore the correct values, all combinations
-        # must be checked
+        # must be checked. The keystream does not depend on these values,
+        # so it is only generated once per solution.
         for register_values in list(itertools.product([0, 1], repeat=3)):
-            r1, r2, r3 = convert_solution_to_lfsrs(solution)
-            (send_key, receive_key) = a52.get_key_stream_with_predefined_registers(str(r1.register), 
-                                                                                   str(r2.register), 
-                                                                                   str(r3.register), 
-                                                                                   str(r4.register), 
-                                                                                   generate_only_send_key=True)
-            if send_key == k:
-                r1.set_bit(FORCE_R1_BIT_TO_1, register_values[0])
-                r2.set_bit(FORCE_R2_BIT_TO_1, register_values[1])
-                r3.set_bit(FORCE_R3_BIT_TO_1, register_values[2])
-                reverse_frame_counter(r1, r2, r3, f)
-                session_keys = retrieve_session_key(r1, r2, r3)
+            r1, r2, r3 = convert_solution_to_lfsrs(solution, spec)
+            with metrics.stage('key_recovery'):
+                r1.set_bit(spec.r1.forced_bit, register_values[0])
+                r2.set_bit(spec.r2.forced_bit, register_values[1])
+                r3.set_bit(spec.r3.forced_bit, register_values[2])
+                reverse_frame_counter(r1, r2, r3, f, spec)
+                session_keys = retrieve_session_key(r1, r2, r3, spec)
                 for session_key in session_keys:
                     session_key = BitVector(bitlist=session_key)
-                    if check_session_key(session_key.int_val(), f.int_val(), k):
+                    if check_session_key(session_key.int_val(), f.int_val(), k, spec):
+                        metrics.increment('keys_found')
                         return session_key
     return None
 
 
-def perform_attack(r4, k1, k2, f1, f2, r4_given=False):
+def build_packed_system(r4_value, k, difference, spec=None):
+    """
+        Creates the system of linear equations for a R4 value from the
+        memoized symbolic register states
+        :param r4_value: R4 as integer
+        :param k: key difference k1 ^ k2 as list
+        :param difference: F1 XOR F2 as integer
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return tuple (packed rows, right-hand sides)
+    """
+    with metrics.stage('symbolic_clocking'):
+        clock_counts = r4_clock_counts(r4_value, spec=spec)
+    with metrics.stage('matrix_building'):
+        return symbolic_cache.equations(clock_counts, difference, k, spec)
+
+
+def build_equation_system(r4, k1, k2, f1, f2, spec=None):
+    """
+        Creates the system of linear equations for the key difference
+        k1 ^ k2 and a given R4
+        :param r4: register 4 as LFSR object
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return tuple (matrix, k), k contains the right-hand sides
+    """
+    spec = spec or A5_2_SPEC
+    rows, k = build_packed_system(r4.register.int_val(), list(k1 ^ k2), (f1 ^ f2).int_val(), spec)
+    A = Matrix(spec.matrix_rows, spec.matrix_columns, spec)
+    A.matrix = unpack_rows(rows, spec.matrix_columns)
+    return A, k
+
+
+def perform_attack(r4, k1, k2, f1, f2, r4_given=False, spec=None):
     """
         Tries to find the session key K
         :param r4: register 4 as LFSR object
         :param k1: first keystream
         :param k2: second keystream
         :param f1: frame counter for k1
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return the session key as BitVector or None
     """
-    key_difference = k1 ^ k2
-    k = list(key_difference)
+    metrics.increment('candidates')
     r4_init = copy.deepcopy(r4)
-    registers = GwwRegisters(f1, f2)
-    for i in range(MAJORITY_CYCLES_A52):
-        registers.clock_with_r4(r4)
-    A = Matrix(MATRIX_ROWS, MATRIX_COLUMNS)
-    A.build_init_register_matrix(registers, r4, k)
-    if A.is_solvable(k):
-        solutions = A.gauss(k)
+    A, k = build_equation_system(r4, k1, k2, f1, f2, spec)
+    # the rank check is part of the elimination, as in the batch path
+    with metrics.stage('elimination'):
+        solvable = A.is_solvable(k)
+        solutions = A.gauss(k) if solvable else []
+    if solvable:
+        metrics.increment('solvable')
+        metrics.increment('solutions', len(solutions))
         if solutions:
-            session_key = check_gauss_solution(solutions, r4_init, k1, f1)
+            session_key = check_gauss_solution(solutions, r4_init, k1, f1, spec)
             if session_key:
-                print(hex(session_key.int_val()))
                 if not r4_given:
                     solution_found.set()
+                return session_key
+    return None
 
 
-def find_r4(start_value, steps, k1, k2, f1, f2):
+def perform_batch_attack(r4_values, k1, k2, f1, f2, solution_budget=None, deferred=None, spec=None):
+    """
+        Tries to find the session key K for several R4 candidates. The
+        equation systems of all candidates are solved together.
+        :param r4_values: list with R4 values (R4[10] must be set)
+        :param k1: first keystream
+        :param k2: second keystream
+        :param f1: frame counter for k1
+        :param solution_budget: Optional, maximum number of free variables.
+                                Candidates with more free variables are not
+                                checked but appended to deferred.
+        :param deferred: list for the deferred candidates as tuples
+                         (free variables, R4 value)
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return the session key as BitVector or None
+    """
+    spec = spec or A5_2_SPEC
+    k = list(k1 ^ k2)
+    difference = (f1 ^ f2).int_val()
+    rows = []
+    b = []
+    for value in r4_values:
+        (value_rows, value_b) = build_packed_system(value, k, difference, spec)
+        rows.append(value_rows)
+        b.append(value_b)
+    with metrics.stage('elimination'):
+        systems = BatchMatrix(np.array(rows, dtype=np.uint64), np.array(b), spec.matrix_columns).eliminate()
+    free_variables = systems.nullspace_dimension()
+    for i in np.nonzero(systems.consistent)[0]:
+        metrics.increment('solvable')
+        if solution_budget is not None and free_variables[i] > solution_budget:
+            metrics.increment('deferred')
+            deferred.append((int(free_variables[i]), r4_values[i]))
+            continue
+        metrics.increment('solutions', 2 ** int(free_variables[i]))
+        solutions = systems.iter_solutions(i)
+        r4 = LFSR.from_spec(spec.r4, int_value=r4_values[i])
+        session_key = check_gauss_solution(solutions, r4, k1, f1, spec)
+        if session_key:
+            return session_key
+    return None
+
+
+def find_r4(start_value, steps, k1, k2, f1, f2, worker=0, solution_budget=None, spec=None):
     """
         Iterates through all posible values for r4 and
         performs the attack
@@ -156,23 +264,95 @@ def find_r4(start_value, steps, k1, k2, f1, f2):
         :param steps: number of iterations for r4
         :param k1, k2: keystream 1 and 2
         :param f: frame counter for k1
+        :param worker: index of the progress counter of this worker
+        :param solution_budget: Optional, maximum number of free variables
+                                of a candidate that is checked immediately
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return tuple (session key as integer or None, list with the
+                deferred candidates as tuples (free variables, R4 value))
     """
-    for i in range(start_value, start_value + steps, 1):
+    deferred = []
+    try:
+        return _find_r4(start_value, steps, k1, k2, f1, f2, worker, solution_budget, deferred,
+                        spec or A5_2_SPEC), deferred
+    finally:
+        if metrics_flusher:
+            metrics_flusher.flush()
+        if profiler:
+            profiler.dump()
+
+
+def _find_r4(start_value, steps, k1, k2, f1, f2, worker, solution_budget, deferred, spec):
+    candidates = [i for i in range(start_value, start_value + steps) if (i >> spec.r4.forced_bit) & 1]
+    for batch_start in range(0, len(candidates), BATCH_SIZE):
         if solution_found.is_set():
             break
-        r4 = LFSR(R4_SIZE, R4_CLOCK_BITS, R4_TAPS, [], None, None, i)
-        if r4.get_bit(10) == 1:
-            perform_attack(r4, k1, k2, f1, f2)
+        batch = candidates[batch_start:batch_start + BATCH_SIZE]
+        metrics.increment('candidates', len(batch))
+        with profiling.section(profiler):
+            session_key = perform_batch_attack(batch, k1, k2, f1, f2, solution_budget, deferred, spec)
+        if progress_counters is not None:
+            progress_counters[worker] += len(batch)
+        if metrics_flusher:
+            metrics_flusher.maybe_flush()
+        if session_key:
+            solution_found.set()
+            return session_key.int_val()
+    return None
+
 
+def solve_deferred(r4_values, k1, k2, f1, f2, spec=None, worker=None):
+    """
+        Checks the deferred candidates without solution budget
+        :param r4_values: list with R4 values, cheapest candidates first
+        :param spec: Optional CipherSpec (default: A5/2)
+        :param worker: Optional, index of the progress counter for the
+                       checked candidates
+        :return the session key as integer or None
+    """
+    try:
+        for value in r4_values:
+            if solution_found.is_set():
+                break
+            with profiling.section(profiler):
+                session_key = perform_batch_attack([value], k1, k2, f1, f2, spec=spec)
+            if progress_counters is not None and worker is not None:
+                progress_counters[worker] += 1
+            if metrics_flusher:
+                metrics_flusher.maybe_flush()
+            if session_key:
+                solution_found.set()
+                return session_key.int_val()
+        return None
+    finally:
+        if metrics_flusher:
+            metrics_flusher.flush()
+        if profiler:
+            profiler.dump()
 
-def init_pool(event):
+
+def init_pool(event, metrics_queue=None, metrics_interval=None, counters=None, profile=None):
     """
         Break condition for all processes as soon as a valid
         solution has been found
         :param event: Multiprocessing Event
+        :param metrics_queue: Optional multiprocessing Queue. If given, the
+                              instrumentation is enabled and the metrics
+                              are sent to the parent process.
+        :param metrics_interval: seconds between two metric updates
+        :param counters: Optional shared memory array with the number of
+                         processed candidates per worker
+        :param profile: Optional profiling.ProfileSettings, a share of the
+                        candidate batches is profiled
     """
-    global solution_found
+    global solution_found, metrics_flusher, progress_counters, profiler
     solution_found = event
+    progress_counters = counters
+    profiler = profiling.WorkerProfiler(profile) if profile else None
+    metrics_flusher = None
+    if metrics_queue is not None:
+        metrics.enable()
+        metrics_flusher = WorkerFlusher(metrics_queue, metrics_interval)
 
 
 def check_range(value, min, max, name):
@@ -180,37 +360,161 @@ def check_range(value, min, max, name):
         raise ValueError(name + ' must be between ' + str(min) + ' and 2^' + str(max) + '!')
 
 
-def check_arguments(k1, k2, f1, f2):
-    check_range(k1, 0, KEY_STREAM_SIZE, 'Keystream 1')
-    check_range(k2, 0, KEY_STREAM_SIZE, 'Keystream 2')
-    check_range(f1, 0, FRAME_COUNTER_SIZE, 'Frame Counter 1')
-    check_range(f2, 0, FRAME_COUNTER_SIZE, 'Frame Counter 2')
-    if (f1 ^ f2) != FRAME_COUNTER_DIFFERENCE:
-        raise ValueError('Frame Counter XOR must be 2048!')
+def check_arguments(k1, k2, f1, f2, spec=None):
+    spec = spec or A5_2_SPEC
+    check_range(k1, 0, spec.keystream_size, 'Keystream 1')
+    check_range(k2, 0, spec.keystream_size, 'Keystream 2')
+    check_range(f1, 0, spec.frame_counter_size, 'Frame Counter 1')
+    check_range(f2, 0, spec.frame_counter_size, 'Frame Counter 2')
+    if not is_usable_difference(f1 ^ f2, spec):
+        raise ValueError('Frame counters are not usable: R4 differs for F1 XOR F2 = ' + hex(f1 ^ f2) + '!')
 
 
-def init_attack(k1_value, k2_value, f1, f2, number_of_processes):
+def estimate_free_variables(k1_value, k2_value, f1, f2, samples=8, seed=0, spec=None):
+    """
+        Estimates how well-conditioned the equation systems of a frame pair
+        are by solving them for a few random R4 values
+        :param k1_value, k2_value: keystream values
+        :param f1, f2: frame counters
+        :param samples: number of random R4 values
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return mean number of free variables
+    """
+    spec = spec or A5_2_SPEC
+    rng = random.Random(seed)
+    k1 = BitVector(size=spec.keystream_size, intVal=k1_value)
+    k2 = BitVector(size=spec.keystream_size, intVal=k2_value)
+    f1 = BitVector(size=spec.frame_counter_size, intVal=f1)
+    f2 = BitVector(size=spec.frame_counter_size, intVal=f2)
+    rows = []
+    b = []
+    for i in range(samples):
+        r4_value = rng.getrandbits(spec.r4.size) | (1 << spec.r4.forced_bit)
+        (value_rows, value_b) = build_packed_system(r4_value, list(k1 ^ k2), (f1 ^ f2).int_val(), spec)
+        rows.append(value_rows)
+        b.append(value_b)
+    systems = BatchMatrix(np.array(rows, dtype=np.uint64), np.array(b), spec.matrix_columns).eliminate()
+    return float(np.mean(systems.nullspace_dimension()))
+
+
+def select_frame_pair(frames, samples=8, spec=None):
+    """
+        Chooses the frame pair for the attack. All pairs with a usable frame
+        counter difference are considered, the pair with the fewest free
+        variables is returned.
+        :param frames: list with tuples (keystream, frame counter)
+        :param samples: number of random R4 values per pair
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return tuple (k1, f1, k2, f2)
+    """
+    pairs = [(k1, f1, k2, f2) for (k1, f1), (k2, f2) in itertools.combinations(frames, 2)
+             if is_usable_difference(f1 ^ f2, spec)]
+    if len(pairs) == 1:
+        return pairs[0]
+    best = None
+    best_free_variables = None
+    for (k1, f1, k2, f2) in pairs:
+        free_variables = estimate_free_variables(k1, k2, f1, f2, samples, spec=spec)
+        if best is None or free_variables < best_free_variables:
+            best = (k1, f1, k2, f2)
+            best_free_variables = free_variables
+    if best is None:
+        raise ValueError('No frame pair with a usable frame counter difference!')
+    return best
+
+
+def init_attack(k1_value, k2_value, f1, f2, number_of_processes, metrics_file=None, metrics_interval=10,
+                progress_interval=None, solution_budget=DEFAULT_SOLUTION_BUDGET, spec=None, profile=None):
     """
         Initializes the attack and creates multiple processes
         :param k1_value, k2_value: keystream values
         :param f1: frame counter for keystream 1
+        :param metrics_file: Optional file for the instrumentation snapshot
+                             (JSON, or Prometheus text format if the name
+                             ends with .prom)
+        :param metrics_interval: seconds between two snapshots
+        :param progress_interval: Optional, seconds between two progress
+                                  reports on stderr
+        :param solution_budget: Candidates whose systems have more free
+                                variables are deferred until all other
+                                candidates have been checked (None disables
+                                the deferral)
+        :param spec: Optional CipherSpec, e.g. a reduced variant
+                     (default: A5/2)
+        :param profile: Optional profiling.ProfileSettings. The workers
+                        profile a share of the candidate batches and the
+                        per-worker files are merged after the attack.
+        :return the session key as integer or None
     """
-    check_arguments(k1_value, k2_value, f1, f2)
-    k1 = BitVector(size=STREAM_KEY_SIZE, intVal=k1_value)
-    k2 = BitVector(size=STREAM_KEY_SIZE, intVal=k2_value)
-    f1 = BitVector(size=FRAME_COUNTER_SIZE, intVal=f1)
-    f2 = BitVector(size=FRAME_COUNTER_SIZE, intVal=(f2))
+    spec = spec or A5_2_SPEC
+    check_arguments(k1_value, k2_value, f1, f2, spec)
+    k1 = BitVector(size=spec.keystream_size, intVal=k1_value)
+    k2 = BitVector(size=spec.keystream_size, intVal=k2_value)
+    f1 = BitVector(size=spec.frame_counter_size, intVal=f1)
+    f2 = BitVector(size=spec.frame_counter_size, intVal=(f2))
     solution_found = Event()
-    pool = Pool(processes=number_of_processes, initializer=init_pool,
-                initargs=(solution_found,))
-    procs = []
-    for i in range(number_of_processes):
-        steps = int(math.pow(2, 17) / number_of_processes)
-        start_value = steps * i
-        procs.append(pool.apply_async(find_r4, args=(start_value, steps, k1,
-                     k2, f1, f2)))
-    for p in procs:
-        p.get()
+    metrics_queue = None
+    exporter = None
+    counters = None
+    reporter = None
+    pool = None
+    session_key = None
+    deferred = []
+    try:
+        if metrics_file:
+            metrics_queue = Queue()
+            exporter = Exporter(metrics_queue, metrics_file, metrics_interval)
+            exporter.start()
+        if profile:
+            profiling.prepare_directory(profile.directory)
+        chunks = split_range(2 ** spec.r4.size, number_of_processes)
+        if progress_interval:
+            # the second half of the counters is used for the deferred pass
+            counters = create_counters(2 * number_of_processes)
+            totals = [count_with_bit_set(start, start + steps, spec.r4.forced_bit) for start, steps in chunks]
+            reporter = ProgressReporter(counters, totals, progress_interval)
+            reporter.start()
+        pool = Pool(processes=number_of_processes, initializer=init_pool,
+                    initargs=(solution_found, metrics_queue, metrics_interval, counters, profile))
+        procs = []
+        for i, (start_value, steps) in enumerate(chunks):
+            procs.append(pool.apply_async(find_r4, args=(start_value, steps, k1,
+                         k2, f1, f2, i, solution_budget, spec)))
+        for p in procs:
+            (result, worker_deferred) = p.get()
+            deferred += worker_deferred
+            if result is not None:
+                session_key = result
+        if session_key is None and deferred:
+            # cheapest candidates first, distributed round-robin over the workers
+            r4_values = [value for (free_variables, value) in sorted(deferred)]
+            shares = [r4_values[i::number_of_processes] for i in range(number_of_processes)]
+            if reporter:
+                reporter.start_phase('deferred', number_of_processes, [len(share) for share in shares])
+            procs = [pool.apply_async(solve_deferred, args=(share, k1, k2, f1, f2, spec, number_of_processes + i))
+                     for i, share in enumerate(shares)]
+            for p in procs:
+                result = p.get()
+                if result is not None:
+                    session_key = result
+        pool.close()
+        pool.join()
+    finally:
+        # also if a worker failed: stop the remaining workers and write the
+        # final metrics snapshot and progress summary
+        if pool is not None:
+            pool.terminate()
+        if exporter:
+            exporter.stop()
+        if reporter:
+            summary = None
+            if deferred:
+                summary = 'deferred {} candidates (free variables {}-{})'.format(len(deferred), min(deferred)[0],
+                                                                                 max(deferred)[0])
+            reporter.stop(session_key is not None, summary)
+    if profile:
+        profiling.merge_profiles(profile.directory)
+    return session_key
 
 
 def main():
@@ -230,8 +534,9 @@ def main():
 
     r4 = copy.deepcopy(a52.initial_sates['r4'])
 
-    solution_found = Event()
-    perform_attack(r4, send_key, send_key2, f_init, f2_init, r4_given=True)
+    session_key = perform_attack(r4, send_key, send_key2, f_init, f2_init, r4_given=True)
+    if session_key:
+        print(hex(session_key.int_val()))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+import gww_attack
+from a5_2 import A5_2
+from cipher_spec import CipherSpec
+from BitVector import BitVector
+
+SPEC = CipherSpec.reduced((5, 6, 7, 8))
+KEY = 0x8996
+F1 = 0x246dd6
+F2 = 0x246ccf
+
+
+def keystream(key, frame_counter):
+    return A5_2(key, frame_counter, SPEC).get_key_stream(generate_only_send_key=True)[0]
+
+
+class GwwAttackTest(unittest.TestCase):
+
+    def test_deferred_candidates(self):
+        k1 = keystream(KEY, F1)
+        k2 = keystream(KEY, F2)
+        a52 = A5_2(KEY, F1, SPEC)
+        a52.get_key_stream(generate_only_send_key=True)
+        r4 = a52.initial_sates['r4'].register.int_val()
+        f1 = BitVector(size=SPEC.frame_counter_size, intVal=F1)
+        f2 = BitVector(size=SPEC.frame_counter_size, intVal=F2)
+        gww_attack.init_pool(None)
+        # the system of the correct R4 has three free variables
+        deferred = []
+        self.assertIsNone(gww_attack.perform_batch_attack([r4], k1, k2, f1, f2, 1, deferred, SPEC))
+        self.assertEqual(deferred, [(3, r4)])
+
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            session_key = gww_attack.init_attack(k1.int_val(), k2.int_val(), F1, F2, 2, progress_interval=60,
+                                                 solution_budget=1, spec=SPEC)
+        self.assertIsNotNone(session_key)
+        self.assertEqual(keystream(session_key, F1), k1)
+        summary = stderr.getvalue().splitlines()[-1]
+        self.assertIn('session key found', summary)
+        # all candidates were swept before the deferred pass found the key
+        self.assertTrue(summary.startswith('finished: 128/128 candidates'))
+        self.assertRegex(summary, r'deferred [1-9]\d*/\d+ candidates')
+
+    def test_worker_error(self):
+        # the invalid solution budget fails in the workers
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'metrics.json')
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                with self.assertRaises(TypeError):
+                    gww_attack.init_attack(keystream(KEY, F1).int_val(), keystream(KEY, F2).int_val(), F1, F2, 2,
+                                           path, 60, progress_interval=60, solution_budget='x', spec=SPEC)
+            # the final snapshot and the summary are written, the pool is stopped
+            with open(path) as f:
+                self.assertIn('counters', json.load(f))
+            self.assertTrue(stderr.getvalue().splitlines()[-1].startswith('finished:'))
+            self.assertEqual(multiprocessing.active_children(), [])
+        finally:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,25 @@
-from collections import Counter
-from constant import *
+from collections import Counter, OrderedDict
+import numpy as np
+from BitVector import BitVector
+import kernels
+from cipher_spec import A5_2_SPEC
+from frame_difference import get_delta_table
 
 
 class GwwRegisters:
-    def __init__(self, f1, f2):
-        self.r1 = GwwRegister(R1_SIZE, R1_TAPS, R1_X_DELTA_PRODUCTS, R1_DELTA_DELTA_PRODUCTS, 'r1', R1_FC_POSITIONS_AFTER_CLOCKING, f1, f2)
-        self.r2 = GwwRegister(R2_SIZE, R2_TAPS, R2_X_DELTA_PRODUCTS, R2_DELTA_DELTA_PRODUCTS, 'r2', R2_FC_POSITIONS_AFTER_CLOCKING, f1, f2)
-        self.r3 = GwwRegister(R3_SIZE, R3_TAPS, R3_X_DELTA_PRODUCTS, R3_DELTA_DELTA_PRODUCTS, 'r3', R3_FC_POSITIONS_AFTER_CLOCKING, f1, f2) 
+    def __init__(self, f1, f2, spec=None):
+        """
+            :param f1: frame counter for keystream 1
+            :param f2: frame counter for keystream 2
+            :param spec: Optional CipherSpec (default: A5/2)
+        """
+        self.spec = spec or A5_2_SPEC
+        deltas = get_delta_table((f1 ^ f2).int_val(), self.spec)
+        (self.r1, self.r2, self.r3) = [
+            GwwRegister(register.size, register.taps, x_delta_products, delta_delta_products, name, variable_deltas)
+            for register, x_delta_products, delta_delta_products, name, variable_deltas
+            in zip(self.spec.registers, self.spec.x_delta_products, self.spec.delta_delta_products,
+                   ('r1', 'r2', 'r3'), (deltas.r1, deltas.r2, deltas.r3))]
 
     def clock(self, register):
         """
@@ -26,11 +39,12 @@ class GwwRegisters:
             :param r4: register 4 as LFSR object
         """
         majority = self._majority(r4)
-        if r4.get_bit(R4_CLOCKING_BIT_FOR_R1) == majority:
+        (bit_for_r1, bit_for_r2, bit_for_r3) = self.spec.clocking_bits
+        if r4.get_bit(bit_for_r1) == majority:
             self.r1.clock()
-        if r4.get_bit(R4_CLOCKING_BIT_FOR_R2) == majority:
+        if r4.get_bit(bit_for_r2) == majority:
             self.r2.clock()
-        if r4.get_bit(R4_CLOCKING_BIT_FOR_R3) == majority:
+        if r4.get_bit(bit_for_r3) == majority:
             self.r3.clock()
         r4.clock()
 
@@ -48,7 +62,7 @@ class GwwRegister:
         cycles and after the key setup)to calculate the actual value in
         the current cycle
     """
-    def __init__(self, size, taps, x_delta_products, delta_delta_products, register_no, fc_positions, f1, f2):
+    def __init__(self, size, taps, x_delta_products, delta_delta_products, register_no, variable_deltas):
         """
             :param size: The size of the register
             :param taps: Array, containing the positions for the variables
@@ -61,9 +75,8 @@ class GwwRegister:
                                          Example for R1: delta_14 * delta_12  XOR delta_14 * delta_15 XOR delta_15 * delta_12 XOR delta_12 XOR delta_15 XOR delta_18
                                                   --> [(14, 12), (14, 15), (15, 12), (12, 12), (15, 15), (18, 18)]
             :param register_no: The register name. Only valid values are r1, r2, r3 or r4 (Must match the delta dictionary!)
-            :param fc_positions: Contains the frame counter positions which are XORed with the register values (required for computing deltas)
-            :param f1: frame counter for keystream 1
-            :param f2: frame counter for keystream 2
+            :param variable_deltas: Difference of each initial variable between the two frames
+                                    (precomputed per frame counter difference, see frame_difference.DeltaTable)
         """
         self.size = size
         self.taps = taps
@@ -71,9 +84,7 @@ class GwwRegister:
         self.x_delta_products = x_delta_products
         self.delta_delta_products = delta_delta_products
         self.register = [None] * size
-        self.fc_positions = fc_positions
-        self.f1 = f1
-        self.f2 = f2
+        self.variable_deltas = variable_deltas
         for i in range(size):
             self.register[i] = [i]
 
@@ -108,8 +119,7 @@ class GwwRegister:
         for i, values in enumerate(self.register):
             delta = 0
             for value in values:
-                for pos in self.fc_positions[value]:
-                    delta = delta ^ self.f1[pos] ^ self.f2[pos]
+                delta = delta ^ self.variable_deltas[value]
             deltas[i] = delta
         return deltas
 
@@ -132,3 +142,138 @@ class GwwRegister:
         result = result % 2
         g_delta[-1] = result
         return g_delta
+
+
+def r4_clock_counts(r4_value, cycles=None, spec=None):
+    """
+        Runs R4 and counts how often R1, R2 and R3 are clocked. The symbolic
+        state of each register only depends on this count.
+        :param r4_value: R4 after the key setup as integer (bit i is R4[i])
+        :param cycles: number of clocking cycles (default: warm-up and
+                       keystream cycles)
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return list with a tuple (clocks of r1, r2, r3) after each cycle
+    """
+    spec = spec or A5_2_SPEC
+    if cycles is None:
+        cycles = spec.warm_up_cycles + spec.matrix_rows
+    if kernels.enabled:
+        arrays = kernels.spec_arrays(spec)
+        counts = np.zeros((cycles, 3), dtype=np.int64)
+        kernels.clock_counts(r4_value, arrays.size_masks[3], arrays.tap_masks[3], arrays.clock_bits,
+                             arrays.clocking_bits, counts)
+        return [tuple(count) for count in counts.tolist()]
+    mask = (1 << spec.r4.size) - 1
+    a, b, c = spec.r4.clock_bits
+    bit_for_r1, bit_for_r2, bit_for_r3 = spec.clocking_bits
+    taps = spec.r4.taps
+    counts = []
+    c1 = c2 = c3 = 0
+    r4 = r4_value
+    for i in range(cycles):
+        x = (r4 >> a) & 1
+        y = (r4 >> b) & 1
+        z = (r4 >> c) & 1
+        majority = (x & y) | (x & z) | (y & z)
+        if (r4 >> bit_for_r1) & 1 == majority:
+            c1 += 1
+        if (r4 >> bit_for_r2) & 1 == majority:
+            c2 += 1
+        if (r4 >> bit_for_r3) & 1 == majority:
+            c3 += 1
+        feedback = 0
+        for tap in taps:
+            feedback ^= (r4 >> tap) & 1
+        r4 = ((r4 << 1) & mask) | feedback
+        counts.append((c1, c2, c3))
+    return counts
+
+
+class GwwRowTable:
+    """
+        Memoized g_delta rows of one register, indexed by the number of
+        clocking cycles of the register. The rows are packed into an integer
+        (column 0 is bit 63) and extended lazily, so all R4 candidates share
+        the symbolic states of their common prefix.
+    """
+    def __init__(self, register, start_column):
+        """
+            :param register: GwwRegister in its initial state
+            :param start_column: column of the first variable of the
+                                 register in the equation system
+        """
+        self.register = register
+        self.start_column = start_column
+        self.rows = []
+        self.constants = []
+
+    def row(self, clocks):
+        """
+            :param clocks: number of clocking cycles of the register
+            :return tuple (packed row, constant term)
+        """
+        while len(self.rows) <= clocks:
+            if self.rows:
+                self.register.clock()
+            g_delta = self.register.g_delta(len(self.rows))
+            packed = 0
+            for i in range(self.register.size):
+                if g_delta[i]:
+                    packed |= 1 << (63 - self.start_column - i)
+            self.rows.append(packed)
+            self.constants.append(g_delta[-1])
+        return self.rows[clocks], self.constants[clocks]
+
+
+class SymbolicCache:
+    """
+        Row tables of R1, R2 and R3 per cipher specification and frame
+        counter difference. Only the most recently used differences are kept.
+    """
+    def __init__(self, max_differences=8):
+        self.max_differences = max_differences
+        self.tables = OrderedDict()
+
+    def row_tables(self, difference, spec=None):
+        """
+            :param difference: F1 XOR F2 as integer
+            :param spec: Optional CipherSpec (default: A5/2)
+            :return row tables for r1, r2 and r3
+        """
+        spec = spec or A5_2_SPEC
+        key = (spec, difference)
+        tables = self.tables.get(key)
+        if tables is None:
+            f1 = BitVector(size=spec.frame_counter_size, intVal=0)
+            f2 = BitVector(size=spec.frame_counter_size, intVal=difference)
+            registers = GwwRegisters(f1, f2, spec)
+            tables = tuple(GwwRowTable(register, start) for register, start
+                           in zip((registers.r1, registers.r2, registers.r3), spec.start_in_solution))
+            self.tables[key] = tables
+            if len(self.tables) > self.max_differences:
+                self.tables.popitem(last=False)
+        else:
+            self.tables.move_to_end(key)
+        return tables
+
+    def equations(self, clock_counts, difference, k, spec=None):
+        """
+            Creates the equations x + y + z = k for the keystream cycles
+            :param clock_counts: result of r4_clock_counts
+            :param difference: F1 XOR F2 as integer
+            :param k: key difference k1 ^ k2 as list
+            :param spec: Optional CipherSpec (default: A5/2)
+            :return tuple (packed rows, right-hand sides)
+        """
+        spec = spec or A5_2_SPEC
+        t1, t2, t3 = self.row_tables(difference, spec)
+        rows = []
+        b = []
+        for i in range(spec.matrix_rows):
+            (c1, c2, c3) = clock_counts[spec.warm_up_cycles + i]
+            x, x_constant = t1.row(c1)
+            y, y_constant = t2.row(c2)
+            z, z_constant = t3.row(c3)
+            rows.append(x | y | z)
+            b.append(k[i] ^ x_constant ^ y_constant ^ z_constant)
+        return rows, b
@@ -0,0 +1,59 @@
+import unittest
+from BitVector import BitVector
+from cipher_spec import A5_2_SPEC, CipherSpec
+from frame_difference import usable_differences
+from gww_registers import GwwRegisters, SymbolicCache
+
+
+def fresh_row(difference, register_index, clocks, spec):
+    """
+        :return packed row and constant of a freshly clocked register
+    """
+    f1 = BitVector(size=spec.frame_counter_size, intVal=0)
+    f2 = BitVector(size=spec.frame_counter_size, intVal=difference)
+    registers = GwwRegisters(f1, f2, spec)
+    register = (registers.r1, registers.r2, registers.r3)[register_index]
+    for i in range(clocks):
+        register.clock()
+    g_delta = register.g_delta(clocks)
+    start_column = spec.start_in_solution[register_index]
+    packed = 0
+    for i in range(register.size):
+        if g_delta[i]:
+            packed |= 1 << (63 - start_column - i)
+    return packed, g_delta[-1]
+
+
+class GwwRegistersTest(unittest.TestCase):
+
+    def test_row_tables(self):
+        for spec in (A5_2_SPEC, CipherSpec.reduced((5, 6, 7, 8))):
+            cache = SymbolicCache()
+            for difference in usable_differences(spec)[:2]:
+                tables = cache.row_tables(difference, spec)
+                # out of order: later rows are memoized, earlier ones extend the table
+                for clocks in (5, 0, 1, 37, 20, 113):
+                    for index, table in enumerate(tables):
+                        self.assertEqual(table.row(clocks), fresh_row(difference, index, clocks, spec))
+
+    def test_lru_eviction(self):
+        cache = SymbolicCache(max_differences=8)
+        differences = usable_differences()[:10]
+        tables = [cache.row_tables(difference) for difference in differences[:8]]
+        self.assertEqual(len(cache.tables), 8)
+        # using the oldest difference again makes the second one the oldest
+        self.assertIs(cache.row_tables(differences[0]), tables[0])
+        cache.row_tables(differences[8])
+        self.assertEqual(len(cache.tables), 8)
+        self.assertNotIn((A5_2_SPEC, differences[1]), cache.tables)
+        self.assertIn((A5_2_SPEC, differences[0]), cache.tables)
+        self.assertIsNot(cache.row_tables(differences[1]), tables[1])
+        self.assertNotIn((A5_2_SPEC, differences[2]), cache.tables)
+        # the entries are per cipher specification
+        spec = CipherSpec.reduced((5, 6, 7, 8))
+        cache.row_tables(usable_differences(spec)[0], spec)
+        self.assertEqual(len(cache.tables), 8)
+        self.assertEqual(list(cache.tables)[-1], (spec, usable_differences(spec)[0]))
+
+if __name__ == '__main__':
+    unittest.main()
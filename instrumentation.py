@@ -0,0 +1,201 @@
+import json
+import os
+import queue
+import threading
+import time
+
+# Stages of the attack pipeline (cumulative timers)
+STAGES = ['symbolic_clocking', 'matrix_building', 'elimination', 'verification', 'key_recovery']
+# Candidate funnel (counters)
+FUNNEL = ['candidates', 'solvable', 'deferred', 'solutions', 'verified', 'keys_found', 'dropped', 'guesses']
+PROMETHEUS_PREFIX = 'a52_attack'
+
+
+class _NullStage(object):
+    """
+        Stage used while the instrumentation is disabled
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics(object):
+    """
+        Cumulative stage timers and counters of one process.
+        While the instrumentation is disabled, stage() returns a shared no-op
+        context manager and increment() returns immediately.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}
+        self.counters = {}
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def stage(self, name):
+        """
+            :param name: stage name
+            :return context manager which adds its runtime to the stage timer
+        """
+        if not self.enabled:
+            return NULL_STAGE
+        return _Stage(self, name)
+
+    def add_time(self, name, seconds, calls=1):
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [seconds, calls]
+        else:
+            timer[0] += seconds
+            timer[1] += calls
+
+    def increment(self, name, value=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """
+            :return dictionary with copies of the timers and counters
+        """
+        return {'timers': {name: list(timer) for name, timer in self.timers.items()},
+                'counters': dict(self.counters)}
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+
+    def take(self):
+        """
+            :return snapshot of the values since the last call and resets them
+        """
+        snapshot = self.snapshot()
+        self.reset()
+        return snapshot
+
+    def merge(self, snapshot):
+        """
+            Adds the values of a snapshot (e.g. from a worker process)
+        """
+        for name, (seconds, calls) in snapshot['timers'].items():
+            self.add_time(name, seconds, calls)
+        for name, value in snapshot['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+# metrics of the current process
+metrics = Metrics()
+
+
+class WorkerFlusher(object):
+    """
+        Sends the metrics of a worker process to the parent process,
+        at most once per interval
+    """
+    def __init__(self, metrics_queue, interval):
+        self.queue = metrics_queue
+        self.interval = interval
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        snapshot = metrics.take()
+        if snapshot['timers'] or snapshot['counters']:
+            self.queue.put(snapshot)
+
+
+def to_prometheus(snapshot, prefix=PROMETHEUS_PREFIX):
+    """
+        :return snapshot in the Prometheus text exposition format
+    """
+    lines = ['# TYPE {}_stage_seconds_total counter'.format(prefix)]
+    for name, (seconds, calls) in sorted(snapshot['timers'].items()):
+        lines.append('{}_stage_seconds_total{{stage="{}"}} {!r}'.format(prefix, name, seconds))
+    lines.append('# TYPE {}_stage_calls_total counter'.format(prefix))
+    for name, (seconds, calls) in sorted(snapshot['timers'].items()):
+        lines.append('{}_stage_calls_total{{stage="{}"}} {}'.format(prefix, name, calls))
+    lines.append('# TYPE {}_funnel_total counter'.format(prefix))
+    for name, value in sorted(snapshot['counters'].items()):
+        lines.append('{}_funnel_total{{step="{}"}} {}'.format(prefix, name, value))
+    return '\n'.join(lines) + '\n'
+
+
+def write_snapshot(path, snapshot):
+    """
+        Writes a snapshot atomically. Files ending with .prom are written in
+        the Prometheus text format, all other files as JSON.
+    """
+    if path.endswith('.prom'):
+        content = to_prometheus(snapshot)
+    else:
+        content = json.dumps(dict(snapshot, timestamp=time.time()), indent=2, sort_keys=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class Exporter(threading.Thread):
+    """
+        Collects the metrics sent by the worker processes, aggregates them
+        and periodically writes a snapshot
+    """
+    def __init__(self, metrics_queue, path, interval):
+        threading.Thread.__init__(self, daemon=True)
+        self.queue = metrics_queue
+        self.path = path
+        self.interval = interval
+        self.aggregate = Metrics()
+        self.stopped = threading.Event()
+
+    def run(self):
+        next_write = time.monotonic() + self.interval
+        while not self.stopped.is_set():
+            self._drain(timeout=0.5)
+            if time.monotonic() >= next_write:
+                write_snapshot(self.path, self.aggregate.snapshot())
+                next_write = time.monotonic() + self.interval
+
+    def _drain(self, timeout=0):
+        try:
+            while True:
+                self.aggregate.merge(self.queue.get(timeout=timeout))
+                timeout = 0
+        except queue.Empty:
+            pass
+
+    def stop(self):
+        """
+            Stops the exporter and writes the final snapshot
+            :return the final snapshot
+        """
+        self.stopped.set()
+        self.join()
+        self._drain(timeout=0.1)
+        snapshot = self.aggregate.snapshot()
+        write_snapshot(self.path, snapshot)
+        return snapshot
@@ -0,0 +1,90 @@
+import json
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+from instrumentation import Metrics, NULL_STAGE, Exporter, to_prometheus, write_snapshot
+
+
+class InstrumentationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_disabled(self):
+        metrics = Metrics()
+        self.assertIs(metrics.stage('elimination'), NULL_STAGE)
+        metrics.increment('candidates')
+        self.assertEqual(metrics.snapshot(), {'timers': {}, 'counters': {}})
+
+    def test_aggregation(self):
+        worker = Metrics()
+        worker.enable()
+        with worker.stage('elimination'):
+            pass
+        worker.add_time('elimination', 2.0, 3)
+        worker.increment('candidates', 5)
+        worker.increment('candidates')
+        snapshot = worker.take()
+        self.assertEqual(snapshot['counters'], {'candidates': 6})
+        self.assertEqual(snapshot['timers']['elimination'][1], 4)
+        self.assertGreaterEqual(snapshot['timers']['elimination'][0], 2.0)
+        self.assertEqual(worker.snapshot(), {'timers': {}, 'counters': {}})
+
+        aggregate = Metrics()
+        aggregate.merge(snapshot)
+        aggregate.merge({'timers': {'elimination': [1.0, 1], 'verification': [0.5, 2]},
+                         'counters': {'candidates': 4, 'keys_found': 1}})
+        result = aggregate.snapshot()
+        self.assertEqual(result['counters'], {'candidates': 10, 'keys_found': 1})
+        self.assertEqual(result['timers']['elimination'][1], 5)
+        self.assertEqual(result['timers']['verification'], [0.5, 2])
+
+    def test_prometheus(self):
+        snapshot = {'timers': {'verification': [0.5, 2], 'elimination': [1.25, 4]},
+                    'counters': {'candidates': 10, 'keys_found': 1}}
+        self.assertEqual(to_prometheus(snapshot, 'test').splitlines(), [
+            '# TYPE test_stage_seconds_total counter',
+            'test_stage_seconds_total{stage="elimination"} 1.25',
+            'test_stage_seconds_total{stage="verification"} 0.5',
+            '# TYPE test_stage_calls_total counter',
+            'test_stage_calls_total{stage="elimination"} 4',
+            'test_stage_calls_total{stage="verification"} 2',
+            '# TYPE test_funnel_total counter',
+            'test_funnel_total{step="candidates"} 10',
+            'test_funnel_total{step="keys_found"} 1'])
+
+    def test_exporter(self):
+        metrics_queue = queue.Queue()
+        for path in ('metrics.json', 'metrics.prom'):
+            path = os.path.join(self.directory, path)
+            exporter = Exporter(metrics_queue, path, 60)
+            exporter.start()
+            metrics_queue.put({'timers': {'elimination': [1.0, 2]}, 'counters': {'candidates': 3}})
+            metrics_queue.put({'timers': {'elimination': [0.5, 1]}, 'counters': {'candidates': 4, 'solvable': 1}})
+            snapshot = exporter.stop()
+            self.assertEqual(snapshot, {'timers': {'elimination': [1.5, 3]},
+                                        'counters': {'candidates': 7, 'solvable': 1}})
+            with open(path) as f:
+                content = f.read()
+            if path.endswith('.prom'):
+                self.assertEqual(content, to_prometheus(snapshot))
+            else:
+                values = json.loads(content)
+                self.assertEqual(values['counters'], snapshot['counters'])
+                self.assertIn('timestamp', values)
+            self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_write_snapshot(self):
+        path = os.path.join(self.directory, 'metrics.json')
+        write_snapshot(path, {'timers': {}, 'counters': {'candidates': 1}})
+        write_snapshot(path, {'timers': {}, 'counters': {'candidates': 2}})
+        with open(path) as f:
+            self.assertEqual(json.load(f)['counters'], {'candidates': 2})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,251 @@
+import time
+
+EXIT_OK = 0
+EXIT_NOT_FOUND = 1
+EXIT_INVALID = 2
+
+STATUS_EXIT_CODES = {'ok': EXIT_OK, 'not_found': EXIT_NOT_FOUND, 'error': EXIT_INVALID}
+# number of frames of a capture file which are compared for the attack
+DEFAULT_CAPTURE_FRAMES = 8
+
+
+def parse_value(value, base=16):
+    """
+        Converts a job argument to an integer
+        :param value: integer or string (hexadecimal by default, a '0x'
+                      prefix is optional)
+        :param base: base used for strings
+        :return the integer value
+    """
+    if isinstance(value, bool):
+        raise ValueError('invalid value: ' + str(value))
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return int(value, base)
+    raise ValueError('invalid value: ' + str(value))
+
+
+def parse_interval(value):
+    """
+        :param value: seconds as number or string, or None
+        :return the interval as float (None if value is None)
+    """
+    return float(value) if value is not None else None
+
+
+def cipher_spec(sizes):
+    """
+        :param sizes: Optional, reduced register sizes of R1, R2, R3 and R4
+        :return the CipherSpec of the reduced A5/2 variant or None
+    """
+    if not sizes:
+        return None
+    from cipher_spec import CipherSpec
+    return CipherSpec.reduced([int(size) for size in sizes])
+
+
+def run_keystream(cipher, key, frame_counter, sizes=None):
+    """
+        Generates the keystream pair for a session key and frame counter.
+        The cipher modules are imported here, so that generating keystreams
+        does not load numpy or multiprocessing.
+        :param cipher: 'a51' or 'a52'
+        :param key: 64 bit session key
+        :param frame_counter: 22 bit frame counter
+        :param sizes: Optional, reduced register sizes of R1, R2, R3 and R4
+                      (A5/2 only)
+        :return dictionary with the send and receive keystream
+    """
+    if cipher == 'a51':
+        from a5_1 import A5_1
+        (send_key, receive_key) = A5_1(key, frame_counter).get_key_stream()
+    elif cipher == 'a52':
+        from a5_2 import A5_2
+        (send_key, receive_key) = A5_2(key, frame_counter, cipher_spec(sizes)).get_key_stream()
+    else:
+        raise ValueError('Unknown cipher: ' + str(cipher))
+    return {'send_key': hex(send_key.int_val()),
+            'receive_key': hex(receive_key.int_val())}
+
+
+def run_attack(k1, k2, f1, f2, processes=None, metrics_file=None, metrics_interval=10, progress_interval=None,
+               solution_budget=None, sizes=None, profile=None):
+    """
+        Runs the A5/2 attack for two keystreams
+        :param k1, k2: keystream values
+        :param f1, f2: frame counters of k1 and k2
+        :param processes: number of worker processes (default: cpu count)
+        :param metrics_file: optional file for the instrumentation snapshot
+        :param metrics_interval: seconds between two snapshots
+        :param progress_interval: seconds between two progress reports on
+                                  stderr (None disables the reports)
+        :param solution_budget: maximum number of free variables before a
+                                candidate is deferred (default:
+                                gww_attack.DEFAULT_SOLUTION_BUDGET)
+        :param sizes: Optional, reduced register sizes of R1, R2, R3 and R4
+        :param profile: Optional dictionary with the profiling options
+                        "directory", "mode", "rate" and "interval"
+        :return dictionary with the session key (None if not found), the
+                kernel backend and the merged profile files
+    """
+    import os
+    import gww_attack
+    import kernels
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if solution_budget is None:
+        solution_budget = gww_attack.DEFAULT_SOLUTION_BUDGET
+    settings = None
+    if profile:
+        import profiling
+        settings = profiling.ProfileSettings(profile['directory'], profile.get('mode') or profiling.MODE_DETERMINISTIC,
+                                             float(profile.get('rate') or profiling.DEFAULT_RATE),
+                                             float(profile.get('interval') or profiling.DEFAULT_INTERVAL))
+    session_key = gww_attack.init_attack(k1, k2, f1, f2, processes, metrics_file, metrics_interval,
+                                         progress_interval, solution_budget, cipher_spec(sizes), settings)
+    result = {'session_key': hex(session_key) if session_key is not None else None, 'backend': kernels.backend}
+    if settings:
+        result['profile'] = profiling.merged_files(settings.directory)
+    return result
+
+
+def run_a51_attack(keystream, frame_counter, processes=None, sizes=None, split_bits=None, metrics_file=None,
+                   metrics_interval=10, progress_interval=None):
+    """
+        Runs the A5/1 guess-and-determine attack for one keystream
+        :param keystream: send keystream value
+        :param frame_counter: frame counter of the keystream
+        :param processes: number of worker processes (default: cpu count)
+        :param sizes: Optional, reduced register sizes of R1, R2 and R3
+        :param split_bits: number of guesses fixed per task (default:
+                           guess_and_determine.DEFAULT_SPLIT_BITS)
+        :param metrics_file: optional file for the instrumentation snapshot
+        :param metrics_interval: seconds between two snapshots
+        :param progress_interval: seconds between two progress reports on
+                                  stderr (None disables the reports)
+        :return dictionary with the session key and state (None if not
+                found) and the throughput
+    """
+    import os
+    import guess_and_determine
+    from a5_1_core import A51Parameters
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if split_bits is None:
+        split_bits = guess_and_determine.DEFAULT_SPLIT_BITS
+    parameters = A51Parameters.reduced(sizes) if sizes else A51Parameters()
+    (session_key, state, guesses, seconds) = guess_and_determine.init_attack(
+        keystream, frame_counter, processes, parameters, split_bits, metrics_file, metrics_interval,
+        progress_interval)
+    return {'session_key': hex(session_key) if session_key is not None else None,
+            'state': hex(state) if state is not None else None,
+            'guesses': guesses,
+            'guesses_per_second': guesses / seconds if seconds > 0 else 0.0}
+
+
+def run_job(job):
+    """
+        Executes a single job description and measures its runtime.
+        Supported jobs:
+            {"command": "keystream", "cipher": "a51"|"a52", "key": ..., "frame_counter": ...,
+             "sizes": [...]}
+            {"command": "attack", "k1": ..., "f1": ..., "k2": ..., "f2": ..., "processes": ...,
+             "metrics_file": ..., "metrics_interval": ..., "progress_interval": ...,
+             "solution_budget": ..., "sizes": [...], "profile": {"directory": ..., "mode": ..., "rate": ...,
+             "interval": ...}}
+            {"command": "a51_attack", "keystream": ..., "frame_counter": ..., "processes": ...,
+             "sizes": [...], "split_bits": ..., "metrics_file": ..., "metrics_interval": ...,
+             "progress_interval": ...}
+        Instead of k1, f1, k2 and f2 an attack job may contain a list of
+        frames ("frames": [{"k": ..., "f": ...}, ...]). The pair with a usable
+        frame counter difference and the fewest free variables is attacked.
+        With "capture": FILE (and optionally "session" and "capture_frames")
+        the frames are send bursts with known plaintext of a capture file,
+        the first ones which have a usable frame counter difference to
+        another burst (at most capture_frames, default: 8).
+        "sizes" selects a reduced A5/2 variant (CipherSpec.reduced).
+        Values may be integers or hexadecimal strings.
+        :param job: job description as dictionary
+        :return result dictionary with a status ('ok', 'not_found' or
+                'error') and the timing fields 'started' and 'elapsed'
+    """
+    started = time.time()
+    start = time.perf_counter()
+    result = {'command': job.get('command') if isinstance(job, dict) else None}
+    if isinstance(job, dict) and 'id' in job:
+        result['id'] = job['id']
+    try:
+        if not isinstance(job, dict):
+            raise ValueError('Job must be a JSON object')
+        command = job.get('command')
+        if command == 'keystream':
+            result['cipher'] = job.get('cipher')
+            result.update(run_keystream(job.get('cipher'),
+                                        parse_value(job.get('key')),
+                                        parse_value(job.get('frame_counter')),
+                                        job.get('sizes')))
+            result['status'] = 'ok'
+        elif command == 'attack':
+            processes = job.get('processes')
+            if 'capture' in job:
+                import gww_attack
+                from capture import Capture, attack_frames
+                spec = cipher_spec(job.get('sizes'))
+                try:
+                    with Capture(job['capture']) as capture:
+                        frames = attack_frames(capture, job.get('session'),
+                                               int(job.get('capture_frames', DEFAULT_CAPTURE_FRAMES)), spec)
+                except OSError as error:
+                    raise ValueError('cannot read the capture file: ' + str(error))
+                (k1, f1, k2, f2) = gww_attack.select_frame_pair(frames, spec=spec)
+                result.update({'f1': hex(f1), 'f2': hex(f2)})
+            elif 'frames' in job:
+                import gww_attack
+                frames = [(parse_value(frame['k']), parse_value(frame['f'])) for frame in job['frames']]
+                (k1, f1, k2, f2) = gww_attack.select_frame_pair(frames, spec=cipher_spec(job.get('sizes')))
+                result.update({'f1': hex(f1), 'f2': hex(f2)})
+            else:
+                (k1, f1, k2, f2) = (job.get('k1'), job.get('f1'), job.get('k2'), job.get('f2'))
+            result.update(run_attack(parse_value(k1),
+                                     parse_value(k2),
+                                     parse_value(f1),
+                                     parse_value(f2),
+                                     parse_value(processes, 10) if processes is not None else None,
+                                     job.get('metrics_file'),
+                                     float(job.get('metrics_interval', 10)),
+                                     parse_interval(job.get('progress_interval')),
+                                     job.get('solution_budget'),
+                                     job.get('sizes'),
+                                     job.get('profile')))
+            result['status'] = 'ok' if result['session_key'] else 'not_found'
+        elif command == 'a51_attack':
+            processes = job.get('processes')
+            result.update(run_a51_attack(parse_value(job.get('keystream')),
+                                         parse_value(job.get('frame_counter')),
+                                         parse_value(processes, 10) if processes is not None else None,
+                                         job.get('sizes'),
+                                         job.get('split_bits'),
+                                         job.get('metrics_file'),
+                                         float(job.get('metrics_interval', 10)),
+                                         parse_interval(job.get('progress_interval'))))
+            result['status'] = 'ok' if result['session_key'] else 'not_found'
+        else:
+            raise ValueError('Unknown command: ' + str(command))
+    except (ValueError, TypeError, KeyError) as error:
+        result['status'] = 'error'
+        result['error'] = str(error)
+    result['started'] = started
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def exit_code(results):
+    """
+        :param results: list of job results
+        :return the most severe exit code of all results
+    """
+    code = EXIT_OK
+    for result in results:
+        code = max(code, STATUS_EXIT_CODES[result['status']])
+    return code
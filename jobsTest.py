@@ -0,0 +1,73 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import jobs
+
+SIZES = [5, 6, 7, 8]
+# keystreams of the reduced variant for session key 0x8996
+K1 = '0xb11648d6ef42d10bc8459c971504'
+K2 = '0x1561f0a41215fa9059f4fa4359a96'
+
+
+class JobsTest(unittest.TestCase):
+
+    def test_parse_value(self):
+        self.assertEqual(jobs.parse_value('0x21'), 0x21)
+        self.assertEqual(jobs.parse_value('21'), 0x21)
+        self.assertEqual(jobs.parse_value('8', 10), 8)
+        self.assertEqual(jobs.parse_value(7), 7)
+        self.assertRaises(ValueError, jobs.parse_value, True)
+        self.assertRaises(ValueError, jobs.parse_value, None)
+        self.assertEqual(jobs.parse_interval('0.5'), 0.5)
+        self.assertIsNone(jobs.parse_interval(None))
+
+    def test_keystream(self):
+        result = jobs.run_job({'command': 'keystream', 'cipher': 'a52', 'key': 'fffffffffffffc00',
+                               'frame_counter': '21', 'id': 3})
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(result['id'], 3)
+        self.assertEqual(result['send_key'], '0x3d144b2b04d64dd91182dc8b6b754')
+        self.assertEqual(result['receive_key'], '0x1200350ca385a853735ee5c889944')
+        self.assertIn('started', result)
+        self.assertGreaterEqual(result['elapsed'], 0)
+        result = jobs.run_job({'command': 'keystream', 'cipher': 'a52', 'key': '8996', 'frame_counter': '1',
+                               'sizes': SIZES})
+        self.assertEqual(result['send_key'], K1)
+
+    def test_attack(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            result = jobs.run_job({'command': 'attack', 'k1': K1, 'f1': '1', 'k2': K2, 'f2': '69', 'processes': 1,
+                                   'sizes': SIZES, 'progress_interval': '60'})
+        # the progress summary is written after the sweep
+        self.assertIn('session key found', stderr.getvalue())
+        self.assertEqual(result['status'], 'ok')
+        self.assertEqual(result['session_key'], '0x8996')
+        # the second keystream does not belong to frame 0x69
+        result = jobs.run_job({'command': 'attack', 'frames': [{'k': K1, 'f': '1'}, {'k': K1, 'f': '69'}],
+                               'processes': 1, 'sizes': SIZES})
+        self.assertEqual(result['status'], 'not_found')
+        self.assertIsNone(result['session_key'])
+
+    def test_errors(self):
+        for job in ({'command': 'unknown'}, [], {'command': 'keystream', 'cipher': 'a53', 'key': '1',
+                                                  'frame_counter': '1'},
+                    {'command': 'keystream', 'cipher': 'a52', 'key': 'xyz', 'frame_counter': '1'},
+                    {'command': 'attack', 'k1': K1, 'f1': '1', 'k2': K2, 'f2': '1', 'sizes': SIZES},
+                    {'command': 'attack', 'frames': [{'k': K1}], 'sizes': SIZES},
+                    {'command': 'attack', 'capture': os.path.join(tempfile.gettempdir(), 'missing.a5c'),
+                     'sizes': SIZES},
+                    {'command': 'attack', 'capture': os.path.abspath(__file__), 'sizes': SIZES}):
+            result = jobs.run_job(job)
+            self.assertEqual(result['status'], 'error', job)
+            self.assertIn('error', result)
+
+    def test_exit_code(self):
+        self.assertEqual(jobs.exit_code([]), jobs.EXIT_OK)
+        self.assertEqual(jobs.exit_code([{'status': 'ok'}, {'status': 'not_found'}]), jobs.EXIT_NOT_FOUND)
+        self.assertEqual(jobs.exit_code([{'status': 'error'}, {'status': 'ok'}]), jobs.EXIT_INVALID)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,331 @@
+"""
+    Integer kernels of the innermost loops (register clocking, majority
+    functions, R4 clock counts and the Gauss elimination). The kernels only
+    use integers and NumPy arrays, so they are compiled with Numba if it is
+    installed. Without Numba the modules keep their pure-Python code.
+    The backend is selected at import time, the environment variable
+    A52_BACKEND (auto, numba or python) overrides the selection.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import numpy as np
+
+BACKEND_ENV = 'A52_BACKEND'
+BACKEND_NUMBA = 'numba'
+BACKEND_PYTHON = 'python'
+
+
+def majority(a, b, c):
+    return (a & b) | (a & c) | (b & c)
+
+
+def parity(value):
+    result = 0
+    while value:
+        result ^= 1
+        value &= value - 1
+    return result
+
+
+def clock_register(value, size_mask, tap_mask, bit):
+    """
+        LFSR.clock on an integer register (bit i is R[i])
+        :param bit: bit which is XORed into the feedback
+    """
+    return ((value << 1) & size_mask) | (parity(value & tap_mask) ^ bit)
+
+
+def load_registers(registers, size_masks, tap_masks, bits):
+    """
+        Clocks input bits (session key or frame counter) into all registers
+        :param registers: int64 array with R1, R2, R3 and R4, updated in place
+        :param bits: uint8 array with the input bits in clocking order
+    """
+    for i in range(bits.shape[0]):
+        for j in range(registers.shape[0]):
+            registers[j] = clock_register(registers[j], size_masks[j], tap_masks[j], bits[i])
+
+
+def clock_with_majority(registers, size_masks, tap_masks, top_bits, majority_bits, clock_bits, clocking_bits, cycles,
+                        output):
+    """
+        A5_2._clocking_with_majority: R1, R2 and R3 are clocked depending on
+        the majority of R4
+        :param registers: int64 array with R1, R2, R3 and R4, updated in place
+        :param top_bits: positions of the highest bits of R1, R2 and R3
+        :param majority_bits: int64 array (3 x 3) with the negated bit and
+                              the two majority bits of R1, R2 and R3
+        :param clock_bits: bits of the clocking majority of R4
+        :param clocking_bits: bits of R4 that decide whether R1, R2 and R3
+                              are clocked
+        :param output: uint8 array for the output bits of the cycles (empty
+                       if the output is discarded)
+    """
+    generate = output.shape[0] > 0
+    for t in range(cycles):
+        r4 = registers[3]
+        m = majority((r4 >> clock_bits[0]) & 1, (r4 >> clock_bits[1]) & 1, (r4 >> clock_bits[2]) & 1)
+        for j in range(3):
+            if ((r4 >> clocking_bits[j]) & 1) == m:
+                registers[j] = clock_register(registers[j], size_masks[j], tap_masks[j], 0)
+        registers[3] = clock_register(r4, size_masks[3], tap_masks[3], 0)
+        if generate:
+            bit = 0
+            for j in range(3):
+                r = registers[j]
+                bit ^= (r >> top_bits[j]) & 1
+                bit ^= majority(((r >> majority_bits[j, 0]) & 1) ^ 1, (r >> majority_bits[j, 1]) & 1,
+                                (r >> majority_bits[j, 2]) & 1)
+            output[t] = bit
+
+
+def clock_counts(r4, size_mask, tap_mask, clock_bits, clocking_bits, counts):
+    """
+        gww_registers.r4_clock_counts
+        :param counts: int64 array (cycles x 3) for the clocks of R1, R2 and
+                       R3 after each cycle
+    """
+    c1 = 0
+    c2 = 0
+    c3 = 0
+    for t in range(counts.shape[0]):
+        m = majority((r4 >> clock_bits[0]) & 1, (r4 >> clock_bits[1]) & 1, (r4 >> clock_bits[2]) & 1)
+        if ((r4 >> clocking_bits[0]) & 1) == m:
+            c1 += 1
+        if ((r4 >> clocking_bits[1]) & 1) == m:
+            c2 += 1
+        if ((r4 >> clocking_bits[2]) & 1) == m:
+            c3 += 1
+        r4 = clock_register(r4, size_mask, tap_mask, 0)
+        counts[t, 0] = c1
+        counts[t, 1] = c2
+        counts[t, 2] = c3
+
+
+def gauss_forward(matrix, b, not_unique):
+    """
+        Row reduction of Matrix.gauss (same pivot choice)
+        :param matrix: int64 array (rows >= columns), updated in place
+        :param b: int64 array with the right-hand sides, updated in place
+        :param not_unique: uint8 array, set to 1 for columns without pivot
+    """
+    n = matrix.shape[0]
+    m = matrix.shape[1]
+    for i in range(m):
+        maxi = i
+        for k in range(i, n):
+            if matrix[k, i] == 1:
+                maxi = k
+        if matrix[maxi, i] == 1:
+            for k in range(i, m):
+                tmp = matrix[maxi, k]
+                matrix[maxi, k] = matrix[i, k]
+                matrix[i, k] = tmp
+            tmp = b[maxi]
+            b[maxi] = b[i]
+            b[i] = tmp
+        else:
+            not_unique[i] = 1
+        for u in range(i + 1, n):
+            if matrix[u, i] == 1:
+                for v in range(i, m):
+                    matrix[u, v] = (matrix[u, v] + matrix[i, v]) % 2
+                b[u] = (b[u] + b[i]) % 2
+
+
+def back_substitute(matrix, b, free_index, combination, x):
+    """
+        Back substitution of Matrix.gauss for one combination of the free
+        variables
+        :param free_index: int64 array with the index of each column in
+                           combination (-1 for pivot columns)
+        :param x: int64 array for the solution
+    """
+    n = matrix.shape[0]
+    m = matrix.shape[1]
+    for i in range(n - 1, -1, -1):
+        if i >= m:
+            continue
+        if matrix[i, i] == 1:
+            x[i] = b[i]
+            for k in range(i + 1, m):
+                x[i] = (x[i] + matrix[i, k] * x[k]) % 2
+        elif free_index[i] >= 0:
+            x[i] = combination[free_index[i]]
+
+
+def select_backend():
+    """
+        :return tuple (backend name, reason)
+    """
+    requested = os.environ.get(BACKEND_ENV, 'auto')
+    if requested not in ('auto', BACKEND_NUMBA, BACKEND_PYTHON):
+        raise ValueError(BACKEND_ENV + ' must be auto, numba or python!')
+    if requested == BACKEND_PYTHON:
+        return (BACKEND_PYTHON, BACKEND_ENV + '=' + requested)
+    try:
+        import numba
+    except ImportError:
+        return (BACKEND_PYTHON, 'numba is not installed')
+    return (BACKEND_NUMBA, 'numba ' + numba.__version__)
+
+
+(backend, reason) = select_backend()
+if backend == BACKEND_NUMBA:
+    import numba
+    # the kernels call each other through these module globals, which are
+    # resolved when a kernel is compiled on its first call
+    _jit = numba.njit(cache=True)
+    majority = _jit(majority)
+    parity = _jit(parity)
+    clock_register = _jit(clock_register)
+    load_registers = _jit(load_registers)
+    clock_with_majority = _jit(clock_with_majority)
+    clock_counts = _jit(clock_counts)
+    gauss_forward = _jit(gauss_forward)
+    back_substitute = _jit(back_substitute)
+# the modules use the kernels only if they are compiled, set_enabled forces
+# them on (e.g. for the differential test)
+enabled = backend == BACKEND_NUMBA
+_spec_arrays = {}
+
+
+def set_enabled(value):
+    """
+        :return the previous value
+    """
+    global enabled
+    previous = enabled
+    enabled = value
+    return previous
+
+
+class SpecArrays(object):
+    """
+        Register parameters of a CipherSpec as kernel arguments
+    """
+    def __init__(self, spec):
+        self.size_masks = np.array([(1 << register.size) - 1 for register in spec.registers], dtype=np.int64)
+        self.tap_masks = np.array([sum(1 << tap for tap in register.taps) for register in spec.registers],
+                                  dtype=np.int64)
+        self.top_bits = np.array([register.size - 1 for register in spec.registers[:3]], dtype=np.int64)
+        self.majority_bits = np.array([[register.negated_bit] + register.majority_bits
+                                       for register in spec.registers[:3]], dtype=np.int64)
+        self.clock_bits = np.array(spec.r4.clock_bits, dtype=np.int64)
+        self.clocking_bits = np.array(spec.clocking_bits, dtype=np.int64)
+
+
+def spec_arrays(spec):
+    """
+        :return the cached SpecArrays of a CipherSpec
+    """
+    arrays = _spec_arrays.get(spec)
+    if arrays is None:
+        arrays = SpecArrays(spec)
+        _spec_arrays[spec] = arrays
+    return arrays
+
+
+def backend_info():
+    return {'backend': backend, 'reason': reason, 'enabled': enabled}
+
+
+def _compare(check, trial, first, second, mismatches):
+    if first != second:
+        mismatches.append({'check': check, 'trial': trial})
+
+
+def self_test(trials=10, seed=0):
+    """
+        Randomized differential test of the kernels against the pure-Python
+        code: keystreams, equation systems, Gauss solutions and recovered
+        session keys must be identical with and without kernels. Without
+        Numba the kernels run interpreted, which checks their logic.
+        :return dictionary with the backend and the mismatches
+    """
+    from a5_2 import A5_2
+    from cipher_spec import A5_2_SPEC, CipherSpec
+    from frame_difference import usable_differences
+    from matrix import Matrix
+    import gww_attack
+    from BitVector import BitVector
+    rng = random.Random(seed)
+    specs = [A5_2_SPEC, CipherSpec.reduced((5, 6, 7, 8)), CipherSpec.reduced((7, 8, 9, 10))]
+    mismatches = []
+    previous = set_enabled(False)
+
+    def both(function):
+        results = []
+        for value in (False, True):
+            set_enabled(value)
+            results.append(function())
+        # the reference values are always computed without kernels
+        set_enabled(False)
+        return results
+
+    try:
+        for trial in range(trials):
+            spec = rng.choice(specs)
+            key = rng.getrandbits(spec.key_size)
+            frame_counter = rng.getrandbits(spec.frame_counter_size)
+            (python_keys, kernel_keys) = both(lambda: [int(k) for k in A5_2(key, frame_counter, spec).get_key_stream()])
+            _compare('keystream', trial, python_keys, kernel_keys, mismatches)
+
+            r4_value = rng.getrandbits(spec.r4.size) | (1 << spec.r4.forced_bit)
+            difference = rng.choice(usable_differences(spec)[:64])
+            k = [rng.getrandbits(1) for i in range(spec.keystream_size)]
+            (python_system, kernel_system) = both(lambda: gww_attack.build_packed_system(r4_value, k, difference, spec))
+            _compare('equation_system', trial, python_system, kernel_system, mismatches)
+
+            rows = rng.randint(spec.matrix_columns, spec.matrix_columns + 8)
+            values = np.array([[rng.getrandbits(1) for j in range(spec.matrix_columns)] for i in range(rows)])
+            # sparse right-hand sides and a few zero columns give free variables
+            values[:, rng.randrange(spec.matrix_columns)] = 0
+            b = [rng.getrandbits(1) for i in range(rows)]
+
+            def solve():
+                A = Matrix(rows, spec.matrix_columns, spec)
+                A.matrix = values.copy()
+                right_hand_sides = list(b)
+                return (A.gauss(right_hand_sides), right_hand_sides)
+            (python_solutions, kernel_solutions) = both(solve)
+            _compare('gauss', trial, python_solutions, kernel_solutions, mismatches)
+
+            if spec is not A5_2_SPEC:
+                f2 = frame_counter ^ difference
+                a52 = A5_2(key, frame_counter, spec)
+                k1 = a52.get_key_stream(generate_only_send_key=True)[0]
+                k2 = A5_2(key, f2, spec).get_key_stream(generate_only_send_key=True)[0]
+                r4 = a52.initial_sates['r4'].register.int_val()
+                f1_vector = BitVector(size=spec.frame_counter_size, intVal=frame_counter)
+                f2_vector = BitVector(size=spec.frame_counter_size, intVal=f2)
+
+                def recover():
+                    session_key = gww_attack.perform_batch_attack([r4], k1, k2, f1_vector, f2_vector, spec=spec)
+                    return session_key.int_val() if session_key is not None else None
+                (python_key, kernel_key) = both(recover)
+                _compare('session_key', trial, python_key, kernel_key, mismatches)
+                if python_key is None:
+                    mismatches.append({'check': 'session_key_found', 'trial': trial})
+    finally:
+        set_enabled(previous)
+    result = backend_info()
+    result.update({'trials': trials, 'seed': seed, 'mismatches': mismatches})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reports the kernel backend and runs the differential self-test')
+    parser.add_argument('--trials', type=int, default=10, help='number of random trials')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+    result = self_test(args.trials, args.seed)
+    print(json.dumps(result, sort_keys=True))
+    return 1 if result['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
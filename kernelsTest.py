@@ -0,0 +1,40 @@
+import importlib.util
+import os
+import unittest
+import kernels
+from a5_2 import A5_2, enabled_kernels
+
+
+class KernelsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.enabled = kernels.set_enabled(True)
+
+    def tearDown(self):
+        kernels.set_enabled(self.enabled)
+
+    def test_key_stream(self):
+        # the kernels run interpreted if numba is not installed
+        (send_key, receive_key) = A5_2(0xfffffffffffffc00, 0x21).get_key_stream()
+        send_key.pad_from_right(6)
+        receive_key.pad_from_right(6)
+        self.assertEqual(send_key.int_val(), 0xf4512cac13593764460b722dadd500)
+        self.assertEqual(receive_key.int_val(), 0x4800d4328e16a14dcd7b9722265100)
+
+    def test_self_test(self):
+        result = kernels.self_test(trials=4, seed=1)
+        self.assertEqual(result['mismatches'], [])
+        self.assertIn(result['backend'], (kernels.BACKEND_NUMBA, kernels.BACKEND_PYTHON))
+        self.assertTrue(kernels.enabled)
+
+    @unittest.skipUnless(importlib.util.find_spec('numba'), 'numba is not installed')
+    @unittest.skipIf(os.environ.get(kernels.BACKEND_ENV) == kernels.BACKEND_PYTHON, 'pure-Python backend selected')
+    def test_numba_backend(self):
+        # the compiled kernels are selected by default and give the same results as the Python code
+        self.assertEqual(kernels.backend, kernels.BACKEND_NUMBA)
+        self.assertIs(enabled_kernels(), kernels)
+        self.test_key_stream()
+        self.assertEqual(kernels.self_test(trials=4, seed=2)['mismatches'], [])
+
+if __name__ == '__main__':
+    unittest.main()
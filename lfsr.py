@@ -35,6 +35,15 @@ class LFSR(object):
         for clock_bit in clock_bits:
             self.clock_bits.append(length - clock_bit - 1)
 
+    @classmethod
+    def from_spec(cls, register, bitstring=None, int_value=None):
+        """
+            Creates a register of a cipher specification
+            :param register: cipher_spec.RegisterSpec
+        """
+        return cls(register.size, register.clock_bits, register.taps, register.majority_bits, register.negated_bit,
+                   bitstring, int_value)
+
     def clock(self, key_bit=False):
         """
             Clocks the lfsr
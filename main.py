@@ -1,9 +1,10 @@
 # coding=utf-8
+import argparse
+import json
 import os
 import sys
-from a5_1 import A5_1
-from a5_2 import A5_2
-import gww_attack as a52_attack
+import time
+import jobs
 menu_actions = {}
 
 
@@ -65,6 +66,7 @@ def mini_menu(current_entry):
 
 
 def a51():
+    from a5_1 import A5_1
     print(25 * '-', 'A5/1', 25 * '-')
     print('Insert 64 bit session key as hexadecimal value:\n')
     session_key = read_input()
@@ -83,6 +85,7 @@ def a51():
 
 
 def a52():
+    from a5_2 import A5_2
     print(25 * '-', 'A5/2', 25 * '-')
     print('Insert 64 bit session key as hexadecimal value:\n')
     session_key = read_input()
@@ -100,6 +103,7 @@ def a52():
 
 
 def attack():
+    import gww_attack as a52_attack
     print(25 * '-', 'A5/2 Attack', 25 * '-')
     print('Insert first 114 bit keystream as hexadecimal value:\n')
     k1 = read_input()
@@ -112,7 +116,11 @@ def attack():
     print('Number of processes:\n')
     processes = read_input(10)
     try:
-        a52_attack.init_attack(k1, k2, f1, f2, processes)
+        session_key = a52_attack.init_attack(k1, k2, f1, f2, processes)
+        if session_key is not None:
+            print(hex(session_key))
+        else:
+            print('No session key found')
     except ValueError as error:
         print('Error: ' + str(error))
         menu_actions['3']()
@@ -141,12 +149,149 @@ def read_input(base=16):
         return read_input()
     return value
 
-# ===============
-#      MAIN
-# ===============
-if __name__ == '__main__':
+
+# =======================
+#    COMMAND LINE
+# =======================
+def build_parser():
+    parser = argparse.ArgumentParser(description='A5/1 and A5/2 keystream generation and A5/2 known plaintext attack. '
+                                                 'Without a command the interactive menu is started. '
+                                                 'Results are written as JSON lines to stdout.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    keystream = subparsers.add_parser('keystream', help='generate a keystream pair')
+    keystream.add_argument('cipher', choices=['a51', 'a52'])
+    keystream.add_argument('key', help='64 bit session key (hexadecimal)')
+    keystream.add_argument('frame_counter', help='22 bit frame counter (hexadecimal)')
+    keystream.add_argument('--sizes', type=int, nargs=4, default=None, metavar='SIZE',
+                           help='reduced register sizes of R1, R2, R3 and R4 (A5/2 only, default: real A5/2)')
+
+    attack = subparsers.add_parser('attack', help='retrieve the session key for two or more keystreams')
+    attack.add_argument('frames', nargs='*', metavar='KEYSTREAM FRAME_COUNTER',
+                        help='pairs of 114 bit keystream and 22 bit frame counter (hexadecimal). '
+                             'For more than two frames the best usable pair is attacked.')
+    attack.add_argument('--capture', metavar='FILE', default=None,
+                        help='read the frames from the send bursts with known plaintext of a capture file')
+    attack.add_argument('--session', type=int, default=None, help='session id in the capture file')
+    attack.add_argument('--capture-frames', type=int, default=jobs.DEFAULT_CAPTURE_FRAMES, metavar='N',
+                        help='number of capture frames with a usable partner which are compared to choose the frame '
+                             'pair (default: 8)')
+    attack.add_argument('--solution-budget', type=int, default=None, metavar='FREE_VARIABLES',
+                        help='defer candidates with more free variables until all other candidates are checked')
+    attack.add_argument('--sizes', type=int, nargs=4, default=None, metavar='SIZE',
+                        help='reduced register sizes of R1, R2, R3 and R4 (default: real A5/2)')
+    attack.add_argument('--profile', metavar='DIR', default=None,
+                        help='profile a share of the R4 candidates in every worker and merge the profiles into '
+                             'DIR/profile.prof (pstats) and DIR/profile.folded (collapsed stacks)')
+    attack.add_argument('--profile-mode', choices=['deterministic', 'sampling'], default='deterministic',
+                        help='cProfile and stack sampling, or only stack sampling (default: deterministic)')
+    attack.add_argument('--profile-rate', type=float, default=0.1, metavar='FRACTION',
+                        help='share of the candidate batches which are profiled, bounds the overhead (default: 0.1)')
+    attack.add_argument('--profile-interval', type=float, default=0.005, metavar='SECONDS',
+                        help='seconds between two stack samples (default: 0.005)')
+
+    a51_attack = subparsers.add_parser('a51-attack', help='retrieve the A5/1 session key for a keystream '
+                                                          '(guess-and-determine)')
+    a51_attack.add_argument('keystream', help='114 bit send keystream (hexadecimal)')
+    a51_attack.add_argument('frame_counter', help='22 bit frame counter (hexadecimal)')
+    a51_attack.add_argument('--sizes', type=int, nargs=3, default=None, metavar='SIZE',
+                            help='reduced register sizes of R1, R2 and R3 (default: real A5/1)')
+    a51_attack.add_argument('--split-bits', type=int, default=None,
+                            help='number of guesses fixed per task (2^SPLIT_BITS tasks)')
+    for subparser in (attack, a51_attack):
+        subparser.add_argument('-p', '--processes', type=int, default=None,
+                               help='number of worker processes (default: cpu count)')
+        subparser.add_argument('--metrics', metavar='FILE', default=None,
+                               help='write stage timers and funnel counters to FILE '
+                                    '(Prometheus text format if FILE ends with .prom, JSON otherwise)')
+        subparser.add_argument('--metrics-interval', type=float, default=10,
+                               help='seconds between two metric snapshots (default: 10)')
+        subparser.add_argument('--progress', type=float, default=None, metavar='SECONDS',
+                               help='report progress, throughput and ETA on stderr every SECONDS')
+
+    subparsers.add_parser('batch', help='read jobs as JSON lines from stdin')
+    subparsers.add_parser('menu', help='start the interactive menu')
+    return parser
+
+
+def write_result(result):
+    sys.stdout.write(json.dumps(result) + '\n')
+    sys.stdout.flush()
+
+
+def run_batch(stream):
+    """
+        Executes one job per JSON line and writes one result line per job
+        :param stream: input stream with JSON lines
+        :return list with all results
+    """
+    results = []
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as error:
+            job = None
+            result = {'command': None, 'status': 'error', 'error': 'invalid JSON: ' + str(error),
+                      'started': time.time(), 'elapsed': 0.0}
+        if job is not None:
+            result = jobs.run_job(job)
+        write_result(result)
+        results.append(result)
+    return results
+
+
+def run_command(args):
+    """
+        :param args: parsed command line arguments
+        :return the exit code
+    """
+    if args.command == 'keystream':
+        job = {'command': 'keystream', 'cipher': args.cipher, 'key': args.key,
+               'frame_counter': args.frame_counter, 'sizes': args.sizes}
+    elif args.command == 'attack':
+        job = {'command': 'attack', 'processes': args.processes, 'metrics_file': args.metrics,
+               'metrics_interval': args.metrics_interval, 'progress_interval': args.progress,
+               'solution_budget': args.solution_budget, 'sizes': args.sizes}
+        if args.profile:
+            job['profile'] = {'directory': args.profile, 'mode': args.profile_mode, 'rate': args.profile_rate,
+                              'interval': args.profile_interval}
+        if args.capture:
+            if args.frames:
+                build_parser().error('attack needs either frames or a capture file')
+            job.update({'capture': args.capture, 'session': args.session, 'capture_frames': args.capture_frames})
+        elif len(args.frames) < 4 or len(args.frames) % 2:
+            build_parser().error('attack needs at least two pairs of keystream and frame counter')
+        else:
+            job['frames'] = [{'k': k, 'f': f} for k, f in zip(args.frames[::2], args.frames[1::2])]
+    elif args.command == 'a51-attack':
+        job = {'command': 'a51_attack', 'keystream': args.keystream, 'frame_counter': args.frame_counter,
+               'processes': args.processes, 'sizes': args.sizes, 'split_bits': args.split_bits,
+               'metrics_file': args.metrics, 'metrics_interval': args.metrics_interval,
+               'progress_interval': args.progress}
+    elif args.command == 'batch':
+        return jobs.exit_code(run_batch(sys.stdin))
+    result = jobs.run_job(job)
+    write_result(result)
+    return jobs.exit_code([result])
+
+
+def run_menu():
     try:
         os.system('clear')
         main_menu()
     except KeyboardInterrupt:
         print('Program exit')
+
+
+# ===============
+#      MAIN
+# ===============
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+    if args.command in (None, 'menu'):
+        run_menu()
+    else:
+        sys.exit(run_command(args))
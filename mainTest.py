@@ -0,0 +1,105 @@
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+import numpy as np
+import jobs
+import main
+from capture import CaptureWriter
+from jobsTest import SIZES, K1, K2
+
+
+def run(arguments, stdin=None):
+    """
+        :return tuple (exit code, list of JSON results)
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        if stdin is None:
+            code = main.run_command(main.build_parser().parse_args(arguments))
+        else:
+            code = jobs.exit_code(main.run_batch(io.StringIO(stdin)))
+    return (code, [json.loads(line) for line in output.getvalue().splitlines()])
+
+
+class MainTest(unittest.TestCase):
+
+    def test_keystream(self):
+        (code, results) = run(['keystream', 'a52', '8996', '1', '--sizes'] + [str(size) for size in SIZES])
+        self.assertEqual(code, jobs.EXIT_OK)
+        self.assertEqual(results[0]['send_key'], K1)
+
+    @unittest.skipIf(importlib.util.find_spec('numba'), 'the kernels need numpy if numba is installed')
+    def test_keystream_imports(self):
+        # a fresh interpreter, the tests have already imported numpy
+        code = ("import sys, main; main.run_command(main.build_parser().parse_args(['keystream', 'a52', '8996', '1']));"
+                "print(sorted(name for name in ('numpy', 'kernels', 'multiprocessing') if name in sys.modules))")
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, universal_newlines=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+        self.assertEqual(output.splitlines()[-1], '[]')
+
+    def test_attack(self):
+        sizes = ['--sizes'] + [str(size) for size in SIZES]
+        (code, results) = run(['attack', K1, '1', K2, '69', '-p', '1'] + sizes)
+        self.assertEqual(code, jobs.EXIT_OK)
+        self.assertEqual(results[0]['session_key'], '0x8996')
+        (code, results) = run(['attack', K1, '1', K1, '69', '-p', '1'] + sizes)
+        self.assertEqual(code, jobs.EXIT_NOT_FOUND)
+        (code, results) = run(['attack', K1, '1', K2, '2', '-p', '1'] + sizes)
+        self.assertEqual(code, jobs.EXIT_INVALID)
+        self.assertEqual(results[0]['status'], 'error')
+
+    def test_capture(self):
+        # the only usable pair follows 2098 bursts without a partner
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'capture.a5c')
+            rng = np.random.RandomState(3)
+            ciphertexts = rng.randint(0, 256, (2098, 16)).astype(np.uint8)
+            plaintexts = rng.randint(0, 256, (2098, 16)).astype(np.uint8)
+            with CaptureWriter(path) as writer:
+                writer.write([0] * 2098, ciphertexts, plaintexts)
+                writer.write([1, 0x69], [int(K1, 16), int(K2, 16)], [0, 0])
+            sizes = ['--sizes'] + [str(size) for size in SIZES]
+            (code, results) = run(['attack', '--capture', path, '--capture-frames', '4', '-p', '1'] + sizes)
+            self.assertEqual(code, jobs.EXIT_OK)
+            self.assertEqual(results[0]['session_key'], '0x8996')
+            self.assertEqual((results[0]['f1'], results[0]['f2']), ('0x1', '0x69'))
+            # an unreadable capture file is invalid input, the batch goes on with the next job
+            missing = os.path.join(directory, 'missing.a5c')
+            (code, results) = run(['attack', '--capture', missing, '-p', '1'] + sizes)
+            self.assertEqual(code, jobs.EXIT_INVALID)
+            self.assertIn('missing.a5c', results[0]['error'])
+            lines = [json.dumps({'command': 'attack', 'capture': missing}),
+                     json.dumps({'command': 'keystream', 'cipher': 'a52', 'key': '8996', 'frame_counter': '1',
+                                 'sizes': SIZES})]
+            (code, results) = run(None, '\n'.join(lines))
+            self.assertEqual(code, jobs.EXIT_INVALID)
+            self.assertEqual([result['status'] for result in results], ['error', 'ok'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_batch(self):
+        lines = [json.dumps({'command': 'keystream', 'cipher': 'a51', 'key': '1', 'frame_counter': '2'}),
+                 '',
+                 json.dumps({'command': 'keystream', 'cipher': 'a52', 'key': '8996', 'frame_counter': '1',
+                             'sizes': SIZES})]
+        (code, results) = run(None, '\n'.join(lines))
+        self.assertEqual(code, jobs.EXIT_OK)
+        self.assertEqual([result['status'] for result in results], ['ok', 'ok'])
+        self.assertEqual(results[1]['send_key'], K1)
+        (code, results) = run(None, '\n'.join(lines + ['{invalid']))
+        self.assertEqual(code, jobs.EXIT_INVALID)
+        self.assertEqual(results[-1]['status'], 'error')
+        # every result line has the same fields
+        for result in results:
+            self.assertLessEqual({'command', 'status', 'started', 'elapsed'}, set(result))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,20 +1,25 @@
 import numpy as np
 import itertools
 import copy
-from constant import * 
+import kernels
+from cipher_spec import A5_2_SPEC
+from instrumentation import metrics
 from numpy.linalg import matrix_rank
 
 
 class Matrix(object):
-    def __init__(self, rows, columns):
+    def __init__(self, rows, columns, spec=None):
         """
             Creates an empty matrix
             :param rows: number of rows
             :param columns: number of columns
+            :param spec: Optional CipherSpec with the register layout
+                         (default: A5/2)
         """
         self.matrix = np.zeros((rows, columns)).astype(int)
         self.rows = rows
         self.columns = columns
+        self.spec = spec or A5_2_SPEC
 
     def build_init_register_matrix(self, registers, r4, k):
         """
@@ -24,22 +29,23 @@ class Matrix(object):
             :param k: key difference k1 ^ k2
         """
         for i in range(self.rows):
-            registers.clock_with_r4(r4)
-            x = registers.r1.g_delta(i)
-            y = registers.r2.g_delta(i)
-            z = registers.r3.g_delta(i)
+            with metrics.stage('symbolic_clocking'):
+                registers.clock_with_r4(r4)
+            with metrics.stage('matrix_building'):
+                x = registers.r1.g_delta(i)
+                y = registers.r2.g_delta(i)
+                z = registers.r3.g_delta(i)
 
-            self.add_row_for_init_registers(x, y, z, i, k)
+                self.add_row_for_init_registers(x, y, z, i, k)
 
     def build_session_key_matrix(self):
-        self.add_row_for_session_key(R1_SK_POSITIONS_AFTER_CLOCKING, R1_SK_START_ROW)
-        self.add_row_for_session_key(R2_SK_POSITIONS_AFTER_CLOCKING, R2_SK_START_ROW)
-        self.add_row_for_session_key(R3_SK_POSITIONS_AFTER_CLOCKING, R3_SK_START_ROW)
+        for sk_positions, start_row in zip(self.spec.sk_positions, self.spec.sk_start_rows):
+            self.add_row_for_session_key(sk_positions, start_row)
 
     def add_row_for_session_key(self, reg_sk_positions, start_row):
         for index, sk_positions in enumerate(reg_sk_positions):
             for sk_position in sk_positions:
-                self.matrix[start_row + index][KEY_SIZE - 1 - sk_position] = 1   
+                self.matrix[start_row + index][self.spec.key_size - 1 - sk_position] = 1
 
     def add_row_for_init_registers(self, x, y, z, row, k):
         """
@@ -50,9 +56,10 @@ class Matrix(object):
             :param row: The row number
             :param k: The key stream bit
         """
-        self.insert_gdelta(x, R1_SIZE, row, R1_START_IN_SOLUTION, k)
-        self.insert_gdelta(y, R2_SIZE, row, R2_START_IN_SOLUTION, k)
-        self.insert_gdelta(z, R3_SIZE, row, R3_START_IN_SOLUTION, k)
+        (r1_start, r2_start, r3_start) = self.spec.start_in_solution
+        self.insert_gdelta(x, self.spec.r1.size, row, r1_start, k)
+        self.insert_gdelta(y, self.spec.r2.size, row, r2_start, k)
+        self.insert_gdelta(z, self.spec.r3.size, row, r3_start, k)
 
     def insert_gdelta(self, variables, size, row, column, k):
         """
@@ -79,6 +86,8 @@ class Matrix(object):
         """
         n = self.matrix.shape[0]
         m = self.matrix.shape[1]
+        if kernels.enabled and n >= m:
+            return self._gauss_kernel(b)
         not_unique = []
         for i in range(0, m):
             maxi = i
@@ -127,7 +136,28 @@ class Matrix(object):
             solutions.append(x)   
         return solutions
 
+    def _gauss_kernel(self, b):
+        """
+            gauss with the compiled kernels, b is updated as in gauss
+        """
+        (n, m) = self.matrix.shape
+        self.matrix = np.ascontiguousarray(self.matrix, dtype=np.int64)
+        values = np.array([int(b[i]) for i in range(n)], dtype=np.int64)
+        not_unique = np.zeros(m, dtype=np.uint8)
+        kernels.gauss_forward(self.matrix, values, not_unique)
+        for i in range(n):
+            b[i] = int(values[i])
+        free_columns = np.flatnonzero(not_unique)
+        free_index = np.full(m, -1, dtype=np.int64)
+        free_index[free_columns] = np.arange(len(free_columns))
+        solutions = []
+        for combination in itertools.product([0, 1], repeat=len(free_columns)):
+            x = np.zeros(m, dtype=np.int64)
+            kernels.back_substitute(self.matrix, values, free_index, np.array(combination, dtype=np.int64), x)
+            solutions.append(x.tolist())
+        return solutions
+
     def is_solvable(self, k):
-        k_vector = np.array(k).reshape(KEY_STREAM_SIZE, 1)
+        k_vector = np.array(k).reshape(self.rows, 1)
         extended_matrix = np.concatenate((self.matrix, k_vector ), axis=1)
         return matrix_rank(self.matrix) <= matrix_rank(extended_matrix)
\ No newline at end of file
@@ -0,0 +1,199 @@
+from BitVector import BitVector
+from lfsr import LFSR
+from batch_matrix import BatchMatrix
+from cipher_spec import A5_2_SPEC
+from frame_difference import is_usable_difference, packed_state_difference, r4_difference
+from instrumentation import metrics
+import gww_attack
+import itertools
+import numpy as np
+from constant import *
+from multiprocessing import Pool
+
+
+class Echelon(object):
+    """
+        Reduced row echelon form of the equations of one R4 candidate.
+        Each pivot column maps to its packed row (column 0 is bit 63) and
+        its right-hand side.
+    """
+    def __init__(self, columns=MATRIX_COLUMNS):
+        self.columns = columns
+        self.pivots = {}
+        self.pivot_mask = 0
+
+    def copy(self):
+        echelon = Echelon(self.columns)
+        echelon.pivots = dict(self.pivots)
+        echelon.pivot_mask = self.pivot_mask
+        return echelon
+
+    def reduce(self, row, b=0):
+        """
+            Eliminates the pivot columns from a row
+            :return tuple (remaining row, right-hand side). If the remaining
+                    row is 0, the value of the row is determined by the
+                    equations.
+        """
+        common = row & self.pivot_mask
+        while common:
+            bit = common.bit_length() - 1
+            (pivot_row, pivot_b) = self.pivots[bit]
+            row ^= pivot_row
+            b ^= pivot_b
+            common = row & self.pivot_mask
+        return (row, b)
+
+    def add(self, row, b):
+        """
+            Adds an equation and keeps the echelon form reduced
+            :param row: packed row
+            :param b: right-hand side
+            :return False if the equation contradicts the previous ones
+        """
+        (row, b) = self.reduce(row, b)
+        if not row:
+            return b == 0
+        bit = row.bit_length() - 1
+        for other, (other_row, other_b) in self.pivots.items():
+            if (other_row >> bit) & 1:
+                self.pivots[other] = (other_row ^ row, other_b ^ b)
+        self.pivots[bit] = (row, b)
+        self.pivot_mask |= 1 << bit
+        return True
+
+    def rank(self):
+        return len(self.pivots)
+
+    def free_variables(self):
+        return self.columns - len(self.pivots)
+
+    def solutions(self):
+        """
+            Generates all solutions (same format as Matrix.gauss)
+        """
+        free = [column for column in range(self.columns) if not (self.pivot_mask >> (63 - column)) & 1]
+        for combination in itertools.product([0, 1], repeat=len(free)):
+            assignment = 0
+            for column, value in zip(free, combination):
+                if value:
+                    assignment |= 1 << (63 - column)
+            x = [0] * self.columns
+            for column, value in zip(free, combination):
+                x[column] = value
+            for bit, (row, b) in self.pivots.items():
+                x[63 - bit] = b ^ (bin(row & assignment).count('1') & 1)
+            yield x
+
+
+def initial_echelons(r4_values, k, difference, spec=None):
+    """
+        Solves the systems of the first frame pair for several R4 values
+        :param spec: Optional CipherSpec (default: A5/2)
+        :return list with tuples (R4 value, Echelon) of the consistent systems
+    """
+    spec = spec or A5_2_SPEC
+    rows = []
+    b = []
+    for value in r4_values:
+        (value_rows, value_b) = gww_attack.build_packed_system(value, k, difference, spec)
+        rows.append(value_rows)
+        b.append(value_b)
+    with metrics.stage('elimination'):
+        systems = BatchMatrix(np.array(rows, dtype=np.uint64), np.array(b), spec.matrix_columns).eliminate()
+    echelons = []
+    for i in np.nonzero(systems.consistent)[0]:
+        echelon = Echelon(spec.matrix_columns)
+        for row, row_b in zip(systems.rows[i, :systems.rank[i]], systems.b[i, :systems.rank[i]]):
+            echelon.add(int(row), int(row_b))
+        echelons.append((r4_values[i], echelon))
+    return echelons
+
+
+class AttackSession(object):
+    """
+        Long-lived attack on one session. The session keeps the equation
+        system of every surviving R4 candidate in reduced row echelon form.
+        All equations use the initial variables of the reference frame (the
+        first frame counter), because the initial states of two frames only
+        differ by a known value. New frame pairs add their equations to the
+        existing systems, candidates with a contradiction are dropped.
+    """
+    def __init__(self, k1, f1, k2, f2, r4_values=None, processes=1, spec=None):
+        """
+            Solves the first frame pair for all R4 candidates
+            :param k1, k2: keystream values
+            :param f1, f2: frame counters (f1 is the reference frame)
+            :param r4_values: Optional, the R4 values to check (default: all
+                              values with R4[10] = 1)
+            :param processes: number of processes for the first frame pair
+            :param spec: Optional CipherSpec (default: A5/2)
+        """
+        self.spec = spec or A5_2_SPEC
+        gww_attack.check_arguments(k1, k2, f1, f2, self.spec)
+        self.reference_keystream = BitVector(size=self.spec.keystream_size, intVal=k1)
+        self.reference_frame = f1
+        self.frames = 1
+        if r4_values is None:
+            r4_values = [i for i in range(2 ** self.spec.r4.size) if (i >> self.spec.r4.forced_bit) & 1]
+        k = list(BitVector(size=self.spec.keystream_size, intVal=k1 ^ k2))
+        batches = [r4_values[i:i + gww_attack.BATCH_SIZE] for i in range(0, len(r4_values), gww_attack.BATCH_SIZE)]
+        if processes > 1:
+            with Pool(processes=processes) as pool:
+                results = pool.starmap(initial_echelons, [(batch, k, f1 ^ f2, self.spec) for batch in batches])
+        else:
+            results = [initial_echelons(batch, k, f1 ^ f2, self.spec) for batch in batches]
+        self.candidates = {}
+        for result in results:
+            self.candidates.update(result)
+
+    def add_pair(self, k3, f3, k4, f4):
+        """
+            Adds the equations of another frame pair of the same session
+            :param k3, k4: keystream values
+            :param f3, f4: frame counters with a usable difference
+            :return number of surviving candidates
+        """
+        gww_attack.check_arguments(k3, k4, f3, f4, self.spec)
+        offset = self.reference_frame ^ f3
+        state_offset = packed_state_difference(offset, self.spec)
+        r4_offset = r4_difference(offset, self.spec)
+        k = list(BitVector(size=self.spec.keystream_size, intVal=k3 ^ k4))
+        for r4_value in list(self.candidates):
+            echelon = self.candidates[r4_value]
+            (rows, b) = gww_attack.build_packed_system(r4_value ^ r4_offset, k, f3 ^ f4, self.spec)
+            for row, row_b in zip(rows, b):
+                # row * x_f3 = row * (x_reference + state_offset)
+                row_b ^= bin(row & state_offset).count('1') & 1
+                if not echelon.add(row, row_b):
+                    metrics.increment('dropped')
+                    del self.candidates[r4_value]
+                    break
+        self.frames += 1
+        return len(self.candidates)
+
+    def surviving(self):
+        """
+            :return list with tuples (R4 value, free variables)
+        """
+        return sorted((r4_value, echelon.free_variables()) for r4_value, echelon in self.candidates.items())
+
+    def recover_key(self, solution_budget=gww_attack.DEFAULT_SOLUTION_BUDGET):
+        """
+            Checks the solutions of all surviving candidates, fewest free
+            variables first. Candidates with more than solution_budget free
+            variables are deferred until all other candidates are checked.
+            :return the session key as integer or None
+        """
+        frame = BitVector(size=self.spec.frame_counter_size, intVal=self.reference_frame)
+        candidates = sorted(self.surviving(), key=lambda candidate: candidate[1])
+        checked = [candidate for candidate in candidates if candidate[1] <= solution_budget]
+        deferred = [candidate for candidate in candidates if candidate[1] > solution_budget]
+        metrics.increment('deferred', len(deferred))
+        for r4_value, free_variables in checked + deferred:
+            r4 = LFSR.from_spec(self.spec.r4, int_value=r4_value)
+            session_key = gww_attack.check_gauss_solution(self.candidates[r4_value].solutions(), r4,
+                                                          self.reference_keystream, frame, self.spec)
+            if session_key:
+                return session_key.int_val()
+        return None
@@ -0,0 +1,56 @@
+import unittest
+from a5_2 import A5_2
+from online_attack import AttackSession
+from cipher_spec import CipherSpec
+from frame_difference import usable_differences
+from constant import *
+
+
+def keystream(key, frame_counter):
+    (send_key, receive_key) = A5_2(key, frame_counter).get_key_stream(generate_only_send_key=True)
+    return send_key.int_val()
+
+
+class OnlineAttackTest(unittest.TestCase):
+
+    def test_candidates_narrow_with_new_pairs(self):
+        key = 0xfaf3df3fa6698c0c
+        f1 = 0x7c084
+        f2 = f1 ^ FRAME_COUNTER_DIFFERENCE
+        a52 = A5_2(key, f1)
+        a52.get_key_stream(generate_only_send_key=True)
+        r4 = a52.initial_sates['r4'].register.int_val()
+        r4_values = [value for value in range(r4 - 600, r4 + 600) if (value >> FORCE_R4_BIT_TO_1) & 1]
+        session = AttackSession(keystream(key, f1), f1, keystream(key, f2), f2, r4_values)
+        self.assertIn(r4, session.candidates)
+        before = session.candidates[r4].free_variables()
+
+        f3 = 0x1a2b3
+        f4 = f3 ^ usable_differences()[5]
+        remaining = session.add_pair(keystream(key, f3), f3, keystream(key, f4), f4)
+        self.assertEqual(remaining, 1)
+        self.assertIn(r4, session.candidates)
+        self.assertLessEqual(session.candidates[r4].free_variables(), before)
+        self.assertEqual(session.recover_key(), key)
+
+    def test_deferred_candidates(self):
+        spec = CipherSpec.reduced((5, 6, 7, 8))
+        key = 0x8996
+        (f1, f2, f3) = (0x246dd6, 0x246ccf, 0x1a2b3)
+        f4 = f3 ^ usable_differences(spec)[1]
+
+        def reduced_keystream(frame_counter):
+            return A5_2(key, frame_counter, spec).get_key_stream(generate_only_send_key=True)[0].int_val()
+        session = AttackSession(reduced_keystream(f1), f1, reduced_keystream(f2), f2, spec=spec)
+        session.add_pair(reduced_keystream(f3), f3, reduced_keystream(f4), f4)
+        self.assertTrue(session.candidates)
+        # every surviving candidate is over the budget, so the key is only
+        # found by the deferred candidates
+        self.assertGreater(min(free for r4_value, free in session.surviving()), 0)
+        session_key = session.recover_key(solution_budget=0)
+        self.assertIsNotNone(session_key)
+        self.assertEqual(reduced_keystream(f1), A5_2(session_key, f1, spec).get_key_stream(
+            generate_only_send_key=True)[0].int_val())
+
+if __name__ == '__main__':
+    unittest.main()
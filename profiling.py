@@ -0,0 +1,264 @@
+import argparse
+import cProfile
+import glob
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from instrumentation import NULL_STAGE
+
+# cProfile in the sampled sections plus stack sampling
+MODE_DETERMINISTIC = 'deterministic'
+# only stack sampling, the overhead is one stack walk per interval
+MODE_SAMPLING = 'sampling'
+MODES = [MODE_DETERMINISTIC, MODE_SAMPLING]
+# share of the work units (batches of R4 candidates) which are profiled
+DEFAULT_RATE = 0.1
+# seconds between two stack samples
+DEFAULT_INTERVAL = 0.005
+WORKER_PREFIX = 'worker-'
+PROFILE_SUFFIX = '.prof'
+STACKS_SUFFIX = '.folded'
+MERGED_NAME = 'profile'
+
+
+class ProfileSettings(object):
+    """
+        Options of the profiling mode, passed to the worker processes
+    """
+    def __init__(self, directory, mode=MODE_DETERMINISTIC, rate=DEFAULT_RATE, interval=DEFAULT_INTERVAL):
+        """
+            :param directory: directory for the per-worker and merged files
+            :param mode: MODE_DETERMINISTIC or MODE_SAMPLING
+            :param rate: share of the work units which are profiled (0 < rate
+                         <= 1), bounds the profiling overhead
+            :param interval: seconds between two stack samples
+        """
+        if mode not in MODES:
+            raise ValueError('Unknown profiling mode: ' + str(mode))
+        if not 0 < rate <= 1:
+            raise ValueError('The profiling rate must be between 0 and 1!')
+        if interval <= 0:
+            raise ValueError('The sampling interval must be positive!')
+        self.directory = directory
+        self.mode = mode
+        self.rate = rate
+        self.interval = interval
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return '{}:{}'.format(os.path.basename(code.co_filename), code.co_name).replace(';', ',')
+
+
+class StackSampler(threading.Thread):
+    """
+        Samples the stack of one thread while it is inside a profiled
+        section and counts the collapsed stacks (root first, separated by
+        semicolons)
+    """
+    def __init__(self, thread_id, interval):
+        threading.Thread.__init__(self, daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.active = threading.Event()
+        self.lock = threading.Lock()
+        self.stacks = Counter()
+
+    def run(self):
+        while True:
+            self.active.wait()
+            time.sleep(self.interval)
+            if not self.active.is_set():
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame))
+                frame = frame.f_back
+            if names:
+                with self.lock:
+                    self.stacks[';'.join(reversed(names))] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return Counter(self.stacks)
+
+
+class _ProfiledSection(object):
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def __enter__(self):
+        self.profiler.sampler.active.set()
+        if self.profiler.profile:
+            self.profiler.profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler.profile:
+            self.profiler.profile.disable()
+        self.profiler.sampler.active.clear()
+        return False
+
+
+class WorkerProfiler(object):
+    """
+        Profiles a share of the work units of one worker process. The units
+        are selected evenly (the first unit and then every 1/rate-th unit),
+        the others run without any profiling overhead.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self.name = WORKER_PREFIX + str(os.getpid())
+        self.units = 0
+        self.profiled = 0
+        self.profile = cProfile.Profile() if settings.mode == MODE_DETERMINISTIC else None
+        self.sampler = None
+
+    def section(self):
+        """
+            :return context manager around one work unit
+        """
+        index = self.units
+        self.units += 1
+        rate = self.settings.rate
+        if math.floor(index * rate) == math.floor((index - 1) * rate):
+            return NULL_STAGE
+        if self.sampler is None:
+            self.sampler = StackSampler(threading.get_ident(), self.settings.interval)
+            self.sampler.start()
+        self.profiled += 1
+        return _ProfiledSection(self)
+
+    def dump(self):
+        """
+            Writes the cumulative profile and stack counts of this worker
+        """
+        if not self.profiled:
+            return
+        os.makedirs(self.settings.directory, exist_ok=True)
+        path = os.path.join(self.settings.directory, self.name)
+        if self.profile:
+            self.profile.dump_stats(path + PROFILE_SUFFIX)
+        write_stacks(path + STACKS_SUFFIX, self.sampler.snapshot())
+
+
+def section(profiler):
+    """
+        :param profiler: WorkerProfiler or None
+        :return context manager around one work unit
+    """
+    if profiler is None:
+        return NULL_STAGE
+    return profiler.section()
+
+
+def write_stacks(path, stacks):
+    with open(path, 'w') as f:
+        for stack, count in sorted(stacks.items()):
+            f.write('{} {}\n'.format(stack, count))
+
+
+def read_stacks(path):
+    stacks = Counter()
+    with open(path) as f:
+        for line in f:
+            (stack, count) = line.rstrip('\n').rsplit(' ', 1)
+            stacks[stack] += int(count)
+    return stacks
+
+
+def worker_files(directory, suffix):
+    return sorted(glob.glob(os.path.join(directory, WORKER_PREFIX + '*' + suffix)))
+
+
+def prepare_directory(directory):
+    """
+        Creates the directory and removes the files of a previous run
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path in worker_files(directory, PROFILE_SUFFIX) + worker_files(directory, STACKS_SUFFIX):
+        os.remove(path)
+    for path in merged_files(directory).values():
+        if path:
+            os.remove(path)
+
+
+def merge_profiles(directory):
+    """
+        Merges the per-worker files into profile.prof (pstats) and
+        profile.folded (collapsed stacks, e.g. for flamegraph.pl)
+        :return dictionary with the paths of the merged files (None if no
+                worker wrote this kind of file) and the number of workers
+    """
+    result = {'profile': None, 'stacks': None, 'workers': 0}
+    profiles = worker_files(directory, PROFILE_SUFFIX)
+    if profiles:
+        result['profile'] = os.path.join(directory, MERGED_NAME + PROFILE_SUFFIX)
+        pstats.Stats(*profiles).dump_stats(result['profile'])
+    stack_files = worker_files(directory, STACKS_SUFFIX)
+    if stack_files:
+        stacks = Counter()
+        for path in stack_files:
+            stacks.update(read_stacks(path))
+        result['stacks'] = os.path.join(directory, MERGED_NAME + STACKS_SUFFIX)
+        write_stacks(result['stacks'], stacks)
+    result['workers'] = len(stack_files)
+    return result
+
+
+def merged_files(directory):
+    """
+        :return dictionary with the paths of the existing merged files
+    """
+    result = {}
+    for key, suffix in (('profile', PROFILE_SUFFIX), ('stacks', STACKS_SUFFIX)):
+        path = os.path.join(directory, MERGED_NAME + suffix)
+        result[key] = path if os.path.exists(path) else None
+    return result
+
+
+def own_samples(stacks):
+    """
+        :return Counter with the samples per function at the top of the
+                stack
+    """
+    functions = Counter()
+    for stack, count in stacks.items():
+        functions[stack.rsplit(';', 1)[-1]] += count
+    return functions
+
+
+def report(directory, limit=20, stream=None):
+    """
+        Prints the merged profile (cumulative time) and the functions with
+        the most samples
+    """
+    stream = stream or sys.stdout
+    merged = merge_profiles(directory)
+    if merged['profile']:
+        pstats.Stats(merged['profile'], stream=stream).sort_stats('cumulative').print_stats(limit)
+    if merged['stacks']:
+        functions = own_samples(read_stacks(merged['stacks']))
+        total = sum(functions.values())
+        stream.write('{} samples\n'.format(total))
+        for function, count in functions.most_common(limit):
+            stream.write('{:8d} {:6.1%}  {}\n'.format(count, count / total, function))
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merges the per-worker profiles of an attack and prints a report')
+    parser.add_argument('directory', help='profile directory of the attack')
+    parser.add_argument('--limit', type=int, default=20, help='number of functions in the report')
+    args = parser.parse_args()
+    merged = report(args.directory, args.limit)
+    return 0 if merged['workers'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
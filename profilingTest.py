@@ -0,0 +1,69 @@
+import unittest
+import os
+import random
+import shutil
+import tempfile
+import time
+import gww_attack
+import profiling
+import pstats
+from a5_2 import A5_2
+from cipher_spec import CipherSpec
+from frame_difference import usable_differences
+from instrumentation import NULL_STAGE
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_rate_selects_units_evenly(self):
+        profiler = profiling.WorkerProfiler(profiling.ProfileSettings(self.directory, profiling.MODE_SAMPLING, 0.25))
+        profiled = [index for index in range(12) if profiler.section() is not NULL_STAGE]
+        self.assertEqual(profiled, [0, 4, 8])
+        self.assertRaises(ValueError, profiling.ProfileSettings, self.directory, rate=0)
+
+    def test_merge(self):
+        settings = profiling.ProfileSettings(self.directory, interval=0.001)
+        for name in ('worker-1', 'worker-2'):
+            profiler = profiling.WorkerProfiler(settings)
+            profiler.name = name
+            with profiler.section():
+                busy(0.05)
+            profiler.dump()
+        merged = profiling.merge_profiles(self.directory)
+        self.assertEqual(merged['workers'], 2)
+        stacks = profiling.read_stacks(merged['stacks'])
+        self.assertIn('profilingTest.py:busy', profiling.own_samples(stacks))
+        self.assertEqual(sum(stacks.values()), sum(sum(profiling.read_stacks(path).values()) for path
+                                                   in profiling.worker_files(self.directory, '.folded')))
+        self.assertTrue(os.path.exists(merged['profile']))
+
+    def test_profiled_attack(self):
+        spec = CipherSpec.reduced((5, 6, 7, 8))
+        rng = random.Random(3)
+        key = rng.getrandbits(spec.key_size)
+        f1 = rng.getrandbits(spec.frame_counter_size)
+        f2 = f1 ^ usable_differences(spec)[0]
+        k1 = A5_2(key, f1, spec).get_key_stream(generate_only_send_key=True)[0].int_val()
+        k2 = A5_2(key, f2, spec).get_key_stream(generate_only_send_key=True)[0].int_val()
+        settings = profiling.ProfileSettings(self.directory, rate=1)
+        self.assertIsNotNone(gww_attack.init_attack(k1, k2, f1, f2, 2, spec=spec, profile=settings))
+        merged = profiling.merged_files(self.directory)
+        self.assertIsNotNone(merged['stacks'])
+        functions = [function for (file_name, line, function) in
+                     pstats.Stats(merged['profile']).stats]
+        self.assertIn('perform_batch_attack', functions)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import sys
+import threading
+import time
+from multiprocessing import Array
+
+
+def split_range(total, parts):
+    """
+        Splits range(total) into consecutive chunks of almost equal size
+        :return list with tuples (start_value, steps)
+    """
+    chunks = []
+    start = 0
+    for i in range(parts):
+        steps = total // parts + (1 if i < total % parts else 0)
+        chunks.append((start, steps))
+        start += steps
+    return chunks
+
+
+def count_with_bit_set(start, stop, bit):
+    """
+        :return number of integers in range(start, stop) where the given
+                bit is set
+    """
+    def below(n):
+        period = 1 << (bit + 1)
+        return (n // period) * (1 << bit) + max(0, n % period - (1 << bit))
+    return below(stop) - below(start)
+
+
+def create_counters(number_of_workers):
+    """
+        :return shared memory array with one processed-candidate counter
+                per worker. Each worker only writes its own slot, so no
+                lock is required.
+    """
+    return Array('Q', number_of_workers, lock=False)
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '--:--:--'
+    seconds = int(seconds)
+    return '{:02d}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def progress_values(counts, last_counts, totals, elapsed, window):
+    """
+        Calculates the progress of one report
+        :param counts: processed candidates per worker
+        :param last_counts: processed candidates per worker at the last
+                            report
+        :param totals: number of candidates per worker
+        :param elapsed: seconds since the start of the phase
+        :param window: seconds since the last report
+        :return dictionary with the processed and total candidates, the
+                percentage, the overall and current rate (candidates per
+                second), the current rate per worker and the ETA in seconds
+                (None if no worker made progress since the last report)
+    """
+    window = max(window, 1e-9)
+    worker_rates = [(count - last) / window for count, last in zip(counts, last_counts)]
+    processed = sum(counts)
+    total = sum(totals)
+    current_rate = sum(worker_rates)
+    return {'processed': processed,
+            'total': total,
+            'percent': 100.0 * processed / total if total else 100.0,
+            'rate': processed / elapsed if elapsed > 0 else 0.0,
+            'current_rate': current_rate,
+            'worker_rates': worker_rates,
+            'eta': (total - processed) / current_rate if current_rate > 0 else None}
+
+
+class ProgressReporter(threading.Thread):
+    """
+        Periodically reads the shared worker counters and reports the
+        progress, the throughput (overall and per worker) and the ETA
+        for the remaining candidates. The attack can consist of several
+        phases (e.g. the sweep and the deferred candidates), each phase
+        uses its own slots of the counters.
+    """
+    def __init__(self, counters, totals, interval, stream=None):
+        """
+            :param counters: shared memory array (see create_counters)
+            :param totals: number of candidates per worker in the first
+                           phase, which uses the first slots of counters
+            :param interval: seconds between two reports
+            :param stream: output stream (default: stderr)
+        """
+        threading.Thread.__init__(self, daemon=True)
+        self.counters = counters
+        self.interval = interval
+        self.stream = stream or sys.stderr
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()
+        self.start_time = time.monotonic()
+        # list with tuples (name, first counter slot, totals)
+        self.phases = []
+        self.start_phase(None, 0, totals)
+
+    def start_phase(self, name, offset, totals):
+        """
+            Reports the progress of a new phase from now on
+            :param name: name shown in the reports
+            :param offset: first counter slot of the phase
+            :param totals: number of candidates per worker
+        """
+        with self.lock:
+            self.phases.append((name, offset, list(totals)))
+            self.phase_start = time.monotonic()
+            self.last_time = self.phase_start
+            self.last_counts = [0] * len(totals)
+
+    def phase_counts(self, phase):
+        (name, offset, totals) = phase
+        return list(self.counters[offset:offset + len(totals)])
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def report(self):
+        with self.lock:
+            now = time.monotonic()
+            phase = self.phases[-1]
+            (name, offset, totals) = phase
+            counts = self.phase_counts(phase)
+            values = progress_values(counts, self.last_counts, totals, now - self.phase_start, now - self.last_time)
+            workers = ' '.join('{:.1f}'.format(r) if c < t else 'done'
+                               for r, c, t in zip(values['worker_rates'], counts, totals))
+            self.stream.write('progress {}{:5.1f}% {}/{} candidates, {:.1f} candidates/s (current {:.1f}), '
+                              'workers [{}], elapsed {}, ETA {}\n'.format(name + ' ' if name else '', values['percent'],
+                                                                          values['processed'], values['total'],
+                                                                          values['rate'], values['current_rate'],
+                                                                          workers,
+                                                                          format_duration(now - self.start_time),
+                                                                          format_duration(values['eta'])))
+            self.stream.flush()
+            self.last_time = now
+            self.last_counts = counts
+
+    def stop(self, found=None, details=None):
+        """
+            Stops the reporter and writes the final summary
+            :param found: result of the search (written into the summary)
+            :param details: optional text appended to the summary
+        """
+        self.stopped.set()
+        self.join()
+        elapsed = time.monotonic() - self.start_time
+        processed = sum(self.phase_counts(self.phases[0]))
+        parts = [details] if details else []
+        for phase in self.phases[1:]:
+            parts.append('{} {}/{} candidates'.format(phase[0], sum(self.phase_counts(phase)), sum(phase[2])))
+        self.stream.write('finished: {}/{} candidates in {}, {:.1f} candidates/s, {}{}\n'.format(
+            processed, sum(self.phases[0][2]), format_duration(elapsed), processed / elapsed if elapsed > 0 else 0.0,
+            'session key found' if found else 'no session key found', ''.join(', ' + part for part in parts)))
+        self.stream.flush()
@@ -0,0 +1,61 @@
+import io
+import unittest
+from progress import ProgressReporter, count_with_bit_set, format_duration, progress_values, split_range
+
+
+class ProgressTest(unittest.TestCase):
+
+    def test_split_range(self):
+        self.assertEqual(split_range(10, 3), [(0, 4), (4, 3), (7, 3)])
+        self.assertEqual(split_range(4, 4), [(0, 1), (1, 1), (2, 1), (3, 1)])
+        self.assertEqual(split_range(2, 3), [(0, 1), (1, 1), (2, 0)])
+        for total, parts in ((2 ** 17, 8), (1000, 7), (5, 1)):
+            chunks = split_range(total, parts)
+            self.assertEqual(sum(steps for start, steps in chunks), total)
+            self.assertEqual([start for start, steps in chunks],
+                             [sum(steps for start, steps in chunks[:i]) for i in range(parts)])
+            self.assertLessEqual(max(c[1] for c in chunks) - min(c[1] for c in chunks), 1)
+
+    def test_count_with_bit_set(self):
+        for (start, stop, bit) in ((0, 2 ** 17, 10), (3, 1000, 4), (17, 18, 0), (100, 100, 3), (5, 77, 6)):
+            self.assertEqual(count_with_bit_set(start, stop, bit),
+                             len([i for i in range(start, stop) if (i >> bit) & 1]))
+
+    def test_progress_values(self):
+        values = progress_values([30, 50], [10, 30], [100, 100], 10.0, 2.0)
+        self.assertEqual(values['processed'], 80)
+        self.assertEqual(values['total'], 200)
+        self.assertEqual(values['percent'], 40.0)
+        self.assertEqual(values['rate'], 8.0)
+        self.assertEqual(values['worker_rates'], [10.0, 10.0])
+        self.assertEqual(values['current_rate'], 20.0)
+        self.assertEqual(values['eta'], 6.0)
+        # no progress since the last report: unknown ETA
+        values = progress_values([30, 50], [30, 50], [100, 100], 10.0, 2.0)
+        self.assertIsNone(values['eta'])
+        self.assertEqual(progress_values([], [], [], 0.0, 0.0)['percent'], 100.0)
+
+    def test_format_duration(self):
+        self.assertEqual(format_duration(None), '--:--:--')
+        self.assertEqual(format_duration(3723.9), '01:02:03')
+
+    def test_phases(self):
+        counters = [0] * 4
+        stream = io.StringIO()
+        reporter = ProgressReporter(counters, [10, 10], 60, stream)
+        reporter.start()
+        counters[0:2] = [10, 4]
+        reporter.report()
+        reporter.start_phase('deferred', 2, [3, 2])
+        counters[2:4] = [1, 2]
+        reporter.report()
+        reporter.stop(True, 'deferred 5 candidates')
+        lines = stream.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith('progress  70.0% 14/20 candidates'))
+        self.assertIn('workers [done', lines[0])
+        self.assertTrue(lines[1].startswith('progress deferred  60.0% 3/5 candidates'))
+        self.assertTrue(lines[2].startswith('finished: 14/20 candidates'))
+        self.assertTrue(lines[2].endswith('session key found, deferred 5 candidates, deferred 3/5 candidates'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,541 @@
+import argparse
+import asyncio
+import collections
+import heapq
+import itertools
+import json
+import os
+import sys
+import time
+import jobs
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+
+# number of R4 ranges per attack job, i.e. the granularity of priorities and
+# cancellation
+ATTACK_CHUNKS = 64
+# number of deferred candidates per work unit
+DEFERRED_CHUNK = 16
+# seconds a finished job stays queryable before it is evicted
+FINISHED_TTL = 600
+
+
+# =========================
+#     WORKER FUNCTIONS
+# =========================
+def init_worker():
+    """
+        Imports the attack once per worker process. The symbolic register
+        tables and frame difference tables stay cached for all later jobs.
+    """
+    import gww_attack
+    gww_attack.init_pool(None)
+
+
+def prepare_attack(job):
+    """
+        :return tuple with the frame pair (k1, f1, k2, f2) to attack and the
+                CipherSpec of the job
+    """
+    import gww_attack
+    from cipher_spec import A5_2_SPEC
+    spec = jobs.cipher_spec(job.get('sizes')) or A5_2_SPEC
+    if 'frames' in job:
+        frames = [(jobs.parse_value(frame['k']), jobs.parse_value(frame['f'])) for frame in job['frames']]
+        (k1, f1, k2, f2) = gww_attack.select_frame_pair(frames, spec=spec)
+    else:
+        (k1, f1, k2, f2) = [jobs.parse_value(job.get(name)) for name in ('k1', 'f1', 'k2', 'f2')]
+    gww_attack.check_arguments(k1, k2, f1, f2, spec)
+    return ((k1, f1, k2, f2), spec)
+
+
+def attack_bits(frames, spec):
+    """
+        :return tuple (k1, k2, f1, f2) as BitVectors
+    """
+    from BitVector import BitVector
+    (k1, f1, k2, f2) = frames
+    return (BitVector(size=spec.keystream_size, intVal=k1), BitVector(size=spec.keystream_size, intVal=k2),
+            BitVector(size=spec.frame_counter_size, intVal=f1), BitVector(size=spec.frame_counter_size, intVal=f2))
+
+
+def attack_range(start, steps, frames, spec, stop, solution_budget):
+    """
+        Checks one R4 range of an attack job
+        :param frames: tuple (k1, f1, k2, f2)
+        :param spec: CipherSpec of the job
+        :param stop: Event of the job, set on cancellation or when a worker
+                     found the session key
+        :return tuple (session key or None, deferred candidates)
+    """
+    import gww_attack
+    gww_attack.init_pool(stop)
+    return gww_attack.find_r4(start, steps, *attack_bits(frames, spec), 0, solution_budget, spec)
+
+
+def attack_deferred(r4_values, frames, spec, stop):
+    import gww_attack
+    gww_attack.init_pool(stop)
+    return gww_attack.solve_deferred(r4_values, *attack_bits(frames, spec), spec)
+
+
+def prepare_a51_attack(job):
+    """
+        :return tuple (keystream, frame counter, A51Parameters as
+                dictionary, split bits) of an a51_attack job
+    """
+    import guess_and_determine
+    from a5_1_core import A51Parameters
+    sizes = job.get('sizes')
+    parameters = A51Parameters.reduced([int(size) for size in sizes]) if sizes else A51Parameters()
+    (keystream, frame_counter) = (jobs.parse_value(job.get('keystream')), jobs.parse_value(job.get('frame_counter')))
+    guess_and_determine.check_arguments(keystream, frame_counter, parameters)
+    split_bits = int(job.get('split_bits', guess_and_determine.DEFAULT_SPLIT_BITS))
+    return (keystream, frame_counter, parameters.to_dict(), split_bits)
+
+
+def search_prefixes(keystream, frame_counter, parameters, prefixes, stop):
+    """
+        Searches the guess prefixes of one share of an a51_attack job
+        :return tuple (session key or None, state or None, number of guesses)
+    """
+    import guess_and_determine
+    guess_and_determine.init_pool(stop)
+    return guess_and_determine.search_prefixes(keystream, frame_counter, parameters, prefixes)
+
+
+# =========================
+#     SERVICE
+# =========================
+class Job(object):
+    """
+        A submitted job. Attack jobs are split into work units (frame pair
+        selection, R4 ranges, deferred candidates); a keystream job is a
+        single unit.
+    """
+    def __init__(self, job_id, description, priority, sequence):
+        self.id = job_id
+        self.description = description
+        self.priority = priority
+        self.sequence = sequence
+        self.command = description.get('command')
+        self.status = 'queued'
+        self.units = collections.deque()
+        self.running = 0
+        self.done = 0
+        self.total = 0
+        self.frames = None
+        self.spec = None
+        self.deferred = []
+        self.session_key = None
+        self.state = None
+        self.guesses = 0
+        self.stop = None
+        self.started = None
+        self.start = None
+        self.finished_at = None
+        self.subscribers = set()
+
+    def key(self):
+        # higher priorities first, then in order of submission
+        return (-self.priority, self.sequence)
+
+    def finished(self):
+        return self.status in ('ok', 'not_found', 'error', 'cancelled')
+
+
+class AttackService(object):
+    """
+        Runs keystream and attack jobs on a persistent process pool. The work
+        units of the queued jobs are dispatched by priority, at most one
+        unit per worker is in flight, so a new job with a higher priority
+        starts as soon as a worker is free. Finished jobs can be queried for
+        finished_ttl seconds, then they are evicted.
+    """
+    def __init__(self, processes=None, chunks=ATTACK_CHUNKS, finished_ttl=FINISHED_TTL):
+        self.processes = processes or os.cpu_count() or 1
+        self.chunks = chunks
+        self.finished_ttl = finished_ttl
+        self.executor = ProcessPoolExecutor(self.processes, initializer=init_worker)
+        self.manager = Manager()
+        self.jobs = {}
+        self.finished = collections.deque()
+        self.ready = []
+        self.in_flight = 0
+        self.sequence = itertools.count()
+        self.ids = itertools.count(1)
+        self.changed = None
+        self.dispatcher = None
+
+    async def start(self):
+        self.changed = asyncio.Condition()
+        # start the workers now, so that the first job does not wait for them
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.executor, os.getpid) for i in range(self.processes)])
+        self.dispatcher = asyncio.ensure_future(self._dispatch())
+
+    def close(self):
+        if self.dispatcher:
+            self.dispatcher.cancel()
+        self.executor.shutdown(wait=False)
+        self.manager.shutdown()
+
+    def submit(self, description, priority=0, subscriber=None):
+        """
+            :param description: job description (see jobs.run_job)
+            :param priority: jobs with a higher priority are run first
+            :param subscriber: Optional asyncio.Queue for the job events
+            :return the job
+        """
+        if not isinstance(description, dict):
+            raise ValueError('Job must be a JSON object')
+        self._evict()
+        if 'id' in description:
+            job_id = str(description['id'])
+            if job_id in self.jobs:
+                raise ValueError('Duplicate job id: ' + job_id)
+        else:
+            job_id = 'job-' + str(next(self.ids))
+            while job_id in self.jobs:
+                job_id = 'job-' + str(next(self.ids))
+        job = Job(job_id, description, int(priority), next(self.sequence))
+        if subscriber is not None:
+            job.subscribers.add(subscriber)
+        self.jobs[job_id] = job
+        if job.command == 'keystream':
+            job.units.append((self._keystream_finished, jobs.run_job, description))
+        elif job.command == 'attack':
+            job.stop = self.manager.Event()
+            job.units.append((self._prepared, prepare_attack, description))
+        elif job.command == 'a51_attack':
+            job.stop = self.manager.Event()
+            job.units.append((self._a51_prepared, prepare_a51_attack, description))
+        else:
+            self._finish(job, 'error', {'error': 'Unknown command: ' + str(job.command)})
+            return job
+        job.total = len(job.units)
+        self._publish(job, {'event': 'queued', 'priority': job.priority})
+        self._schedule(job)
+        return job
+
+    def cancel(self, job_id):
+        """
+            Removes the queued units of a job and stops its running units
+            :return False if the job is unknown or already finished
+        """
+        job = self.jobs.get(job_id)
+        if job is None or job.finished():
+            return False
+        self._finish(job, 'cancelled', {})
+        return True
+
+    def status(self, job_id):
+        self._evict()
+        job = self.jobs.get(job_id)
+        if job is None:
+            return {'event': 'status', 'id': job_id, 'status': 'unknown'}
+        return {'event': 'status', 'id': job_id, 'status': job.status, 'done': job.done, 'total': job.total}
+
+    def _schedule(self, job):
+        heapq.heappush(self.ready, (job.key(), job.id))
+        self._notify()
+
+    def _notify(self):
+        asyncio.ensure_future(self._notify_async())
+
+    async def _notify_async(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    def _next_job(self):
+        while self.ready:
+            job = self.jobs.get(self.ready[0][1])
+            if job is not None and job.units and not job.finished():
+                return job
+            heapq.heappop(self.ready)
+        return None
+
+    def _evict(self):
+        deadline = time.time() - self.finished_ttl
+        while self.finished and self.finished[0][0] <= deadline:
+            (finished_at, job_id) = self.finished.popleft()
+            job = self.jobs.get(job_id)
+            if job is not None and job.finished_at == finished_at:
+                del self.jobs[job_id]
+
+    async def _dispatch(self):
+        while True:
+            async with self.changed:
+                await self.changed.wait_for(lambda: self.in_flight < self.processes and self._next_job())
+                job = self._next_job()
+                unit = job.units.popleft()
+                self.in_flight += 1
+            if job.status == 'queued':
+                job.status = 'running'
+                job.started = time.time()
+                job.start = time.perf_counter()
+                self._publish(job, {'event': 'started'})
+            job.running += 1
+            asyncio.ensure_future(self._run(job, unit))
+
+    async def _run(self, job, unit):
+        (callback, function, *arguments) = unit
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self.executor, function, *arguments)
+            error = None
+        except Exception as exception:
+            (result, error) = (None, exception)
+        finally:
+            self.in_flight -= 1
+            job.running -= 1
+            job.done += 1
+            self._notify()
+        if job.finished():
+            return
+        if error is None:
+            try:
+                callback(job, result)
+                return
+            except Exception as exception:
+                error = exception
+        # stops the other running units of the job
+        self._finish(job, 'error', {'error': str(error) or type(error).__name__})
+
+    def _keystream_finished(self, job, result):
+        fields = {name: value for name, value in result.items()
+                  if name not in ('command', 'id', 'status', 'started', 'elapsed')}
+        self._finish(job, result['status'], fields)
+
+    def _prepared(self, job, result):
+        import gww_attack
+        from progress import split_range
+        (job.frames, job.spec) = result
+        # optional partial sweep, e.g. to share the R4 space between services
+        (first, stop) = job.description.get('r4_range', (0, 2 ** job.spec.r4.size))
+        for start, steps in split_range(stop - first, self.chunks):
+            job.units.append((self._range_finished, attack_range, first + start, steps, job.frames, job.spec,
+                              job.stop,
+                              job.description.get('solution_budget', gww_attack.DEFAULT_SOLUTION_BUDGET)))
+        job.total += self.chunks
+        self._schedule(job)
+
+    def _range_finished(self, job, result):
+        (session_key, deferred) = result
+        job.deferred += deferred
+        self._publish(job, {'event': 'progress', 'done': job.done, 'total': job.total})
+        if session_key is not None:
+            self._found(job, session_key)
+        elif not job.units and not job.running:
+            if job.deferred:
+                # cheapest candidates first
+                r4_values = [value for (free_variables, value) in sorted(job.deferred)]
+                for i in range(0, len(r4_values), DEFERRED_CHUNK):
+                    job.units.append((self._deferred_finished, attack_deferred, r4_values[i:i + DEFERRED_CHUNK],
+                                      job.frames, job.spec, job.stop))
+                job.total += len(job.units)
+                job.deferred = []
+                self._schedule(job)
+            else:
+                self._finish(job, 'not_found', self._attack_fields(job))
+
+    def _deferred_finished(self, job, session_key):
+        self._publish(job, {'event': 'progress', 'done': job.done, 'total': job.total})
+        if session_key is not None:
+            self._found(job, session_key)
+        elif not job.units and not job.running:
+            self._finish(job, 'not_found', self._attack_fields(job))
+
+    def _found(self, job, session_key):
+        job.session_key = session_key
+        self._finish(job, 'ok', self._attack_fields(job))
+
+    def _a51_prepared(self, job, arguments):
+        from progress import split_range
+        (keystream, frame_counter, parameters, split_bits) = arguments
+        prefixes = list(itertools.product([0, 1], repeat=split_bits))
+        chunks = split_range(len(prefixes), min(self.chunks, len(prefixes)))
+        for start, steps in chunks:
+            job.units.append((self._prefixes_finished, search_prefixes, keystream, frame_counter, parameters,
+                              prefixes[start:start + steps], job.stop))
+        job.total += len(chunks)
+        self._schedule(job)
+
+    def _prefixes_finished(self, job, result):
+        (session_key, state, guesses) = result
+        job.guesses += guesses
+        self._publish(job, {'event': 'progress', 'done': job.done, 'total': job.total})
+        if session_key is not None:
+            (job.session_key, job.state) = (session_key, state)
+            self._finish(job, 'ok', self._a51_fields(job))
+        elif not job.units and not job.running:
+            self._finish(job, 'not_found', self._a51_fields(job))
+
+    def _a51_fields(self, job):
+        return {'session_key': hex(job.session_key) if job.session_key is not None else None,
+                'state': hex(job.state) if job.state is not None else None,
+                'guesses': job.guesses}
+
+    def _attack_fields(self, job):
+        (k1, f1, k2, f2) = job.frames
+        return {'session_key': hex(job.session_key) if job.session_key is not None else None,
+                'f1': hex(f1), 'f2': hex(f2)}
+
+    def _finish(self, job, status, fields):
+        job.units.clear()
+        if job.stop is not None:
+            job.stop.set()
+        job.status = status
+        job.finished_at = time.time()
+        self.finished.append((job.finished_at, job.id))
+        result = {'event': 'finished', 'command': job.command, 'status': status}
+        result.update(fields)
+        if job.started is not None:
+            result['started'] = job.started
+            result['elapsed'] = time.perf_counter() - job.start
+        self._publish(job, result)
+        job.subscribers.clear()
+
+    def _publish(self, job, event):
+        event = dict(event, id=job.id)
+        for subscriber in job.subscribers:
+            subscriber.put_nowait(event)
+
+
+# =========================
+#     PROTOCOL
+# =========================
+async def handle_connection(service, reader, writer):
+    """
+        JSON lines protocol. Requests:
+            {"op": "submit", "job": {...}, "priority": 0}
+            {"op": "cancel", "id": ...}
+            {"op": "status", "id": ...}
+            {"op": "watch", "id": ...}
+        The events of the submitted and watched jobs (queued, started,
+        progress, finished) are streamed back as JSON lines.
+    """
+    events = asyncio.Queue()
+
+    async def send_events():
+        while True:
+            event = await events.get()
+            writer.write((json.dumps(event) + '\n').encode())
+            await writer.drain()
+
+    sender = asyncio.ensure_future(send_events())
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line.decode())
+                op = request.get('op')
+                if op == 'submit':
+                    service.submit(request.get('job'), request.get('priority', 0), events)
+                elif op == 'cancel':
+                    if not service.cancel(str(request.get('id'))):
+                        events.put_nowait({'event': 'error', 'id': request.get('id'),
+                                           'error': 'job is unknown or finished'})
+                elif op == 'status':
+                    events.put_nowait(service.status(str(request.get('id'))))
+                elif op == 'watch':
+                    job = service.jobs.get(str(request.get('id')))
+                    if job is None or job.finished():
+                        events.put_nowait(service.status(str(request.get('id'))))
+                    else:
+                        job.subscribers.add(events)
+                else:
+                    raise ValueError('Unknown op: ' + str(op))
+            except (ValueError, TypeError, KeyError, AttributeError) as error:
+                events.put_nowait({'event': 'error', 'error': str(error)})
+        # deliver the remaining events before the connection is closed
+        while not events.empty():
+            await asyncio.sleep(0.01)
+    finally:
+        sender.cancel()
+        writer.close()
+
+
+async def serve(path=None, port=None, processes=None):
+    """
+        Runs the service on a Unix socket or on a TCP port of localhost
+    """
+    service = AttackService(processes)
+    await service.start()
+
+    async def handler(reader, writer):
+        await handle_connection(service, reader, writer)
+
+    if path:
+        server = await asyncio.start_unix_server(handler, path)
+    else:
+        server = await asyncio.start_server(handler, '127.0.0.1', port)
+    sys.stderr.write('service ready with {} warm workers\n'.format(service.processes))
+    try:
+        await server.serve_forever()
+    finally:
+        server.close()
+        service.close()
+
+
+async def submit(requests, path=None, port=None, stream=None):
+    """
+        Sends requests and writes all events until every submitted job has
+        finished
+        :param requests: list of request dictionaries
+        :return list with the finished events
+    """
+    stream = stream or sys.stdout
+    if path:
+        (reader, writer) = await asyncio.open_unix_connection(path)
+    else:
+        (reader, writer) = await asyncio.open_connection('127.0.0.1', port)
+    pending = 0
+    for request in requests:
+        writer.write((json.dumps(request) + '\n').encode())
+        if request.get('op') in ('submit', 'watch'):
+            pending += 1
+    await writer.drain()
+    finished = []
+    while pending:
+        line = await reader.readline()
+        if not line:
+            break
+        event = json.loads(line.decode())
+        stream.write(line.decode())
+        stream.flush()
+        if event['event'] in ('finished', 'error') or (event['event'] == 'status' and event['status'] != 'running'):
+            pending -= 1
+            if event['event'] == 'finished':
+                finished.append(event)
+    writer.close()
+    return finished
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Attack service with a warm worker pool')
+    parser.add_argument('command', choices=['serve', 'submit'],
+                        help='serve: run the service, submit: send the JSON jobs from stdin and stream the events')
+    parser.add_argument('--socket', default=None, help='Unix socket path')
+    parser.add_argument('--port', type=int, default=8452, help='TCP port on localhost (default: 8452)')
+    parser.add_argument('-p', '--processes', type=int, default=None, help='number of worker processes')
+    parser.add_argument('--priority', type=int, default=0, help='priority of the submitted jobs')
+    args = parser.parse_args()
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.socket, args.port, args.processes))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    requests = [{'op': 'submit', 'job': json.loads(line), 'priority': args.priority}
+                for line in sys.stdin if line.strip()]
+    finished = asyncio.run(submit(requests, args.socket, args.port))
+    return jobs.exit_code([event for event in finished if event['status'] != 'cancelled'])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+import asyncio
+import unittest
+from a5_1_core import A51Core, A51Parameters
+from a5_2 import A5_2
+from cipher_spec import CipherSpec
+from service import AttackService
+from constant import *
+
+
+def keystream(key, frame_counter, spec=None):
+    (send_key, receive_key) = A5_2(key, frame_counter, spec).get_key_stream(generate_only_send_key=True)
+    return send_key.int_val()
+
+
+async def wait_for(queue, status):
+    while True:
+        event = await queue.get()
+        if event['event'] == 'finished':
+            if event['status'] != status:
+                raise AssertionError(event)
+            return event
+
+
+class ServiceTest(unittest.TestCase):
+
+    def test_jobs(self):
+        asyncio.run(self.run_jobs())
+
+    async def run_jobs(self):
+        service = AttackService(processes=2, chunks=4)
+        await service.start()
+        try:
+            key = 0xfaf3df3fa6698c0c
+            f1 = 0x7c084
+            f2 = f1 ^ FRAME_COUNTER_DIFFERENCE
+            r4 = 124033
+
+            events = asyncio.Queue()
+            job = service.submit({'command': 'keystream', 'cipher': 'a52', 'key': hex(key), 'frame_counter': hex(f1)},
+                                 subscriber=events)
+            result = await wait_for(events, 'ok')
+            self.assertEqual(int(result['send_key'], 16), keystream(key, f1))
+            self.assertEqual(service.status(job.id)['status'], 'ok')
+
+            # a running attack can be cancelled
+            cancelled = asyncio.Queue()
+            job = service.submit({'command': 'attack', 'k1': hex(keystream(key, f1)), 'f1': hex(f1),
+                                  'k2': hex(keystream(key, f2)), 'f2': hex(f2)}, subscriber=cancelled)
+            self.assertTrue(service.cancel(job.id))
+            await wait_for(cancelled, 'cancelled')
+
+            events = asyncio.Queue()
+            service.submit({'command': 'attack', 'id': 'partial', 'k1': hex(keystream(key, f1)), 'f1': hex(f1),
+                            'k2': hex(keystream(key, f2)), 'f2': hex(f2), 'r4_range': [r4 - 1500, r4 + 500]},
+                           priority=5, subscriber=events)
+            result = await wait_for(events, 'ok')
+            self.assertEqual(result['id'], 'partial')
+            self.assertEqual(int(result['session_key'], 16), key)
+        finally:
+            service.close()
+
+    def test_reduced_jobs(self):
+        asyncio.run(self.run_reduced_jobs())
+
+    async def run_reduced_jobs(self):
+        service = AttackService(processes=2, chunks=4)
+        await service.start()
+        try:
+            # the correct R4 has three free variables, so it is only checked in the deferred pass
+            spec = CipherSpec.reduced((5, 6, 7, 8))
+            (key, f1, f2) = (0x8996, 0x246dd6, 0x246ccf)
+            events = asyncio.Queue()
+            job = service.submit({'command': 'attack', 'k1': hex(keystream(key, f1, spec)), 'f1': hex(f1),
+                                  'k2': hex(keystream(key, f2, spec)), 'f2': hex(f2), 'sizes': [5, 6, 7, 8],
+                                  'solution_budget': 1}, subscriber=events)
+            result = await wait_for(events, 'ok')
+            self.assertEqual(keystream(int(result['session_key'], 16), f1, spec), keystream(key, f1, spec))
+            self.assertGreater(job.total, 1 + service.chunks)
+
+            parameters = A51Parameters.reduced((5, 6, 7))
+            core = A51Core(parameters)
+            events = asyncio.Queue()
+            service.submit({'command': 'a51_attack', 'keystream': hex(core.generate(0x2f0e1, 0x42)[0]),
+                            'frame_counter': '42', 'sizes': [5, 6, 7], 'split_bits': 3}, subscriber=events)
+            result = await wait_for(events, 'ok')
+            self.assertEqual(core.generate(int(result['session_key'], 16), 0x42)[0], core.generate(0x2f0e1, 0x42)[0])
+            self.assertGreater(result['guesses'], 0)
+        finally:
+            service.close()
+
+    def test_errors(self):
+        asyncio.run(self.run_errors())
+
+    async def run_errors(self):
+        service = AttackService(processes=2, chunks=4, finished_ttl=0)
+        await service.start()
+        try:
+            events = asyncio.Queue()
+            service.submit({'command': 'keystream', 'cipher': 'a53', 'key': '1', 'frame_counter': '2'},
+                           subscriber=events)
+            self.assertIn('Unknown cipher', (await wait_for(events, 'error'))['error'])
+            events = asyncio.Queue()
+            service.submit({'command': 'attack', 'k1': '1', 'f1': '0', 'k2': '2', 'f2': '1'}, subscriber=events)
+            self.assertIn('not usable', (await wait_for(events, 'error'))['error'])
+
+            # every range fails, the first error stops the other units of the job
+            spec = CipherSpec.reduced((5, 6, 7, 8))
+            (f1, f2) = (0x246dd6, 0x246ccf)
+            events = asyncio.Queue()
+            job = service.submit({'command': 'attack', 'id': 'failing', 'k1': hex(keystream(1, f1, spec)),
+                                  'f1': hex(f1), 'k2': hex(keystream(1, f2, spec)), 'f2': hex(f2),
+                                  'sizes': [5, 6, 7, 8], 'solution_budget': 'x'}, subscriber=events)
+            await wait_for(events, 'error')
+            self.assertTrue(job.stop.is_set())
+            self.assertEqual(len(job.units), 0)
+
+            # finished jobs are evicted after the TTL, auto ids are never reused
+            self.assertEqual(service.status('failing')['status'], 'unknown')
+            self.assertNotIn('failing', service.jobs)
+            service.finished_ttl = 600
+            service.submit({'command': 'unknown', 'id': 'job-4'})
+            self.assertRaises(ValueError, service.submit, {'command': 'unknown', 'id': 'job-4'})
+            self.assertEqual(service.submit({'command': 'unknown'}).id, 'job-3')
+            self.assertEqual(service.submit({'command': 'unknown'}).id, 'job-5')
+        finally:
+            service.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,325 @@
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import numpy as np
+from a5_1_core import A51Core, A51Parameters
+from multiprocessing import Pool
+
+MAGIC = b'A51TMTO1'
+# magic + length of the JSON header
+PREFIX_FORMAT = '<8sI'
+ALIGNMENT = 8
+# maximum chain length in multiples of the expected length 2^dp_bits
+MAX_LENGTH_FACTOR = 8
+
+table = None
+
+
+class ChainFunction(object):
+    """
+        Step function of the chains: the first state_size keystream bits
+        of a state, XORed with the table salt, are the next state. The
+        salt gives every table its own reduction function.
+    """
+    def __init__(self, parameters, salt, dp_bits):
+        self.core = A51Core(parameters)
+        self.size = parameters.state_size
+        self.mask = (1 << self.size) - 1
+        self.salt = salt & self.mask
+        self.dp_mask = (1 << dp_bits) - 1
+
+    def output(self, state):
+        return self.core.keystream(state, self.size)
+
+    def reduce(self, output):
+        return output ^ self.salt
+
+    def step(self, state):
+        return self.core.keystream(state, self.size) ^ self.salt
+
+    def is_distinguished(self, state):
+        return not state & self.dp_mask
+
+
+def build_chains(parameters, salt, dp_bits, max_length, starts):
+    """
+        :param parameters: A51Parameters as dictionary
+        :param starts: start points of the chains
+        :return list with tuples (end point, start point), chains without a
+                distinguished point within max_length steps are dropped
+    """
+    function = ChainFunction(A51Parameters.from_dict(parameters), salt, dp_bits)
+    chains = []
+    for start in starts:
+        state = start
+        for i in range(max_length):
+            state = function.step(state)
+            if function.is_distinguished(state):
+                chains.append((state, start))
+                break
+    return chains
+
+
+def record_dtype(state_size, dp_bits):
+    """
+        End points are stored without their dp_bits zero bits, both fields
+        use 32 bit integers if the state fits
+    """
+    end_type = '<u4' if state_size - dp_bits <= 32 else '<u8'
+    start_type = '<u4' if state_size <= 32 else '<u8'
+    return np.dtype([('end', end_type), ('start', start_type)])
+
+
+def build_table(path, parameters, chains, dp_bits, max_length=None, salt=0, processes=1, seed=0):
+    """
+        Builds a table with distinguished points and writes it sorted by end
+        point to a file
+        :param parameters: A51Parameters
+        :param chains: number of chains to start
+        :param dp_bits: number of zero bits of a distinguished point
+        :param max_length: Optional, maximum chain length
+        :param salt: reduction value, different tables need different salts
+        :param processes: number of processes
+        :param seed: seed for the start points
+        :return dictionary with statistics
+    """
+    start_time = time.perf_counter()
+    if max_length is None:
+        max_length = MAX_LENGTH_FACTOR << dp_bits
+    rng = random.Random(seed)
+    starts = [rng.getrandbits(parameters.state_size) for i in range(chains)]
+    chunk = max(1, -(-chains // (processes * 4)))
+    arguments = [(parameters.to_dict(), salt, dp_bits, max_length, starts[i:i + chunk])
+                 for i in range(0, chains, chunk)]
+    if processes > 1:
+        with Pool(processes=processes) as pool:
+            results = pool.starmap(build_chains, arguments)
+    else:
+        results = [build_chains(*argument) for argument in arguments]
+    records = {}
+    for result in results:
+        for end, start in result:
+            # merged chains cover the same states, only one is kept
+            records.setdefault(end, start)
+    dtype = record_dtype(parameters.state_size, dp_bits)
+    data = np.array([(end >> dp_bits, start) for end, start in records.items()], dtype=dtype)
+    data.sort(order='end')
+    header = json.dumps({'parameters': parameters.to_dict(), 'dp_bits': dp_bits, 'max_length': max_length,
+                         'salt': salt, 'chains': len(data), 'dtype': dtype.descr}).encode()
+    header += b' ' * (-(struct.calcsize(PREFIX_FORMAT) + len(header)) % ALIGNMENT)
+    with open(path, 'wb') as f:
+        f.write(struct.pack(PREFIX_FORMAT, MAGIC, len(header)))
+        f.write(header)
+        f.write(data.tobytes())
+    return {'chains': chains, 'stored': len(data), 'dropped': chains - sum(len(result) for result in results),
+            'bytes': os.path.getsize(path), 'seconds': time.perf_counter() - start_time}
+
+
+class TmtoTable(object):
+    """
+        Table file opened with mmap, the records are only read on access
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, header_length) = struct.unpack_from(PREFIX_FORMAT, self.map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(path + ' is not a TMTO table!')
+        offset = struct.calcsize(PREFIX_FORMAT)
+        header = json.loads(self.map[offset:offset + header_length].decode())
+        self.parameters = A51Parameters.from_dict(header['parameters'])
+        self.dp_bits = header['dp_bits']
+        self.max_length = header['max_length']
+        self.salt = header['salt']
+        dtype = np.dtype([tuple(field) for field in header['dtype']])
+        self.records = np.frombuffer(self.map, dtype=dtype, count=header['chains'], offset=offset + header_length)
+        self.ends = self.records['end']
+        self.function = ChainFunction(self.parameters, self.salt, self.dp_bits)
+
+    def close(self):
+        self.records = None
+        self.ends = None
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def starts(self, end):
+        """
+            :return start points of the chains with the given end point
+        """
+        key = end >> self.dp_bits
+        left = np.searchsorted(self.ends, key, side='left')
+        right = np.searchsorted(self.ends, key, side='right')
+        return [int(start) for start in self.records['start'][left:right]]
+
+    def candidate_states(self, output):
+        """
+            Generates all states of the table whose first state_size
+            keystream bits are the given output. False alarms (merged
+            chains) are filtered while the chains are regenerated.
+        """
+        function = self.function
+        state = function.reduce(output)
+        for i in range(self.max_length):
+            if function.is_distinguished(state):
+                for start in self.starts(state):
+                    # regenerate the chain up to the predecessor of the output
+                    current = start
+                    for j in range(self.max_length):
+                        if function.output(current) == output:
+                            yield current
+                            break
+                        current = function.step(current)
+                        if function.is_distinguished(current):
+                            break
+                return
+            state = function.step(state)
+
+
+def lookup_position(table, keystream, frame_counter, position):
+    """
+        Searches the state before keystream bit `position`
+        :param keystream: send keystream as integer
+        :return tuple (session key, state, position) or None
+    """
+    parameters = table.parameters
+    size = parameters.state_size
+    output = (keystream >> (parameters.keystream_size - position - size)) & ((1 << size) - 1)
+    core = table.function.core
+    for state in table.candidate_states(output):
+        for key in core.recover_keys(state, position, frame_counter):
+            if core.generate(key, frame_counter)[0] == keystream:
+                return (key, state, position)
+    return None
+
+
+def init_lookup(path):
+    global table
+    table = TmtoTable(path)
+
+
+def lookup_worker(task):
+    (keystream, frame_counter, position) = task
+    return lookup_position(table, keystream, frame_counter, position)
+
+
+def lookup(path, keystream, frame_counter, processes=1):
+    """
+        Recovers the state and the session key for a known keystream. Every
+        window of state_size keystream bits is looked up, the windows are
+        distributed over the processes.
+        :param path: table file
+        :param keystream: send keystream as integer
+        :param frame_counter: frame counter of the keystream
+        :return tuple (session key, state, position) or None
+    """
+    with TmtoTable(path) as opened:
+        positions = range(opened.parameters.keystream_size - opened.parameters.state_size + 1)
+        if processes <= 1:
+            for position in positions:
+                result = lookup_position(opened, keystream, frame_counter, position)
+                if result:
+                    return result
+            return None
+    with Pool(processes=processes, initializer=init_lookup, initargs=(path,)) as pool:
+        tasks = [(keystream, frame_counter, position) for position in positions]
+        for result in pool.imap_unordered(lookup_worker, tasks):
+            if result:
+                # leaving the with block terminates the remaining lookups
+                return result
+    return None
+
+
+def benchmark(parameters, chains, dp_bits, samples=10, processes=1, seed=0, stream=None):
+    """
+        Builds a table, looks up the keystreams of random keys and reports
+        build time, table size, lookup time and success rate
+        :return dictionary with the results
+    """
+    stream = stream or sys.stdout
+    core = A51Core(parameters)
+    rng = random.Random(seed + 1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'table.tmto')
+        build = build_table(path, parameters, chains, dp_bits, processes=processes, seed=seed)
+        stream.write('build: {stored}/{chains} chains in {seconds:.2f} s, {bytes} bytes\n'.format(**build))
+        found = 0
+        lookup_seconds = 0.0
+        for i in range(samples):
+            key = rng.getrandbits(parameters.key_size)
+            frame_counter = rng.getrandbits(parameters.frame_counter_size)
+            keystream = core.generate(key, frame_counter)[0]
+            start_time = time.perf_counter()
+            result = lookup(path, keystream, frame_counter, processes)
+            lookup_seconds += time.perf_counter() - start_time
+            if result and core.generate(result[0], frame_counter)[0] == keystream:
+                found += 1
+    report = {'build': build, 'samples': samples, 'found': found, 'success_rate': found / samples,
+              'lookup_seconds': lookup_seconds / samples}
+    stream.write('lookup: {} of {} keys found ({:.0%}), {:.3f} s per lookup\n'.format(
+        found, samples, report['success_rate'], report['lookup_seconds']))
+    return report
+
+
+def parameters_from_arguments(args):
+    if args.sizes:
+        return A51Parameters.reduced(args.sizes)
+    return A51Parameters()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time-memory tradeoff for A5/1')
+    subparsers = parser.add_subparsers(dest='command')
+    build_parser = subparsers.add_parser('build', help='build a table')
+    build_parser.add_argument('table', help='table file')
+    build_parser.add_argument('--chains', type=int, required=True, help='number of chains')
+    build_parser.add_argument('--salt', type=int, default=0, help='reduction value of the table')
+    build_parser.add_argument('--seed', type=int, default=0, help='seed for the start points')
+    lookup_parser = subparsers.add_parser('lookup', help='recover the session key for a keystream')
+    lookup_parser.add_argument('table', help='table file')
+    lookup_parser.add_argument('keystream', help='send keystream as hexadecimal value')
+    lookup_parser.add_argument('frame_counter', help='frame counter as hexadecimal value')
+    benchmark_parser = subparsers.add_parser('benchmark', help='build a table and measure the lookup')
+    benchmark_parser.add_argument('--chains', type=int, default=2048, help='number of chains')
+    benchmark_parser.add_argument('--samples', type=int, default=10, help='number of random keys')
+    for subparser in (build_parser, benchmark_parser):
+        subparser.add_argument('--sizes', type=int, nargs=3, metavar='SIZE',
+                               help='reduced register sizes (default: real A5/1)')
+        subparser.add_argument('--dp-bits', type=int, default=6, help='zero bits of a distinguished point')
+    for subparser in (build_parser, lookup_parser, benchmark_parser):
+        subparser.add_argument('-p', '--processes', type=int, default=1, help='number of processes')
+    args = parser.parse_args()
+    if args.command == 'build':
+        stats = build_table(args.table, parameters_from_arguments(args), args.chains, args.dp_bits,
+                            salt=args.salt, processes=args.processes, seed=args.seed)
+        print(json.dumps(stats, sort_keys=True))
+    elif args.command == 'lookup':
+        result = lookup(args.table, int(args.keystream, 16), int(args.frame_counter, 16), args.processes)
+        if result is None:
+            print('No session key found')
+            return 1
+        print('Session key: ' + hex(result[0]))
+        print('State at keystream bit {}: {}'.format(result[2], hex(result[1])))
+    elif args.command == 'benchmark':
+        benchmark(parameters_from_arguments(args) if args.sizes else A51Parameters.reduced((6, 7, 8)),
+                  args.chains, args.dp_bits, args.samples, args.processes)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import os
+import shutil
+import tempfile
+import unittest
+from a5_1_core import A51Core, A51Parameters
+from tmto import TmtoTable, build_table, lookup
+
+
+class TmtoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'table.tmto')
+        self.parameters = A51Parameters.reduced((5, 6, 7))
+        build_table(self.path, self.parameters, 1024, 5, salt=3, seed=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_table_format(self):
+        with TmtoTable(self.path) as table:
+            self.assertEqual(table.parameters, self.parameters)
+            self.assertEqual(table.salt, 3)
+            self.assertTrue((table.ends[1:] > table.ends[:-1]).all())
+            for end, start in table.records[:20]:
+                state = table.function.step(int(start))
+                while not table.function.is_distinguished(state):
+                    state = table.function.step(state)
+                self.assertEqual(state >> table.dp_bits, end)
+
+    def test_lookup(self):
+        core = A51Core(self.parameters)
+        key = 0x1b2c3
+        frame_counter = 0x42
+        keystream = core.generate(key, frame_counter)[0]
+        (found_key, state, position) = lookup(self.path, keystream, frame_counter)
+        self.assertEqual(core.generate(found_key, frame_counter)[0], keystream)
+        self.assertEqual(core.clock(core.initial_state(found_key, frame_counter), position), state)
+        found_key = lookup(self.path, keystream, frame_counter, processes=2)[0]
+        self.assertEqual(core.generate(found_key, frame_counter)[0], keystream)
+
+if __name__ == '__main__':
+    unittest.main()